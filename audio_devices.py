@@ -0,0 +1,155 @@
+"""
+Audio device manager
+Picks input/output devices and keeps their streams open for a whole session
+"""
+
+from typing import Callable, List, Optional, Union
+
+DeviceChoice = Union[int, str, None]
+
+
+class AudioDeviceManager:
+    """Resolves the configured devices and owns the session's streams.
+    
+    Devices and the host API (e.g. "WASAPI", "Core Audio", "ALSA") are
+    chosen by index or by a case-insensitive part of their name; anything
+    left empty, or not found, falls back to the system default. Each stream
+    is opened once and kept running until close(), so muting the microphone
+    or starting a new turn never waits on the backend: opening a stream can
+    take tens to hundreds of milliseconds on some host APIs.
+    """
+    
+    def __init__(self, audio, input_device: DeviceChoice = None,
+                 output_device: DeviceChoice = None, host_api: DeviceChoice = None):
+        # audio: a pyaudio.PyAudio, or a stand-in with the same interface
+        self.audio = audio
+        self.host_api = self.input_info = self.output_info = None
+        try:
+            if host_api not in (None, ""):
+                self.host_api = self._find_host_api(host_api)
+            self.input_info = self._find_device(input_device, output=False)
+            self.output_info = self._find_device(output_device, output=True)
+        except Exception as e:
+            print(f"Could not look up audio devices, using the defaults: {e}")
+            self.host_api = self.input_info = self.output_info = None
+        self.input_stream = None
+        self.output_stream = None
+        # Latency the backend reported when each stream was last opened
+        self.reported_latency_ms = {"input": None, "output": None}
+        
+    def _find_host_api(self, wanted: DeviceChoice) -> Optional[int]:
+        apis = [self.audio.get_host_api_info_by_index(i) for i in range(self.audio.get_host_api_count())]
+        for api in apis:
+            if self._matches(api, wanted):
+                return api["index"]
+        print(f"Audio host API {wanted!r} not found, using the default. Available: "
+              + ", ".join(api["name"] for api in apis))
+        return None
+        
+    def _find_device(self, wanted: DeviceChoice, output: bool) -> Optional[dict]:
+        """Info of the chosen device, or None for PortAudio's default"""
+        if wanted in (None, ""):
+            if self.host_api is None:
+                return None
+            # The chosen host API's own default device
+            api = self.audio.get_host_api_info_by_index(self.host_api)
+            index = api["defaultOutputDevice" if output else "defaultInputDevice"]
+            return self.audio.get_device_info_by_index(index) if index >= 0 else None
+            
+        candidates = self.list_devices(output)
+        for info in candidates:
+            if self._matches(info, wanted):
+                return info
+        kind = "output" if output else "input"
+        print(f"Audio {kind} device {wanted!r} not found, using the default. Available: "
+              + ", ".join(info["name"] for info in candidates))
+        return None
+        
+    @staticmethod
+    def _matches(info: dict, wanted: DeviceChoice) -> bool:
+        if isinstance(wanted, int) or str(wanted).strip().isdigit():
+            return info["index"] == int(wanted)
+        return str(wanted).strip().lower() in info["name"].lower()
+        
+    def list_devices(self, output: bool) -> List[dict]:
+        """Devices that can record (or play), on the chosen host API if any"""
+        channels = "maxOutputChannels" if output else "maxInputChannels"
+        devices = []
+        for index in range(self.audio.get_device_count()):
+            info = self.audio.get_device_info_by_index(index)
+            if info.get(channels, 0) > 0 and self.host_api in (None, info.get("hostApi")):
+                devices.append(info)
+        return devices
+        
+    def native_rate(self, output: bool) -> int:
+        """Default sample rate of the device that will be opened"""
+        info = self.output_info if output else self.input_info
+        if info is None:
+            if output:
+                info = self.audio.get_default_output_device_info()
+            else:
+                info = self.audio.get_default_input_device_info()
+        return int(info["defaultSampleRate"])
+        
+    def open_input(self, format: int, rate: int, frames: int):
+        """The blocking-read input stream, opened on first use"""
+        if self.input_stream is None:
+            kwargs = {}
+            if self.input_info is not None:
+                kwargs["input_device_index"] = self.input_info["index"]
+            self.input_stream = self.audio.open(
+                format=format, channels=1, rate=rate, input=True,
+                frames_per_buffer=frames, **kwargs
+            )
+            self._note_latency("input", self.input_stream)
+        return self.input_stream
+        
+    def open_output(self, format: int, rate: int, frames: int, callback: Callable):
+        """The callback-mode output stream, opened on first use"""
+        if self.output_stream is None:
+            kwargs = {}
+            if self.output_info is not None:
+                kwargs["output_device_index"] = self.output_info["index"]
+            self.output_stream = self.audio.open(
+                format=format, channels=1, rate=rate, output=True,
+                frames_per_buffer=frames, stream_callback=callback, **kwargs
+            )
+            self._note_latency("output", self.output_stream)
+        return self.output_stream
+        
+    def close_input(self):
+        stream, self.input_stream = self.input_stream, None
+        self._close(stream)
+        
+    def close_output(self):
+        stream, self.output_stream = self.output_stream, None
+        self._close(stream)
+        
+    def close(self):
+        self.close_input()
+        self.close_output()
+        
+    @staticmethod
+    def _close(stream):
+        if stream:
+            try:
+                stream.stop_stream()
+                stream.close()
+            except Exception as e:
+                print(f"Audio stream error: {e}")
+                
+    def _note_latency(self, name: str, stream):
+        try:
+            seconds = getattr(stream, f"get_{name}_latency")()
+            self.reported_latency_ms[name] = round(seconds * 1000, 1)
+        except Exception:
+            # Stand-ins for PyAudio, and some host APIs, don't report it
+            self.reported_latency_ms[name] = None
+            
+    def describe(self) -> dict:
+        """The devices in use, for logs"""
+        return {
+            "input": self.input_info["name"] if self.input_info else "default",
+            "output": self.output_info["name"] if self.output_info else "default",
+            "latency_ms": dict(self.reported_latency_ms),
+        }
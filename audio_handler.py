@@ -5,10 +5,48 @@ Manages microphone input and speaker output
 
 import pyaudio
 import wave
+import collections
 import threading
-import queue
+import time
 from typing import Callable, Optional
 
+import numpy as np
+
+from .audio_devices import AudioDeviceManager, DeviceChoice
+from .echo_control import EchoController
+from .latency import recorder
+from .resampler import StreamingResampler
+from .ring_buffer import RingBuffer
+
+
+_shared_audio = None
+_shared_audio_lock = threading.Lock()
+
+
+def shared_pyaudio() -> pyaudio.PyAudio:
+    """The process-wide PyAudio instance, created on first use.
+    
+    PyAudio() initializes PortAudio, which enumerates every host API and
+    device; that takes long enough to notice, so it is done once (ahead of
+    time, see main.warm_up_audio) rather than each time a dialog opens.
+    Devices are only enumerated then, so one plugged in later shows up
+    after release_pyaudio() (at profile close) and the next first use.
+    """
+    global _shared_audio
+    with _shared_audio_lock:
+        if _shared_audio is None:
+            _shared_audio = pyaudio.PyAudio()
+        return _shared_audio
+
+
+def release_pyaudio():
+    """Terminate the shared instance, if one was created"""
+    global _shared_audio
+    with _shared_audio_lock:
+        audio, _shared_audio = _shared_audio, None
+    if audio:
+        audio.terminate()
+
 
 class AudioHandler:
     """Handles audio recording and playback for voice interaction"""
@@ -18,122 +56,405 @@ class AudioHandler:
     FORMAT = pyaudio.paInt16
     CHANNELS = 1
     RATE = 16000  # 16kHz sample rate for Gemini
+    MODEL_RATE = 24000  # Gemini Live replies with 24kHz PCM
+    PLAYBACK_CAPACITY_S = 30  # Longest backlog of model speech kept in memory
+    FADE_MS = 5
+    # How long a local barge-in pauses playback waiting for the server to
+    # cancel the turn; if it doesn't, the user's sound wasn't an interruption
+    BARGE_IN_CONFIRM_MS = 1000
     
-    def __init__(self):
-        self.audio = pyaudio.PyAudio()
+    def __init__(self, jitter_buffer_ms: int = 120, input_rate: Optional[int] = None,
+                 output_rate: Optional[int] = None, audio=None,
+                 input_device: DeviceChoice = None, output_device: DeviceChoice = None,
+                 host_api: DeviceChoice = None, echo_mode: str = "off",
+                 echo_duck_db: float = 24.0):
+        # audio: a pyaudio.PyAudio, or a stand-in with the same interface;
+        # terminated at cleanup, unlike the shared one used by default
+        self._owns_audio = audio is not None
+        self.audio = audio or shared_pyaudio()
+        self.devices = AudioDeviceManager(self.audio, input_device, output_device, host_api)
+        # Streams stay open from open_streams() to close_streams(); recording
+        # only says whether captured audio is delivered (mute is instant)
         self.recording = False
+        self.capturing = False
         self.playing = False
         self.record_thread = None
-        self.playback_thread = None
+        self._output_lock = threading.Lock()
         self.audio_callback = None
-        self.playback_queue = queue.Queue()
+        # Called from the PortAudio thread with each block sent to the device
+        self.output_callback: Optional[Callable[[bytes], None]] = None
+        
+        # Devices run at their native rates so the OS doesn't resample;
+        # we convert to 16kHz for the uplink and from 24kHz for playback
+        self.input_rate = input_rate or self._native_rate(output=False)
+        self.output_rate = output_rate or self._native_rate(output=True)
+        self.capture_resampler = StreamingResampler(self.input_rate, self.RATE)
+        self.playback_resampler = StreamingResampler(self.MODEL_RATE, self.output_rate)
+        # Same period (64 ms) as CHUNK frames at 16kHz
+        self.capture_frames = self.CHUNK * self.input_rate // self.RATE
+        self.playback_frames = self.CHUNK * self.output_rate // self.RATE
+        
+        # Playback: the client thread writes into the ring, the PortAudio
+        # callback reads from it; nothing is allocated per block except the
+        # bytes handed to the device
+        self.playback_ring = RingBuffer(self.PLAYBACK_CAPACITY_S * self.output_rate * 2)
+        self.jitter_bytes = int(self.output_rate * jitter_buffer_ms / 1000) * 2
+        self._ramp = np.linspace(0.0, 1.0, int(self.output_rate * self.FADE_MS / 1000), dtype=np.float32)
+        self._silence_block = bytes(self.playback_frames * 2)
+        self._primed = False
+        self._fade_in = False
+        self._turn_complete = False
+        self.underruns = 0
+        self.device_underflows = 0
+        # Capture blocks PortAudio reported as overflowed (we read too late)
+        self.capture_overflows = 0
+        
+        # Barge-in: playback pauses at the user's speech onset and the
+        # buffered audio is only discarded once the server cancels the turn;
+        # latencies are measured from speech onset to silence
+        self._held_since = None
+        self._interrupted_at = None
+        self.barge_ins = 0
+        self.barge_ins_resumed = 0
+        self.barge_in_latencies_ms = collections.deque(maxlen=200)
+        
+        # perf_counter() time the current turn's first audio arrived, while
+        # latency recording is on and it hasn't started playing yet
+        self._new_turn = True
+        self._turn_audio_at = None
+        # Output latency the backend reports, for host APIs whose callback
+        # timestamps don't include it
+        self._stream_output_delay = 0.0
+        
+        # Echo control: played blocks, with the time they are heard, go
+        # from the PortAudio callback to the capture thread, which removes
+        # their echo from the microphone before anything else sees it
+        self.echo = None
+        if echo_mode != "off":
+            try:
+                self.echo = EchoController(echo_mode, rate=self.RATE, duck_db=echo_duck_db)
+            except ValueError as e:
+                print(f"Echo control disabled: {e}")
+        self._echo_reference = collections.deque(maxlen=64)
+        self.reference_resampler = StreamingResampler(self.output_rate, self.RATE)
+        
+    def _native_rate(self, output: bool) -> int:
+        """Default sample rate of the chosen input or output device"""
+        try:
+            return self.devices.native_rate(output)
+        except Exception as e:
+            print(f"Could not query audio device, using {self.RATE} Hz: {e}")
+            return self.RATE
+            
+    def open_streams(self):
+        """Open both streams for the session, off the calling thread"""
+        self._start_capture(output_too=True)
+        
+    def close_streams(self):
+        """Stop capture and playback and close the streams (end of session)"""
+        self.recording = False
+        self.capturing = False
+        if self.record_thread:
+            self.record_thread.join(timeout=1.0)
+            self.record_thread = None
+        self.stop_playback()
+        with self._output_lock:
+            self.playing = False
+            self.devices.close_output()
+        if self.echo:
+            self._echo_reference.clear()
+            self.reference_resampler.reset()
+            self.echo.reset()
+            
+    def _start_capture(self, output_too: bool = False):
+        if self.record_thread and self.record_thread.is_alive():
+            return
+        self.capturing = True
+        self.record_thread = threading.Thread(target=self._record_loop, args=(output_too,), daemon=True)
+        self.record_thread.start()
         
     def start_recording(self, callback: Callable[[bytes], None]):
-        """Start recording audio from microphone"""
+        """Start (or unmute) delivering microphone audio to callback"""
         if self.recording:
             return
             
         self.audio_callback = callback
         self.recording = True
-        self.record_thread = threading.Thread(target=self._record_loop, daemon=True)
-        self.record_thread.start()
+        self._start_capture()
         
-    def _record_loop(self):
-        """Recording loop - captures audio and sends to callback"""
+    def _record_loop(self, output_too: bool):
+        """Capture loop - reads the microphone until close_streams()"""
+        if output_too:
+            self._start_playback_stream()
         try:
-            stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                input=True,
-                frames_per_buffer=self.CHUNK
-            )
-            
-            while self.recording:
+            stream = self.devices.open_input(self.FORMAT, self.input_rate, self.capture_frames)
+            input_latency = (self.devices.reported_latency_ms["input"] or 0.0) / 1000
+            delivering = False
+            while self.capturing:
                 try:
-                    data = stream.read(self.CHUNK, exception_on_overflow=False)
-                    if self.audio_callback:
+                    try:
+                        data = stream.read(self.capture_frames, exception_on_overflow=True)
+                    except IOError as e:
+                        if getattr(e, "errno", None) != pyaudio.paInputOverflowed:
+                            raise
+                        # PyAudio drops the block when it reports the
+                        # overflow; the audio was already discontinuous
+                        self.capture_overflows += 1
+                        continue
+                    read_at = time.perf_counter()
+                    if self.echo:
+                        self._feed_echo_reference()
+                    if not self.recording:
+                        # Muted: keep reading so the stream stays drained
+                        # and unmuting doesn't replay stale audio
+                        delivering = False
+                        continue
+                    if not delivering:
+                        # Filter state from before the mute doesn't fit
+                        self.capture_resampler.reset()
+                        if self.echo:
+                            self.echo.skip()
+                        delivering = True
+                    data = self.capture_resampler.process(data)
+                    if data and self.echo:
+                        captured_until = read_at - input_latency - self.capture_resampler.delay
+                        data = self.echo.process(data, captured_until)
+                    if data and self.audio_callback:
                         self.audio_callback(data)
+                    if recorder.enabled:
+                        recorder.record("capture", time.perf_counter() - read_at)
                 except Exception as e:
                     print(f"Recording error: {e}")
                     break
                     
-            stream.stop_stream()
-            stream.close()
-            
         except Exception as e:
             print(f"Failed to start recording: {e}")
             self.recording = False
+        # The stream is reopened by the next start_recording() after an error
+        self.devices.close_input()
+        
+    def _feed_echo_reference(self):
+        """Hand the blocks played since the last read to the echo controller"""
+        while self._echo_reference:
+            data, heard_until = self._echo_reference.popleft()
+            samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+            reference = self.reference_resampler.process_array(samples)
+            self.echo.add_reference(reference, heard_until - self.reference_resampler.delay)
             
     def stop_recording(self):
-        """Stop recording audio"""
+        """Mute: stop delivering audio, keeping the input stream open"""
         self.recording = False
-        if self.record_thread:
-            self.record_thread.join(timeout=1.0)
             
     def play_audio(self, audio_data: bytes):
-        """Queue audio data for playback"""
-        self.playback_queue.put(audio_data)
+        """Buffer 24kHz model audio for playback (safe to call from any thread)"""
+        if self._new_turn:
+            self._new_turn = False
+            if recorder.enabled:
+                self._turn_audio_at = time.perf_counter()
+        self.playback_ring.write(self.playback_resampler.process(audio_data))
+        self._turn_complete = False
         
-        # Start playback thread if not already running
+        # The output stream stays open until close_streams()
         if not self.playing:
-            self.playing = True
-            self.playback_thread = threading.Thread(target=self._playback_loop, daemon=True)
-            self.playback_thread.start()
+            self._start_playback_stream()
             
-    def _playback_loop(self):
-        """Playback loop - plays audio from queue"""
-        try:
-            stream = self.audio.open(
-                format=self.FORMAT,
-                channels=self.CHANNELS,
-                rate=self.RATE,
-                output=True,
-                frames_per_buffer=self.CHUNK
-            )
+    def finish_turn(self):
+        """Mark the end of the model's turn.
+        
+        Lets the tail play even if it is shorter than the jitter buffer
+        target, and keeps the buffer running dry afterwards from being
+        counted as an underrun.
+        """
+        self.playback_ring.write(self.playback_resampler.flush())
+        self.playback_resampler.reset()
+        self._turn_complete = True
+        self._new_turn = True
+        
+    def interrupt(self, onset_time: Optional[float] = None, confirmed: bool = False):
+        """Barge-in: silence playback within one audio period.
+        
+        At the user's speech onset (onset_time, a perf_counter() time used
+        to measure onset-to-silence latency) playback is paused and what is
+        buffered is kept: the server may not take the sound for speech (a
+        cough, an "mm-hmm") and carry on. Once it cancels the turn
+        (confirmed), everything buffered is discarded. If it hasn't within
+        BARGE_IN_CONFIRM_MS, playback resumes where it stopped.
+        """
+        if confirmed:
+            self._held_since = None
+            self._primed = False
+            self._new_turn = True
+            self._turn_audio_at = None
+            self.playback_resampler.reset()
+            self.playback_ring.clear()
+            return
+        if not self.playback_ring.available():
+            return
+        if self._held_since is None and onset_time is not None:
+            self.barge_ins += 1
+            self._interrupted_at = onset_time
+        # Speaking again while paused restarts the wait
+        self._held_since = time.perf_counter()
+        self._primed = False
+        
+    def _start_playback_stream(self):
+        """Open the callback-mode output stream, unless it already is"""
+        with self._output_lock:
+            if self.playing:
+                return
+            try:
+                self.playing = True
+                self._primed = False
+                self.devices.open_output(
+                    self.FORMAT, self.output_rate, self.playback_frames, self._playback_callback
+                )
+                latency = self.devices.reported_latency_ms["output"]
+                self._stream_output_delay = latency / 1000 if latency else 0.0
+            except Exception as e:
+                print(f"Failed to start playback: {e}")
+                self.playing = False
+                self.devices.close_output()
+                
+                
+    def _playback_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback - hands the next block from the ring to the device"""
+        size = frame_count * 2
+        ring = self.playback_ring
+        if status & pyaudio.paOutputUnderflow:
+            self.device_underflows += 1
             
-            while self.playing or not self.playback_queue.empty():
-                try:
-                    # Get audio data from queue with timeout
-                    audio_data = self.playback_queue.get(timeout=0.5)
-                    
-                    # Play audio in chunks
-                    for i in range(0, len(audio_data), self.CHUNK * 2):
-                        chunk = audio_data[i:i + self.CHUNK * 2]
-                        stream.write(chunk)
-                        
-                except queue.Empty:
-                    continue
-                except Exception as e:
-                    print(f"Playback error: {e}")
-                    break
-                    
-            stream.stop_stream()
-            stream.close()
-            self.playing = False
+        held_since = self._held_since
+        if held_since is not None:
+            if time.perf_counter() - held_since < self.BARGE_IN_CONFIRM_MS / 1000:
+                if self._interrupted_at is not None:
+                    self._record_barge_in(time_info)
+                if self.echo:
+                    self._echo_played(self._silence(size), frame_count, time_info)
+                return self._silence(size), pyaudio.paContinue
+            # The server carried on talking: not an interruption after all
+            self._held_since = None
+            self.barge_ins_resumed += 1
             
-        except Exception as e:
-            print(f"Failed to start playback: {e}")
-            self.playing = False
+        if not self._primed:
+            # Build up the jitter buffer before (re)starting, unless the
+            # turn is over and what's left is all there is
+            buffered = ring.available()
+            if buffered < self.jitter_bytes and not (self._turn_complete and buffered):
+                if self._interrupted_at is not None:
+                    self._record_barge_in(time_info)
+                if self.echo:
+                    self._echo_played(self._silence(size), frame_count, time_info)
+                return self._silence(size), pyaudio.paContinue
+            self._primed = True
+            self._fade_in = True
+            if self._turn_audio_at is not None:
+                self._record_playback_start(time_info)
             
+        data = ring.read(size)
+        if len(data) < size:
+            if not self._turn_complete:
+                self.underruns += 1
+            # Conceal the gap: fade out what we have, pad with silence and
+            # wait for the jitter buffer to refill
+            self._primed = False
+            data = self._fade(data, out=True) + self._silence(size - len(data))
+        elif self._fade_in:
+            data = self._fade(data, out=False)
+        self._fade_in = False
+        if self.echo:
+            self._echo_played(data, frame_count, time_info)
+        if self.output_callback:
+            self.output_callback(data)
+        return data, pyaudio.paContinue
+        
+    def _echo_played(self, data: bytes, frame_count: int, time_info):
+        """Queue a played block for the echo controller, with when it ends"""
+        heard_until = time.perf_counter() + self._output_delay(time_info) + frame_count / self.output_rate
+        self._echo_reference.append((data, heard_until))
+        
+    def _record_barge_in(self, time_info):
+        """Log onset-to-silence latency once the first silent block is queued"""
+        elapsed = time.perf_counter() - self._interrupted_at + self._output_delay(time_info)
+        self._interrupted_at = None
+        self.barge_in_latencies_ms.append(elapsed * 1000)
+        
+    def _record_playback_start(self, time_info):
+        """Log how long a turn's first audio took to reach the device"""
+        delay = self._output_delay(time_info)
+        recorder.record("playback_start", time.perf_counter() - self._turn_audio_at + delay)
+        recorder.since("speech_end", "speech_to_playback", extra=delay)
+        self._turn_audio_at = None
+        
+    def _output_delay(self, time_info) -> float:
+        """Time until the block being queued reaches the DAC, if the host API knows"""
+        try:
+            delay = time_info["output_buffer_dac_time"] - time_info["current_time"]
+        except (KeyError, TypeError):
+            return self._stream_output_delay
+        return delay if 0.0 < delay < 1.0 else self._stream_output_delay
+        
+    def _silence(self, size: int) -> bytes:
+        if len(self._silence_block) < size:
+            self._silence_block = bytes(size)
+        return self._silence_block[:size]
+        
+    def _fade(self, data: bytes, out: bool) -> bytes:
+        """Apply a short linear ramp to the end (out) or start of a block"""
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        count = min(len(samples), len(self._ramp))
+        if not count:
+            return data
+        if out:
+            samples[-count:] *= self._ramp[::-1][-count:]
+        else:
+            samples[:count] *= self._ramp[:count]
+        return samples.astype(np.int16).tobytes()
+        
     def stop_playback(self):
-        """Stop audio playback"""
-        self.playing = False
-        # Clear the queue
-        while not self.playback_queue.empty():
-            try:
-                self.playback_queue.get_nowait()
-            except queue.Empty:
-                break
-                
-        if self.playback_thread:
-            self.playback_thread.join(timeout=1.0)
-            
+        """Silence playback and reset the turn state; the stream keeps running"""
+        self.playback_ring.clear()
+        self._turn_complete = False
+        self._held_since = None
+        self._interrupted_at = None
+        self._new_turn = True
+        self._turn_audio_at = None
+        self.playback_resampler.reset()
+        
+        
+    def playback_stats(self) -> dict:
+        """Jitter buffer counters for diagnostics"""
+        return {
+            "underruns": self.underruns,
+            "overruns": self.playback_ring.overruns,
+            "dropped_ms": self._ms(self.playback_ring.dropped_bytes),
+            "device_underflows": self.device_underflows,
+            "capture_overflows": self.capture_overflows,
+            "buffered_ms": self._ms(self.playback_ring.available()),
+            "jitter_buffer_ms": self._ms(self.jitter_bytes),
+            "barge_ins": self.barge_ins,
+            "barge_ins_resumed": self.barge_ins_resumed,
+            "barge_in_ms": self._latency_summary(),
+            "devices": self.devices.describe(),
+            "echo": self.echo.stats() if self.echo else {"mode": "off"},
+        }
+        
+    def _latency_summary(self) -> dict:
+        if not self.barge_in_latencies_ms:
+            return {}
+        values = sorted(self.barge_in_latencies_ms)
+        return {
+            "p50": round(values[len(values) // 2], 1),
+            "max": round(values[-1], 1),
+        }
+        
+    def _ms(self, size: int) -> int:
+        return int(size / 2 / self.output_rate * 1000)
+        
     def cleanup(self):
         """Clean up audio resources"""
-        self.stop_recording()
-        self.stop_playback()
-        self.audio.terminate()
+        self.close_streams()
+        if self._owns_audio:
+            self.audio.terminate()
         
     def is_recording(self) -> bool:
         """Check if currently recording"""
@@ -141,4 +462,4 @@ class AudioHandler:
         
     def is_playing(self) -> bool:
         """Check if currently playing audio"""
-        return self.playing or not self.playback_queue.empty()
+        return self.playback_ring.available() > 0
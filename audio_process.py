@@ -0,0 +1,342 @@
+"""
+Out-of-process audio engine
+Runs AudioHandler in a child Python process, isolated from the GIL of Anki
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+import numpy as np
+
+CHILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio_process_child.py")
+
+# Fields of the status block the child keeps up to date
+STATUS_FIELDS = (
+    "buffered_bytes", "underruns", "device_underflows", "capture_overflows",
+    "overruns", "barge_ins", "output_rate",
+)
+
+
+class SharedRing:
+    """Single-producer single-consumer byte ring in shared memory.
+    
+    The first 16 bytes hold the monotonic write and read positions; each
+    side only ever advances its own. Unlike RingBuffer, the producer can't
+    drop the oldest data (that would move the reader's position), so when
+    the ring is full new data is dropped and counted.
+    """
+    
+    HEADER = 16
+    
+    def __init__(self, capacity: int = 0, name: Optional[str] = None):
+        if name:
+            self.shm = _attach(name)
+            capacity = self.shm.size - self.HEADER
+        else:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER + capacity)
+            self.shm.buf[:self.HEADER] = bytes(self.HEADER)
+        self.name = self.shm.name
+        self.capacity = capacity
+        self._positions = np.ndarray((2,), dtype=np.uint64, buffer=self.shm.buf[:self.HEADER])
+        self._data = self.shm.buf[self.HEADER:self.HEADER + capacity]
+        self.dropped_bytes = 0
+        
+    def available(self) -> int:
+        return int(self._positions[0] - self._positions[1])
+        
+    def write(self, data) -> int:
+        """Append data (producer side); returns the number of bytes dropped"""
+        size = len(data)
+        free = self.capacity - self.available()
+        dropped = max(0, size - free)
+        size -= dropped
+        if size:
+            start = int(self._positions[0]) % self.capacity
+            first = min(size, self.capacity - start)
+            view = memoryview(data)
+            self._data[start:start + first] = view[:first]
+            if size > first:
+                self._data[:size - first] = view[first:size]
+            # Publish only after the bytes are in place
+            self._positions[0] += size
+        self.dropped_bytes += dropped
+        return dropped
+        
+    def read(self, size: int = -1) -> bytes:
+        """Take up to size bytes, everything when size < 0 (consumer side)"""
+        available = self.available()
+        size = available if size < 0 else min(size, available)
+        if not size:
+            return b""
+        start = int(self._positions[1]) % self.capacity
+        first = min(size, self.capacity - start)
+        if first == size:
+            data = self._data[start:start + size].tobytes()
+        else:
+            data = b"".join((self._data[start:], self._data[:size - first]))
+        self._positions[1] += size
+        return data
+        
+    def discard(self) -> int:
+        """Drop everything buffered (consumer side)"""
+        size = self.available()
+        self._positions[1] += size
+        return size
+        
+    def close(self, unlink: bool = False):
+        # Views into the segment must go before it can be closed
+        self._positions = None
+        self._data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def python_interpreter(configured: str = "") -> Optional[str]:
+    """Interpreter to run the engine with, or None if there isn't one.
+    
+    Packaged Anki builds run from their own binary rather than a Python
+    interpreter, so sys.executable can't run a script there; a Python with
+    NumPy and PyAudio has to be configured instead.
+    """
+    if configured:
+        return configured
+    name = os.path.basename(sys.executable or "").lower()
+    return sys.executable if name.startswith("python") else None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without handing it to this process's tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached segments too, and would unlink
+        # them when this process exits
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class AudioProcess:
+    """AudioHandler's interface, backed by a child process.
+    
+    Capture and playback run in their own interpreter, so Qt, collection
+    ops and the network loop in Anki's process can't stall them. PCM moves
+    through shared-memory rings: microphone audio (16kHz) and played blocks
+    (for the level meter) from the child, model speech (24kHz) to it. A
+    line-based pipe carries commands, replies and one-byte "data ready"
+    notifications. Counters are published in a shared status block, so
+    is_playing() and the stats don't need a round trip.
+    
+    The constructor only spawns the child; commands and audio sent before
+    it is ready wait in the pipe and the rings. If it doesn't come up
+    within START_TIMEOUT_S, or exits while in use, on_failure is called
+    (from a background thread) with the reason.
+    """
+    
+    RATE = 16000
+    MODEL_RATE = 24000
+    PLAYBACK_CAPACITY_S = 30
+    CAPTURE_CAPACITY_S = 5
+    START_TIMEOUT_S = 10.0
+    
+    def __init__(self, jitter_buffer_ms: int = 120, python: Optional[str] = None,
+                 input_device="", output_device="", host_api="", echo_mode: str = "off",
+                 echo_duck_db: float = 24.0, on_failure: Optional[Callable[[str], None]] = None):
+        interpreter = python_interpreter(python or "")
+        if not interpreter:
+            raise RuntimeError(
+                f"{os.path.basename(sys.executable)} is not a Python interpreter; "
+                f"set audio_process_python to run the audio engine process"
+            )
+        self.recording = False
+        self.audio_callback = None
+        # Called from the pipe reader thread with blocks sent to the device
+        self.output_callback: Optional[Callable[[bytes], None]] = None
+        
+        self.capture_ring = SharedRing(self.CAPTURE_CAPACITY_S * self.RATE * 2)
+        self.monitor_ring = SharedRing(self.CAPTURE_CAPACITY_S * self.MODEL_RATE * 2)
+        self.playback_ring = SharedRing(self.PLAYBACK_CAPACITY_S * self.MODEL_RATE * 2)
+        self.status_shm = shared_memory.SharedMemory(create=True, size=8 * len(STATUS_FIELDS))
+        self.status_shm.buf[:] = bytes(self.status_shm.size)
+        self._status = np.ndarray((len(STATUS_FIELDS),), dtype=np.int64, buffer=self.status_shm.buf)
+        
+        self._send_lock = threading.Lock()
+        self._replies = {}
+        self._reply_ready = threading.Condition()
+        self.on_failure = on_failure
+        self.started = threading.Event()
+        self.failed = False
+        self.closed = False
+        self.process = subprocess.Popen(
+            [
+                interpreter, CHILD_SCRIPT,
+                "--capture", self.capture_ring.name,
+                "--monitor", self.monitor_ring.name,
+                "--playback", self.playback_ring.name,
+                "--status", self.status_shm.name,
+                "--jitter-ms", str(jitter_buffer_ms),
+                "--input-device", str(input_device or ""),
+                "--output-device", str(output_device or ""),
+                "--host-api", str(host_api or ""),
+                "--echo-mode", echo_mode,
+                "--echo-duck-db", str(echo_duck_db),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        threading.Thread(target=self._watch_startup, daemon=True).start()
+        
+    def _watch_startup(self):
+        """Give up on a child that doesn't report ready in time"""
+        if not self.started.wait(self.START_TIMEOUT_S) and not self.closed:
+            self._fail(f"audio engine did not start within {self.START_TIMEOUT_S:.0f} s")
+            self.process.kill()
+            
+    def _fail(self, reason: str):
+        if self.failed or self.closed:
+            return
+        self.failed = True
+        self.recording = False
+        print(f"Audio engine process failed: {reason}")
+        if self.on_failure:
+            self.on_failure(reason)
+            
+    def _send(self, line: bytes):
+        with self._send_lock:
+            try:
+                self.process.stdin.write(line + b"\n")
+                self.process.stdin.flush()
+            except (OSError, ValueError):
+                # The child is gone; stats and cleanup report it
+                pass
+                
+    def _command(self, cmd: str, **args):
+        self._send(json.dumps(dict(args, cmd=cmd)).encode("ascii"))
+        
+    def _read_loop(self):
+        """Handle notifications and replies from the child (reader thread)"""
+        for line in self.process.stdout:
+            line = line.rstrip(b"\n")
+            if line == b"c":
+                self._deliver_audio()
+            elif line:
+                message = json.loads(line)
+                event = message.get("event")
+                if event == "ready":
+                    self.started.set()
+                elif event == "error":
+                    print(f"Audio engine: {message.get('message')}")
+                with self._reply_ready:
+                    self._replies[event] = message
+                    self._reply_ready.notify_all()
+        with self._reply_ready:
+            self._replies["exit"] = {}
+            self._reply_ready.notify_all()
+        self._fail("audio engine process exited")
+            
+    def _deliver_audio(self):
+        captured = self.capture_ring.read()
+        if captured and self.recording and self.audio_callback:
+            self.audio_callback(captured)
+        played = self.monitor_ring.read()
+        if played and self.output_callback:
+            self.output_callback(played)
+            
+    def _wait_for(self, event: str, timeout: float) -> dict:
+        deadline = time.monotonic() + timeout
+        with self._reply_ready:
+            while event not in self._replies:
+                if "exit" in self._replies:
+                    raise RuntimeError("audio engine process exited")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"audio engine did not answer ({event})")
+                self._reply_ready.wait(remaining)
+            return self._replies.pop(event)
+            
+    def open_streams(self):
+        self._command("open_streams")
+        
+    def close_streams(self):
+        self.recording = False
+        self._command("close_streams")
+        
+    def start_recording(self, callback: Callable[[bytes], None]):
+        """Start capturing; callback gets 16kHz chunks on the reader thread"""
+        if self.recording:
+            return
+        self.audio_callback = callback
+        self.recording = True
+        self.capture_ring.discard()
+        self._command("start_recording")
+        
+    def stop_recording(self):
+        self.recording = False
+        self._command("stop_recording")
+        
+    def play_audio(self, audio_data: bytes):
+        """Queue 24kHz model audio for the child (safe to call from any thread)"""
+        self.playback_ring.write(audio_data)
+        self._send(b"p")
+        
+    def finish_turn(self):
+        self._command("finish_turn")
+        
+    def interrupt(self, onset_time: Optional[float] = None, confirmed: bool = False):
+        """Barge-in; onset_time is a perf_counter() time, valid across processes"""
+        self._command("interrupt", onset_time=onset_time, confirmed=confirmed)
+        
+    def stop_playback(self):
+        self._command("stop_playback")
+        
+    def status(self, field: str) -> int:
+        return int(self._status[STATUS_FIELDS.index(field)])
+        
+    def playback_stats(self) -> dict:
+        """The child's AudioHandler stats, plus drops on the way to it"""
+        try:
+            self._command("stats")
+            stats = self._wait_for("stats", 2.0).get("stats", {})
+        except Exception as e:
+            stats = {name: self.status(name) for name in STATUS_FIELDS}
+            stats["error"] = str(e)
+        stats["process_dropped_ms"] = int(self.playback_ring.dropped_bytes / 2 / self.MODEL_RATE * 1000)
+        return stats
+        
+    def cleanup(self):
+        """Stop the child process and free the shared memory"""
+        if self.closed:
+            return
+        self.closed = True
+        self.recording = False
+        if self.process.poll() is None:
+            try:
+                self._command("shutdown")
+                self.process.wait(timeout=3.0)
+            except Exception:
+                self.process.kill()
+                self.process.wait()
+        for ring in (self.capture_ring, self.monitor_ring, self.playback_ring):
+            ring.close(unlink=True)
+        self._status = None
+        self.status_shm.close()
+        self.status_shm.unlink()
+        
+    def is_recording(self) -> bool:
+        return self.recording
+        
+    def is_playing(self) -> bool:
+        return self.playback_ring.available() > 0 or self.status("buffered_bytes") > 0
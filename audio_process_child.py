@@ -0,0 +1,182 @@
+"""
+Audio engine child process (started by audio_process.AudioProcess)
+
+Runs as a script in its own interpreter: imports AudioHandler from the
+add-on folder without executing the add-on's __init__.py (which needs
+Anki), then serves commands from stdin until told to shut down. stdout is
+the channel back to the parent; anything printed goes to stderr.
+"""
+
+import argparse
+import importlib
+import importlib.machinery
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+
+# Run as a script, so the add-on folder (and any dependencies installed
+# into it with pip --target) is already on sys.path
+import numpy as np
+
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE = "anki_gemini_live_engine"
+
+STATUS_INTERVAL_S = 0.02
+
+
+def load(module_name: str):
+    """Import an add-on module as part of a stand-in package"""
+    if PACKAGE not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        package = importlib.util.module_from_spec(spec)
+        package.__path__ = [ADDON_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module_name}")
+
+
+class Engine:
+    """Glue between the shared rings, the pipe and an AudioHandler"""
+    
+    def __init__(self, args, channel):
+        audio_process = load("audio_process")
+        self.fields = audio_process.STATUS_FIELDS
+        self.capture_ring = audio_process.SharedRing(name=args.capture)
+        self.monitor_ring = audio_process.SharedRing(name=args.monitor)
+        self.playback_ring = audio_process.SharedRing(name=args.playback)
+        self.status_shm = audio_process._attach(args.status)
+        self.status = np.ndarray((len(self.fields),), dtype=np.int64, buffer=self.status_shm.buf)
+        self.channel = channel
+        self.channel_lock = threading.Lock()
+        self.running = True
+        
+        self.audio_handler = load("audio_handler")
+        self.handler = self.audio_handler.AudioHandler(
+            jitter_buffer_ms=args.jitter_ms,
+            input_device=args.input_device,
+            output_device=args.output_device,
+            host_api=args.host_api,
+            echo_mode=args.echo_mode,
+            echo_duck_db=args.echo_duck_db
+        )
+        self.handler.output_callback = self.on_played
+        
+    def send(self, line: bytes):
+        with self.channel_lock:
+            self.channel.write(line + b"\n")
+            self.channel.flush()
+            
+    def reply(self, event: str, **data):
+        self.send(json.dumps(dict(data, event=event)).encode("ascii"))
+        
+    def on_captured(self, data: bytes):
+        """Record thread: hand a 16kHz chunk to the parent"""
+        self.capture_ring.write(data)
+        self.send(b"c")
+        
+    def on_played(self, data: bytes):
+        """PortAudio thread: copy played audio for the parent's level meter"""
+        self.monitor_ring.write(data)
+        
+    def publish_status(self):
+        """Keep the shared counters current (status thread)"""
+        handler = self.handler
+        while self.running:
+            values = {
+                "buffered_bytes": handler.playback_ring.available(),
+                "underruns": handler.underruns,
+                "device_underflows": handler.device_underflows,
+                "capture_overflows": handler.capture_overflows,
+                "overruns": handler.playback_ring.overruns,
+                "barge_ins": handler.barge_ins,
+                "output_rate": handler.output_rate,
+            }
+            for index, field in enumerate(self.fields):
+                self.status[index] = values[field]
+            time.sleep(STATUS_INTERVAL_S)
+            
+    def serve(self, commands):
+        """Run commands from the parent until shutdown (main thread)"""
+        for line in commands:
+            line = line.strip()
+            if line == b"p":
+                data = self.playback_ring.read()
+                if data:
+                    self.handler.play_audio(data)
+                continue
+            if not line:
+                continue
+            message = json.loads(line)
+            cmd = message.get("cmd")
+            if cmd == "open_streams":
+                self.handler.open_streams()
+            elif cmd == "close_streams":
+                self.playback_ring.discard()
+                self.handler.close_streams()
+            elif cmd == "start_recording":
+                self.handler.start_recording(self.on_captured)
+            elif cmd == "stop_recording":
+                self.handler.stop_recording()
+            elif cmd == "finish_turn":
+                self.handler.finish_turn()
+            elif cmd == "interrupt":
+                # A local barge-in only holds playback; once the server has
+                # confirmed it, audio the parent queued for the turn is void
+                if message.get("confirmed"):
+                    self.playback_ring.discard()
+                self.handler.interrupt(message.get("onset_time"), message.get("confirmed", False))
+            elif cmd == "stop_playback":
+                self.playback_ring.discard()
+                self.handler.stop_playback()
+            elif cmd == "stats":
+                self.reply("stats", stats=self.handler.playback_stats())
+            elif cmd == "shutdown":
+                break
+                
+    def close(self):
+        self.running = False
+        self.handler.cleanup()
+        self.audio_handler.release_pyaudio()
+        self.status = None
+        for ring in (self.capture_ring, self.monitor_ring, self.playback_ring):
+            ring.close()
+        self.status_shm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capture", required=True)
+    parser.add_argument("--monitor", required=True)
+    parser.add_argument("--playback", required=True)
+    parser.add_argument("--status", required=True)
+    parser.add_argument("--jitter-ms", type=int, default=120)
+    parser.add_argument("--input-device", default="")
+    parser.add_argument("--output-device", default="")
+    parser.add_argument("--host-api", default="")
+    parser.add_argument("--echo-mode", default="off")
+    parser.add_argument("--echo-duck-db", type=float, default=24.0)
+    args = parser.parse_args()
+    
+    # stdout belongs to the pipe protocol; prints go to stderr
+    channel = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    
+    try:
+        engine = Engine(args, channel)
+    except Exception as e:
+        channel.write(json.dumps({"event": "error", "message": f"Could not start: {e}"}).encode() + b"\n")
+        channel.flush()
+        return 1
+    threading.Thread(target=engine.publish_status, daemon=True).start()
+    engine.reply("ready", output_rate=engine.handler.output_rate)
+    try:
+        engine.serve(sys.stdin.buffer)
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
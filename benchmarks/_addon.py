@@ -0,0 +1,36 @@
+"""
+Helpers for running benchmarks outside of Anki
+
+Registers the add-on folder as a package without executing its __init__.py
+(which needs aqt), so modules with relative imports can be loaded directly.
+"""
+
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import statistics
+import sys
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "anki_gemini_live"
+
+
+def load(module_name: str):
+    """Import an add-on module, e.g. load("gemini_client")"""
+    if PACKAGE not in sys.modules:
+        spec = importlib.machinery.ModuleSpec(PACKAGE, None, is_package=True)
+        package = importlib.util.module_from_spec(spec)
+        package.__path__ = [ADDON_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(f"{PACKAGE}.{module_name}")
+
+
+def percentiles(values, points=(50, 90, 99)) -> dict:
+    """Return the requested percentiles of a list of numbers"""
+    if not values:
+        return {f"p{p}": None for p in points}
+    if len(values) == 1:
+        return {f"p{p}": values[0] for p in points}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {f"p{p}": cuts[p - 1] for p in points}
@@ -0,0 +1,153 @@
+"""
+Benchmark: echo control on a simulated laptop (speakers next to the mic)
+
+Gemini's synthetic speech is played through a simulated echo path (speaker
+nonlinearity, a few ms of delay, a decaying room response) into the
+microphone, with the user talking over it for a while and alone after
+that. Playback and capture blocks get timestamps with reported latencies
+and jitter, as AudioHandler passes them. For each mode it reports:
+
+- echo loss: how much quieter the uplink is than the raw echo while only
+  Gemini talks (after the first seconds, once the filter has adapted)
+- near-end change: level of the user's voice during double-talk, in dB
+- false starts: speech onsets the VAD detects while only Gemini talks,
+  i.e. would-be self-interruptions; user starts: onsets while the user talks
+- CPU time per second of audio
+
+Usage: python benchmarks/bench_echo.py [echo_gain_db] [seed]
+"""
+
+import math
+import sys
+
+import numpy as np
+
+from _addon import load
+from mock_gemini_server import synth_speech
+
+RATE = 16000
+CHUNK = 1024  # Capture and playback blocks, as AudioHandler delivers them
+OUTPUT_LATENCY = 0.020
+INPUT_LATENCY = 0.010
+JITTER = 0.002
+CONVERGENCE_S = 3.0
+
+# (start s, end s) of each talker
+FAR_END = ((0.5, 9.0), (12.0, 20.0))
+NEAR_END = ((6.0, 9.0), (10.0, 12.0), (15.0, 16.0))
+DURATION_S = 21.0
+
+
+def speech(spans, seed: int, level: float) -> np.ndarray:
+    """Synthetic voice, plus the broadband (fricative) part real speech has"""
+    rng = np.random.default_rng(seed)
+    signal = np.zeros(int(DURATION_S * RATE))
+    for index, (start, end) in enumerate(spans):
+        pcm = synth_speech(int((end - start) * 1000), rate=RATE, seed=seed + index)
+        voiced = np.frombuffer(pcm, dtype=np.int16).astype(np.float64)
+        envelope = np.convolve(np.abs(voiced), np.ones(400) / 400, mode="same")
+        part = (voiced + 0.5 * envelope * rng.normal(0, 1, len(voiced))) * level
+        signal[int(start * RATE):int(start * RATE) + len(part)] = part
+    return signal
+
+
+def echo_path(gain_db: float, seed: int) -> np.ndarray:
+    """Direct sound after 3 ms, then a room tail decaying over ~80 ms"""
+    rng = np.random.default_rng(seed)
+    response = np.zeros(int(0.1 * RATE))
+    response[48] = 1.0
+    tail = rng.normal(0, 1, len(response) - 60) * np.exp(-np.arange(len(response) - 60) / (0.02 * RATE))
+    response[60:] += 0.3 * tail
+    return response * 10 ** (gain_db / 20) / np.sqrt(np.dot(response, response))
+
+
+def mask(spans) -> np.ndarray:
+    active = np.zeros(int(DURATION_S * RATE), dtype=bool)
+    for start, end in spans:
+        active[int(start * RATE):int(end * RATE)] = True
+    return active
+
+
+def simulate(mode: str, far: np.ndarray, near: np.ndarray, mic: np.ndarray, seed: int):
+    """Run one mode; returns the output and the controller (None for off)"""
+    echo_control = load("echo_control")
+    controller = None if mode == "off" else echo_control.EchoController(mode, rate=RATE)
+    rng = np.random.default_rng(seed)
+    # Playback blocks are handed over OUTPUT_LATENCY before they are heard;
+    # capture blocks are read INPUT_LATENCY after they were recorded
+    events = []
+    for start in range(0, len(far), CHUNK):
+        events.append((start / RATE - OUTPUT_LATENCY, 0, start))
+        events.append(((start + CHUNK) / RATE + INPUT_LATENCY, 1, start))
+    out = []
+    for _, kind, start in sorted(events):
+        if kind == 0:
+            if controller:
+                heard_until = (start + CHUNK) / RATE + rng.normal(0, JITTER)
+                controller.add_reference(far[start:start + CHUNK], heard_until)
+            continue
+        pcm = mic[start:start + CHUNK].astype(np.int16).tobytes()
+        if controller:
+            captured_until = (start + CHUNK) / RATE + rng.normal(0, JITTER / 2)
+            pcm = controller.process(pcm, captured_until)
+        out.append(np.frombuffer(pcm, dtype=np.int16))
+    return np.concatenate(out).astype(np.float64), controller
+
+
+def vad_onsets(signal: np.ndarray):
+    vad = load("vad").VoiceActivityDetector(rate=RATE)
+    onsets = []
+    position = [0]
+    vad.on_speech_start = lambda: onsets.append(position[0] / RATE)
+    pcm = signal.astype(np.int16)
+    for start in range(0, len(pcm), CHUNK):
+        position[0] = start
+        vad.process(pcm[start:start + CHUNK].tobytes())
+    return onsets
+
+
+def db(ratio: float) -> float:
+    return 10 * math.log10(ratio) if ratio > 0 else float("-inf")
+
+
+def main():
+    gain_db = float(sys.argv[1]) if len(sys.argv) > 1 else -6.0
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    
+    far = speech(FAR_END, seed=10 * seed, level=1.0)
+    near = speech(NEAR_END, seed=10 * seed + 5, level=0.6)
+    # Small speakers compress loud passages
+    played = np.tanh(far / 24000) * 24000
+    echo = np.convolve(played, echo_path(gain_db, seed))[:len(far)]
+    noise = np.random.default_rng(seed).normal(0, 10, len(far))
+    mic = np.clip(echo + near + noise, -32768, 32767)
+    
+    far_only = mask(FAR_END) & ~mask(NEAR_END)
+    far_only[:int(CONVERGENCE_S * RATE)] = False
+    double_talk = mask(FAR_END) & mask(NEAR_END)
+    near_spans = NEAR_END
+    
+    print(f"echo path gain {gain_db:+.0f} dB, {DURATION_S:.0f} s of audio, "
+          f"latency {OUTPUT_LATENCY * 1000:.0f}+{INPUT_LATENCY * 1000:.0f} ms, jitter {JITTER * 1000:.0f} ms")
+    print(f"{'mode':>5} {'echo loss':>10} {'near-end':>9} {'false starts':>13} {'user starts':>12} {'CPU/s audio':>12}")
+    for mode in ("off", "duck", "gate", "aec"):
+        out, controller = simulate(mode, far, near, mic, seed)
+        length = len(out)
+        loss = db(np.dot(mic[:length][far_only[:length]], mic[:length][far_only[:length]])
+                  / max(np.dot(out[far_only[:length]], out[far_only[:length]]), 1e-9))
+        # Level of the user's voice in the output: projection onto the clean voice
+        clean = near[:length][double_talk[:length]]
+        near_gain = np.dot(out[double_talk[:length]], clean) / np.dot(clean, clean)
+        onsets = vad_onsets(out)
+        false_starts = sum(1 for t in onsets if far_only[min(int(t * RATE), length - 1)]
+                           or not any(s - 0.1 <= t <= e for s, e in near_spans))
+        user_starts = len(onsets) - false_starts
+        cpu = controller.stats()["cpu_ms_per_s"] if controller else 0.0
+        print(f"{mode:>5} {loss:>8.1f} dB {20 * math.log10(max(near_gain, 1e-6)):>6.1f} dB "
+              f"{false_starts:>13} {user_starts:>12} {cpu:>9.2f} ms")
+        if controller:
+            print(f"      {controller.stats()}")
+
+
+if __name__ == "__main__":
+    main()
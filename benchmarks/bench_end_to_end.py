@@ -0,0 +1,295 @@
+"""
+Benchmark: end-to-end review loop against the mock Gemini Live server
+
+Runs GeminiLiveClient, AudioHandler (with its resamplers and jitter
+buffer) and the VAD headless, wired up the way GeminiLiveDialog wires
+them, against benchmarks/mock_gemini_server.py on localhost. PyAudio is
+replaced by file-backed fake devices running in real time: the microphone
+plays back a recorded (or synthetic) answer whenever the simulated user
+speaks, and the speaker consumes blocks from the playback callback and
+notes when sound starts. A simulated user answers each question once it has
+finished playing.
+
+Reports, with percentiles:
+- mic-to-first-audio-byte: end of the user's answer to the first byte of
+  the reply reaching the client, and to the first audible output block
+- time-to-first-question: session start to the first question being heard
+- cards per minute, from the time between consecutive ratings
+- the per-stage latency histograms (see latency.py)
+
+Usage: python benchmarks/bench_end_to_end.py [cards] [delay_ms] [answer.wav]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+from _addon import load, percentiles
+from mock_gemini_server import MockGeminiServer, Script, synth_speech
+
+DEVICE_RATE = 48000
+
+
+class FakeInputStream:
+    """Microphone that plays queued utterances, paced in real time"""
+    
+    def __init__(self, device, rate: int):
+        self.device = device
+        self.rate = rate
+        self.started = time.perf_counter()
+        self.frames_read = 0
+        
+    def read(self, frames: int, exception_on_overflow: bool = True) -> bytes:
+        # Block until the frames would have been captured
+        self.frames_read += frames
+        due = self.started + self.frames_read / self.rate
+        time.sleep(max(0.0, due - time.perf_counter()))
+        return self.device.next_mic_block(frames)
+        
+    def stop_stream(self):
+        pass
+        
+    def close(self):
+        pass
+
+
+class FakeOutputStream:
+    """Speaker driving the playback callback from its own thread"""
+    
+    def __init__(self, device, rate: int, frames: int, callback):
+        self.device = device
+        self.rate = rate
+        self.frames = frames
+        self.callback = callback
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        
+    def _run(self):
+        period = self.frames / self.rate
+        due = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            info = {"current_time": now, "output_buffer_dac_time": now}
+            data, _ = self.callback(None, self.frames, info, 0)
+            self.device.played(data, now)
+            due += period
+            time.sleep(max(0.0, due - time.perf_counter()))
+            
+    def stop_stream(self):
+        self.running = False
+        
+    def close(self):
+        self.running = False
+
+
+class FileBackedAudio:
+    """Stand-in for pyaudio.PyAudio with a scripted mic and a listening speaker"""
+    
+    def __init__(self, answer_pcm: bytes, rate: int = DEVICE_RATE):
+        self.rate = rate
+        self.answer = np.frombuffer(answer_pcm, dtype=np.int16)
+        self.noise = np.random.default_rng(7)
+        self._mic = np.zeros(0, dtype=np.int16)
+        self._lock = threading.Lock()
+        self.speech_ended = threading.Event()
+        self.speech_end_time = 0.0
+        self.onsets = []
+        self._audible = False
+        
+    def get_default_input_device_info(self):
+        return {"defaultSampleRate": float(self.rate)}
+        
+    def get_default_output_device_info(self):
+        return {"defaultSampleRate": float(self.rate)}
+        
+    def open(self, format=None, channels=1, rate=None, input=False, output=False,
+             frames_per_buffer=1024, stream_callback=None):
+        if input:
+            return FakeInputStream(self, rate)
+        return FakeOutputStream(self, rate, frames_per_buffer, stream_callback)
+        
+    def terminate(self):
+        pass
+        
+    def speak(self):
+        """Queue the recorded answer on the microphone"""
+        with self._lock:
+            self.speech_ended.clear()
+            self._mic = np.concatenate((self._mic, self.answer))
+            
+    def next_mic_block(self, frames: int) -> bytes:
+        with self._lock:
+            block, self._mic = self._mic[:frames], self._mic[frames:]
+            finished = len(block) and not len(self._mic)
+        # Room noise around the answer
+        noise = self.noise.normal(0, 30, frames).astype(np.int16)
+        noise[:len(block)] += block
+        if finished:
+            self.speech_end_time = time.perf_counter()
+            self.speech_ended.set()
+        return noise.tobytes()
+        
+    def played(self, data: bytes, now: float):
+        samples = np.frombuffer(data, dtype=np.int16)
+        audible = bool(samples.size) and int(np.abs(samples).max()) > 500
+        if audible and not self._audible:
+            self.onsets.append(now)
+        self._audible = audible
+        
+    def first_onset_after(self, moment: float):
+        return next((t for t in self.onsets if t >= moment), None)
+
+
+class SimulatedReview:
+    """The dialog's wiring without Qt: one client, one audio handler, a VAD"""
+    
+    def __init__(self, endpoint: str, device: FileBackedAudio, cards: int):
+        self.modules = {name: load(name) for name in ("gemini_client", "audio_handler", "vad")}
+        self.device = device
+        self.cards = cards
+        self.audio = self.modules["audio_handler"].AudioHandler(audio=device)
+        rate = self.modules["audio_handler"].AudioHandler.RATE
+        self.vad = self.modules["vad"].VoiceActivityDetector(rate=rate)
+        self.client = self.modules["gemini_client"].GeminiLiveClient(
+            "mock-key", coalesce_ms=100, endpoint=endpoint
+        )
+        
+        self.turns = 0
+        self.rated = 0
+        self.rated_at = []
+        self.first_byte_at = []
+        self.session_started = 0.0
+        self.question_done = threading.Event()
+        self.finished = threading.Event()
+        self._awaiting_reply = False
+        
+    def on_audio(self, data: bytes):
+        if self._awaiting_reply:
+            self._awaiting_reply = False
+            self.first_byte_at.append(time.perf_counter())
+        self.audio.play_audio(data)
+        
+    def on_turn_complete(self):
+        self.audio.finish_turn()
+        self.turns += 1
+        # Question turns alternate with feedback turns; like the dialog, the
+        # next card is sent once the feedback is over so it doesn't cut it off
+        if self.turns % 2:
+            self.question_done.set()
+        elif self.rated < self.cards:
+            self.client.send_text(f"Let's move to the next card. The question is: card {self.rated + 1}.")
+            
+    def on_tool_call(self, name: str, args: dict) -> dict:
+        self.rated += 1
+        self.rated_at.append(time.perf_counter())
+        if self.rated >= self.cards:
+            self.finished.set()
+        return {"result": f"Card rated {args.get('rating')}"}
+        
+    def on_mic(self, data: bytes):
+        for chunk in self.vad.process(data):
+            self.client.send_audio(chunk)
+        if self.vad.speech_ended:
+            self.client.flush_audio()
+            
+    def run(self):
+        self.session_started = time.perf_counter()
+        self.client.connect(
+            on_audio=self.on_audio,
+            on_text=lambda text: None,
+            on_error=lambda error: print(f"client error: {error}"),
+            on_turn_complete=self.on_turn_complete,
+            on_tool_call=self.on_tool_call,
+        )
+        self.client.ready.result(timeout=15)
+        self.audio.start_recording(self.on_mic)
+        self.client.send_text("Let's review this flashcard. The question is: card 1.")
+        
+        speech_ends = []
+        while not self.finished.is_set():
+            if not self.question_done.wait(timeout=30):
+                raise RuntimeError("timed out waiting for a question")
+            self.question_done.clear()
+            # Answer once the question has been heard to the end
+            while self.audio.is_playing():
+                time.sleep(0.005)
+            self.device.speak()
+            self.device.speech_ended.wait(timeout=30)
+            speech_ends.append(self.device.speech_end_time)
+            self._awaiting_reply = True
+            wait_until = time.perf_counter() + 30
+            while self.rated < len(speech_ends) and time.perf_counter() < wait_until:
+                time.sleep(0.005)
+                
+        time.sleep(0.5)
+        self.audio.cleanup()
+        self.client.disconnect()
+        return speech_ends
+
+
+def load_answer(path: str) -> bytes:
+    """16-bit mono WAV at the device rate, or a synthetic 0.9 s answer"""
+    if not path:
+        resampler = load("resampler").StreamingResampler(24000, DEVICE_RATE)
+        return resampler.process(synth_speech(900, seed=99)) + resampler.flush()
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise SystemExit("answer WAV must be 16-bit mono")
+        pcm = wav.readframes(wav.getnframes())
+        rate = wav.getframerate()
+    resampler = load("resampler").StreamingResampler(rate, DEVICE_RATE)
+    return resampler.process(pcm) + resampler.flush()
+
+
+def report(label: str, values, unit: str = "ms", scale: float = 1000.0):
+    points = percentiles([v * scale for v in values])
+    text = "  ".join(f"{k} {v:7.1f}" for k, v in points.items() if v is not None)
+    print(f"{label:>36}: {text} {unit}  (n={len(values)})")
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 40.0
+    answer = load_answer(sys.argv[3] if len(sys.argv) > 3 else "")
+    
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = MockGeminiServer(port=0, script=Script(), delay_ms=delay_ms, jitter_ms=delay_ms / 4)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    print(f"mock server at {server.endpoint}, one-way delay {delay_ms:.0f} ms, {cards} cards\n")
+    
+    latency = load("latency").recorder
+    latency.enable()
+    device = FileBackedAudio(answer)
+    review = SimulatedReview(server.endpoint, device, cards)
+    speech_ends = review.run()
+    
+    first_bytes = [b - e for e, b in zip(speech_ends, review.first_byte_at)]
+    audible = []
+    for end in speech_ends:
+        onset = device.first_onset_after(end)
+        if onset is not None:
+            audible.append(onset - end)
+    first_question = device.first_onset_after(review.session_started)
+    intervals = np.diff(review.rated_at)
+    
+    report("mic-to-first-audio-byte (client)", first_bytes)
+    report("mic-to-first-audible-block", audible)
+    if first_question is not None:
+        report("time-to-first-question", [first_question - review.session_started])
+    report("cards per minute", [60.0 / i for i in intervals], unit="", scale=1.0)
+    if len(review.rated_at) > 1:
+        total = review.rated_at[-1] - review.rated_at[0]
+        print(f"{'overall':>36}: {60.0 * (len(review.rated_at) - 1) / total:.1f} cards/min")
+    print(f"\nper-stage latency (ms):\n{latency.format_table()}")
+    print(f"\nplayback: {review.audio.playback_stats()}")
+    print(f"uplink: {review.client.uplink_stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Microbenchmark: per-chunk enqueue-to-send latency of the uplink path
+
+Compares the old polling path (queue.Queue drained through run_in_executor
+with a 10 ms sleep when empty) with GeminiLiveClient's asyncio.Queue path
+fed by loop.call_soon_threadsafe. A producer thread plays the role of the
+recording thread; a fake socket timestamps every send. Also reports CPU time
+burned by each loop while no audio is flowing.
+
+Usage: python benchmarks/bench_send_path.py [chunks] [interval_ms]
+"""
+
+import asyncio
+import json
+import base64
+import queue
+import sys
+import threading
+import time
+
+from _addon import load, percentiles
+
+CHUNK = b"\x00\x01" * 1024
+
+
+class FakeSocket:
+    """Records the time each message reaches send()"""
+
+    def __init__(self):
+        self.sent_at = []
+
+    async def send(self, message):
+        self.sent_at.append(time.perf_counter())
+
+
+class LegacySender:
+    """The original polling send loop, kept here as the baseline"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.is_connected = True
+        self.audio_queue = queue.Queue()
+        self.loop = None
+
+    def send_audio(self, audio_data):
+        self.audio_queue.put(audio_data)
+
+    async def send_loop(self):
+        while self.is_connected:
+            try:
+                audio_data = await asyncio.get_event_loop().run_in_executor(
+                    None, lambda: self.audio_queue.get(timeout=0.1)
+                )
+                if audio_data is None:
+                    break
+                message = {"realtimeInput": {"mediaChunks": [{
+                    "mimeType": "audio/pcm",
+                    "data": base64.b64encode(audio_data).decode("utf-8"),
+                }]}}
+                await self.ws.send(json.dumps(message))
+            except queue.Empty:
+                await asyncio.sleep(0.01)
+
+    def stop(self):
+        self.is_connected = False
+        self.audio_queue.put(None)
+
+
+class EventDrivenSender:
+    """Drives the real GeminiLiveClient._send_loop against a fake socket"""
+
+    def __init__(self, ws):
+        gemini_client = load("gemini_client")
+        self.client = gemini_client.GeminiLiveClient("benchmark")
+        self.client.ws = ws
+        self.client.is_connected = True
+        self.client.on_error = lambda msg: print(msg)
+
+    def send_audio(self, audio_data):
+        self.client.send_audio(audio_data)
+
+    async def send_loop(self):
+        self.client.loop = asyncio.get_running_loop()
+        self.client.audio_queue = asyncio.Queue()
+        await self.client._send_loop()
+
+    def stop(self):
+        self.client.is_connected = False
+        self.client.loop.call_soon_threadsafe(self.client.audio_queue.put_nowait, None)
+
+
+def run(sender_cls, chunks: int, interval: float, idle: float = 1.0) -> dict:
+    ws = FakeSocket()
+    sender = sender_cls(ws)
+    loop = asyncio.new_event_loop()
+    done = threading.Event()
+
+    def loop_thread():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(sender.send_loop())
+        done.set()
+
+    thread = threading.Thread(target=loop_thread, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+
+    # Idle CPU: nothing is enqueued, only the send loop is running
+    cpu_start = time.process_time()
+    time.sleep(idle)
+    idle_cpu = (time.process_time() - cpu_start) / idle
+
+    enqueued_at = []
+    for _ in range(chunks):
+        enqueued_at.append(time.perf_counter())
+        sender.send_audio(CHUNK)
+        time.sleep(interval)
+    while len(ws.sent_at) < chunks:
+        time.sleep(0.01)
+
+    sender.stop()
+    done.wait(timeout=2.0)
+
+    latencies = [(s - e) * 1e6 for e, s in zip(enqueued_at, ws.sent_at)]
+    result = {k: round(v, 1) for k, v in percentiles(latencies).items()}
+    result["idle_cpu_pct"] = round(idle_cpu * 100, 2)
+    return result
+
+
+def main():
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    interval = (float(sys.argv[2]) if len(sys.argv) > 2 else 5.0) / 1000
+
+    print(f"{chunks} chunks, {interval * 1000:.1f} ms apart; latency in microseconds")
+    for name, sender_cls in (("polling (before)", LegacySender),
+                             ("event-driven (after)", EventDrivenSender)):
+        print(f"{name:>22}: {run(sender_cls, chunks, interval)}")
+
+
+if __name__ == "__main__":
+    main()
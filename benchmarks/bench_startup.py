@@ -0,0 +1,102 @@
+"""
+Benchmark: what the add-on adds to Anki's startup
+
+Each measurement runs in a fresh interpreter so imports are cold. The
+modules Anki imports with the add-on at profile load are timed as they are
+now (connection manager and system instruction only) and as they were
+before imports were deferred (the client with websockets and the dialog's
+audio stack with numpy and PyAudio). PyAudio() initialization, which used to
+run each time the dialog opened and now runs once in the background, is
+timed separately. Modules that need aqt are only included when it can be
+imported (run with Anki's Python to get the full picture).
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY = ("asyncio", "websockets", "numpy", "pyaudio", "aqt")
+
+# Imported by the add-on at profile load, besides aqt itself
+STARTUP_NOW = ["connection_manager", "system_instruction"]
+STARTUP_BEFORE = [
+    "connection_manager", "gemini_client", "audio_handler", "audio_process",
+    "grader", "latency", "vad",
+]
+NEEDS_AQT = ["main", "gemini_live_dialog"]
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {bench_dir!r})
+from _addon import load
+started = time.perf_counter()
+for name in {modules!r}:
+    load(name)
+result = {{"ms": (time.perf_counter() - started) * 1000}}
+if {init_audio!r}:
+    started = time.perf_counter()
+    load("audio_handler").shared_pyaudio()
+    result["init_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    load("audio_handler").shared_pyaudio()
+    result["reuse_ms"] = (time.perf_counter() - started) * 1000
+result["loaded"] = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps(result))
+"""
+
+
+def probe(modules, init_audio: bool = False) -> dict:
+    code = PROBE.format(bench_dir=BENCH_DIR, modules=modules, init_audio=init_audio, heavy=HEAVY)
+    done = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if done.returncode:
+        error = done.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else "probe failed")
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def importable(module: str) -> bool:
+    return subprocess.run([sys.executable, "-c", f"import {module}"], capture_output=True).returncode == 0
+
+
+def measure(label: str, modules, runs: int, init_audio: bool = False):
+    try:
+        results = [probe(modules, init_audio) for _ in range(runs)]
+    except RuntimeError as e:
+        print(f"{label:>34}: skipped ({e})")
+        return
+    ms = statistics.median(r["ms"] for r in results)
+    loaded = ", ".join(results[0]["loaded"]) or "-"
+    print(f"{label:>34}: {ms:8.1f} ms   heavy modules loaded: {loaded}")
+    if init_audio:
+        init_ms = statistics.median(r["init_ms"] for r in results)
+        reuse_ms = statistics.median(r["reuse_ms"] for r in results)
+        print(f"{'PyAudio() initialization':>34}: {init_ms:8.1f} ms   (shared instance reused in {reuse_ms:.3f} ms)")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    has_aqt = importable("aqt")
+    now, before = list(STARTUP_NOW), list(STARTUP_BEFORE)
+    if has_aqt:
+        now = ["main"]
+        before += NEEDS_AQT
+    else:
+        print("aqt not importable: main and the dialog are left out\n")
+        
+    print(f"Cold imports, median of {runs} fresh interpreters")
+    measure("baseline (interpreter only)", [], runs)
+    measure("at profile load, deferred (now)", now, runs)
+    measure("at profile load, eager (before)", before, runs)
+    if importable("pyaudio"):
+        measure("audio warm-up (background)", ["audio_handler"], runs, init_audio=True)
+    else:
+        print(f"{'audio warm-up (background)':>34}: skipped (pyaudio not installed)")
+
+
+if __name__ == "__main__":
+    main()
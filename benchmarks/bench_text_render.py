@@ -0,0 +1,140 @@
+"""
+Benchmark: card HTML to speech text throughput
+
+Renders a synthetic 10k-note corpus (styled templates, cloze deletions,
+sound tags, entities, nested block markup) with the old regex/replace
+_strip_html and with SpeechTextRenderer, both cold and from the LRU cache,
+then compares a review session: the old path rendered each card once when
+it was shown, the renderer is driven the way CardPresenter refreshes its
+lookahead buffer.
+The fake cards return pre-built HTML, so the numbers leave out the template
+render a cache hit also saves inside Anki.
+
+Usage: python benchmarks/bench_text_render.py [notes]
+"""
+
+import random
+import sys
+import time
+
+from _addon import load
+
+STYLE = "<style>.card { font-family: arial; font-size: 20px; color: black; }</style>"
+WORDS = ("mitochondria energy cell membrane protein synthesis nucleus "
+         "enzyme catalyst reaction equilibrium entropy photon velocity").split()
+
+
+def legacy_strip_html(html: str) -> str:
+    """The original CardPresenter._strip_html, kept as the baseline"""
+    import re
+    
+    text = re.sub(r'<[^>]+>', '', html)
+    text = text.replace('&nbsp;', ' ')
+    text = text.replace('&lt;', '<')
+    text = text.replace('&gt;', '>')
+    text = text.replace('&amp;', '&')
+    text = text.replace('&quot;', '"')
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+class FakeNote:
+    def __init__(self, mod):
+        self.mod = mod
+
+
+class FakeCard:
+    """Just enough of anki.cards.Card for SpeechTextRenderer.render_card"""
+    
+    def __init__(self, card_id, question, answer):
+        self.id = card_id
+        self._note = FakeNote(1700000000 + card_id)
+        self._question = question
+        self._answer = answer
+        
+    def note(self):
+        return self._note
+        
+    def question(self):
+        return self._question
+        
+    def answer(self):
+        return self._answer
+
+
+def make_corpus(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    cards = []
+    for card_id in range(count):
+        words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30)))
+        term = rng.choice(WORDS)
+        front = (
+            f"{STYLE}<div class=front>What does <b>{term}</b>&nbsp;do?<br>"
+            f"<i>{words}</i> &mdash; <span class=cloze>[...]</span></div>"
+            f"[sound:rec_{card_id}.mp3]"
+        )
+        back = (
+            f"{front}<hr id=answer><div>{words}</div><ul><li>{term} &amp; "
+            f"{rng.choice(WORDS)}</li><li>&lt;{rng.choice(WORDS)}&gt;</li></ul>"
+        )
+        cards.append(FakeCard(card_id, front, back))
+    return cards
+
+
+def timed(label: str, count: int, fn, unit: str = "sides"):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:>28}: {count / elapsed:>10.0f} {unit}/s  ({elapsed * 1000:.1f} ms)")
+    return elapsed
+
+
+def main():
+    notes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    text_render = load("text_render")
+    cards = make_corpus(notes)
+    sides = notes * 2
+    print(f"{notes} notes, {sides} card sides")
+    
+    base = timed("legacy _strip_html", sides, lambda: [
+        (legacy_strip_html(c.question()), legacy_strip_html(c.answer())) for c in cards
+    ])
+    
+    renderer = text_render.SpeechTextRenderer(cache_size=sides)
+    uncached = timed("renderer (uncached)", sides, lambda: [
+        (renderer.render(c.question(), text_render.QUESTION),
+         renderer.render(c.answer(), text_render.ANSWER)) for c in cards
+    ])
+    cold = timed("renderer (cold cache)", sides, lambda: [
+        (renderer.render_card(c, text_render.QUESTION),
+         renderer.render_card(c, text_render.ANSWER)) for c in cards
+    ])
+    warm = timed("renderer (warm cache)", sides, lambda: [
+        (renderer.render_card(c, text_render.QUESTION),
+         renderer.render_card(c, text_render.ANSWER)) for c in cards
+    ])
+    print(f"speed-up vs legacy: uncached {base / uncached:.2f}x, cold {base / cold:.2f}x, "
+          f"warm {base / warm:.2f}x")
+    
+    # Review session: the old CardPresenter stripped both sides of a card
+    # once, when it was shown. The lookahead buffer is refreshed after every
+    # answer, so each card is rendered once per position in the window; all
+    # but the first of those are cache hits
+    window = 5
+    reviewed = notes - window
+    print(f"\nreview session of {reviewed} cards, lookahead window of {window}")
+    base = timed("legacy _strip_html", reviewed, lambda: [
+        (legacy_strip_html(c.question()), legacy_strip_html(c.answer()))
+        for c in cards[:reviewed]
+    ], unit="cards")
+    renderer = text_render.SpeechTextRenderer()
+    session = timed("renderer, lookahead", reviewed, lambda: [
+        (renderer.render_card(c, text_render.QUESTION),
+         renderer.render_card(c, text_render.ANSWER))
+        for i in range(reviewed) for c in cards[i:i + window]
+    ], unit="cards")
+    print(f"speed-up vs legacy: {base / session:.2f}x (renders now run in the background prefetch)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Microbenchmark: serializing realtimeInput audio messages
+
+Compares the previous send path (nested dict, base64 -> str, json.dumps,
+then the UTF-8 encode websockets does for str messages) with
+RealtimeAudioEncoder, which splices base64 into a pre-serialized template
+held in a reused buffer. Reports messages per second and the memory
+allocated transiently per message (tracemalloc peak above the baseline).
+
+Usage: python benchmarks/bench_uplink_encoder.py [messages] [chunks_per_message]
+"""
+
+import base64
+import json
+import sys
+import time
+import tracemalloc
+
+from _addon import load
+
+CHUNK = bytes(range(256)) * 8  # 2048 bytes, one 64 ms chunk at 16 kHz
+
+
+def legacy_encode(chunks):
+    """The original path, up to the bytes handed to the socket"""
+    audio_data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    message = json.dumps({
+        "realtimeInput": {
+            "mediaChunks": [{
+                "mimeType": "audio/pcm",
+                "data": base64.b64encode(audio_data).decode('utf-8')
+            }]
+        }
+    })
+    return message.encode("utf-8")
+
+
+def throughput(encode, chunks, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        encode(chunks)
+    return count / (time.perf_counter() - started)
+
+
+def transient_bytes(encode, chunks, count: int = 200) -> float:
+    """Average peak memory allocated while building one message"""
+    encode(chunks)  # Let reused buffers reach their size first
+    tracemalloc.start()
+    total = 0
+    for _ in range(count):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        encode(chunks)
+        total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return total / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per_message = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    
+    encoder = load("uplink_encoder").RealtimeAudioEncoder()
+    chunks = [CHUNK] * per_message
+    assert json.loads(bytes(encoder.encode(chunks))) == json.loads(legacy_encode(chunks))
+    
+    print(f"{count} messages of {per_message} x {len(CHUNK)} byte chunks")
+    for name, encode in (("dict + json.dumps (before)", legacy_encode),
+                         ("template encoder (after)", encoder.encode)):
+        rate = throughput(encode, chunks, count)
+        allocated = transient_bytes(encode, chunks)
+        print(f"{name:>28}: {rate:>9.0f} msg/s  {1e6 / rate:6.2f} us/msg  "
+              f"{allocated:>7.0f} B allocated/msg")
+
+
+if __name__ == "__main__":
+    main()
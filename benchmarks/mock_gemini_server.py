@@ -0,0 +1,274 @@
+"""
+Local stand-in for the Gemini Live API
+
+Speaks the same WebSocket protocol as the real endpoint: setup /
+setupComplete, realtimeInput audio, clientContent text turns, serverContent
+model turns with inline 24 kHz PCM, toolCall / toolResponse and
+sessionResumptionUpdate. The "model" follows a script: every text turn is
+answered with a spoken question, and every user utterance (found with a
+simple energy detector on the uplink audio) with a rate_card call followed
+by spoken feedback. As on the real server, a clientContent or the start of
+user speech cancels the turn in progress with an "interrupted" message.
+Speech is synthetic. Each direction can be given a one-way network delay
+with jitter.
+
+Usage: python benchmarks/mock_gemini_server.py [--port 8765] [--delay-ms 40]
+Then point the add-on at it with "gemini_endpoint": "ws://127.0.0.1:8765".
+"""
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import random
+import time
+import uuid
+
+import numpy as np
+import websockets
+
+OUTPUT_RATE = 24000
+INPUT_RATE = 16000
+
+
+class Script:
+    """What the mock model says and how fast it says it"""
+    
+    def __init__(self, question_ms: int = 1200, feedback_ms: int = 1500,
+                 think_ms: int = 250, ratings=("good", "hard", "good", "easy", "again"),
+                 chunk_ms: int = 40, speed: float = 2.0):
+        self.question_ms = question_ms
+        self.feedback_ms = feedback_ms
+        # Model latency before the first audio chunk of a turn
+        self.think_ms = think_ms
+        self.ratings = itertools.cycle(ratings)
+        self.chunk_ms = chunk_ms
+        # Generation speed relative to real time (the real API runs ahead)
+        self.speed = speed
+
+
+def synth_speech(duration_ms: int, rate: int = OUTPUT_RATE, seed: int = 0) -> bytes:
+    """Voice-like test signal: a gliding harmonic tone with syllable envelope"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(rate * duration_ms / 1000)) / rate
+    pitch = 160 + 30 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, 6))
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t) ** 2
+    ramp = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02) if len(t) else t
+    signal = 7000 * voice * envelope * ramp
+    return signal.astype(np.int16).tobytes()
+
+
+class UtteranceDetector:
+    """Finds the end of user speech in the uplink audio"""
+    
+    def __init__(self, threshold_db: float = -40.0, end_silence_ms: int = 300,
+                 min_speech_ms: int = 200):
+        self.threshold = 32768 * 10 ** (threshold_db / 20)
+        self.end_silence_ms = end_silence_ms
+        self.min_speech_ms = min_speech_ms
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+        
+    def feed(self, pcm: bytes):
+        """Return "start", "end" or None for a chunk of 16 kHz PCM"""
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        if not samples.size:
+            return None
+        duration = samples.size / INPUT_RATE * 1000
+        loud = np.sqrt(np.mean(samples * samples)) > self.threshold
+        if loud:
+            started = self.speech_ms == 0
+            self.speech_ms += duration
+            self.silence_ms = 0.0
+            return "start" if started else None
+        if self.speech_ms:
+            self.silence_ms += duration
+            if self.silence_ms >= self.end_silence_ms:
+                done = self.speech_ms >= self.min_speech_ms
+                self.speech_ms = self.silence_ms = 0.0
+                return "end" if done else None
+        return None
+
+
+class MockSession:
+    """One client connection"""
+    
+    def __init__(self, ws, script: Script, delay_ms: float, jitter_ms: float):
+        self.ws = ws
+        self.script = script
+        self.delay = delay_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.outgoing = asyncio.Queue()
+        self.incoming = asyncio.Queue()
+        self.requests = asyncio.Queue()
+        self.tool_responses = asyncio.Queue()
+        self.detector = UtteranceDetector()
+        self.speaking = False
+        self.in_turn = False
+        self.interrupted = False
+        self.tools = set()
+        self._last_send_at = 0.0
+        self._last_recv_at = 0.0
+        self._turns = 0
+        
+    def _deadline(self, last: float) -> float:
+        """Arrival time after the link delay, never overtaking earlier messages"""
+        at = time.monotonic() + self.delay + random.uniform(0, self.jitter)
+        return max(at, last)
+        
+    def send(self, message: dict):
+        self._last_send_at = self._deadline(self._last_send_at)
+        self.outgoing.put_nowait((self._last_send_at, json.dumps(message)))
+        
+    async def run(self):
+        tasks = [
+            asyncio.ensure_future(self._sender()),
+            asyncio.ensure_future(self._processor()),
+            asyncio.ensure_future(self._model()),
+        ]
+        try:
+            async for raw in self.ws:
+                self._last_recv_at = self._deadline(self._last_recv_at)
+                self.incoming.put_nowait((self._last_recv_at, raw))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+                
+    async def _sender(self):
+        while True:
+            at, message = await self.outgoing.get()
+            await asyncio.sleep(max(0.0, at - time.monotonic()))
+            await self.ws.send(message)
+            
+    async def _processor(self):
+        """Handle client messages once their link delay has passed"""
+        while True:
+            at, raw = await self.incoming.get()
+            await asyncio.sleep(max(0.0, at - time.monotonic()))
+            self._handle(json.loads(raw))
+            
+    def _handle(self, data: dict):
+        if "setup" in data:
+            setup = data["setup"]
+            for tool in setup.get("tools", []):
+                for declaration in tool.get("functionDeclarations", []):
+                    self.tools.add(declaration["name"])
+            self.send({"setupComplete": {}})
+            if "sessionResumption" in setup:
+                self.send({"sessionResumptionUpdate": {
+                    "newHandle": uuid.uuid4().hex, "resumable": True
+                }})
+        elif "clientContent" in data:
+            # New text cancels whatever the model is doing
+            if self.in_turn:
+                self.interrupted = True
+            self.requests.put_nowait("question")
+        elif "realtimeInput" in data:
+            for chunk in data["realtimeInput"].get("mediaChunks", []):
+                event = self.detector.feed(base64.b64decode(chunk["data"]))
+                if event == "start" and self.speaking:
+                    self.interrupted = True
+                elif event == "end":
+                    self.requests.put_nowait("answer")
+        elif "toolResponse" in data:
+            self.tool_responses.put_nowait(data["toolResponse"])
+            
+    async def _model(self):
+        """Answer requests one turn at a time"""
+        while True:
+            kind = await self.requests.get()
+            self.in_turn = True
+            self.interrupted = False
+            await asyncio.sleep(self.script.think_ms / 1000)
+            if kind == "answer" and "rate_card" in self.tools and not self.interrupted:
+                self.send({"toolCall": {"functionCalls": [{
+                    "id": uuid.uuid4().hex,
+                    "name": "rate_card",
+                    "args": {"rating": next(self.script.ratings)},
+                }]}})
+                try:
+                    await asyncio.wait_for(self.tool_responses.get(), 10)
+                except asyncio.TimeoutError:
+                    pass
+            duration = self.script.question_ms if kind == "question" else self.script.feedback_ms
+            await self._speak(synth_speech(duration, seed=self._turns))
+            self.in_turn = False
+            self._turns += 1
+            
+    async def _speak(self, pcm: bytes):
+        """Stream a model turn as inline PCM, paced at script.speed x real time"""
+        self.speaking = True
+        chunk_bytes = OUTPUT_RATE * self.script.chunk_ms // 1000 * 2
+        pace = self.script.chunk_ms / 1000 / self.script.speed
+        started = time.monotonic()
+        for index, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+            if self.interrupted:
+                self.send({"serverContent": {"interrupted": True}})
+                break
+            self.send({"serverContent": {"modelTurn": {"parts": [{"inlineData": {
+                "mimeType": f"audio/pcm;rate={OUTPUT_RATE}",
+                "data": base64.b64encode(pcm[offset:offset + chunk_bytes]).decode("ascii"),
+            }}]}}})
+            await asyncio.sleep(max(0.0, started + (index + 1) * pace - time.monotonic()))
+        self.send({"serverContent": {"turnComplete": True}})
+        self.speaking = False
+
+
+class MockGeminiServer:
+    """Serves MockSessions on ws://host:port (any path)"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, script: Script = None,
+                 delay_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.script = script or Script()
+        self.delay_ms = delay_ms
+        self.jitter_ms = jitter_ms
+        self.sessions = 0
+        self._server = None
+        
+    @property
+    def endpoint(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+        
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=10**7)
+        # Port 0 picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        
+    async def _handle(self, ws, *args):
+        self.sessions += 1
+        await MockSession(ws, self.script, self.delay_ms, self.jitter_ms).run()
+
+
+async def serve(args):
+    server = MockGeminiServer(args.host, args.port, delay_ms=args.delay_ms, jitter_ms=args.jitter_ms)
+    await server.start()
+    print(f"Mock Gemini Live listening on {server.endpoint} "
+          f"(one-way delay {args.delay_ms} ms + up to {args.jitter_ms} ms jitter)")
+    await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,23 @@
 Card Presenter - Handles Anki card interactions
 """
 
-from typing import Optional
+from typing import Callable, List, Optional
 from anki.cards import Card
 from anki.collection import Collection
 from aqt import mw
+from aqt.operations import QueryOp
+
+from .review_queue import ReviewQueue
+from .text_render import SpeechTextRenderer, QUESTION, ANSWER
+
+
+class PreparedCard:
+    """A due card with its question and answer text already rendered"""
+    
+    def __init__(self, card: Card, question: str, answer: str):
+        self.card = card
+        self.question = question
+        self.answer = answer
 
 
 class CardPresenter:
@@ -14,70 +27,162 @@ class CardPresenter:
     def __init__(self, col: Collection, config: dict):
         self.col = col
         self.config = config
+        self.prefetch_count = max(1, config.get("card_prefetch_count", 5))
+        self.renderer = SpeechTextRenderer(config.get("render_cache_size", 2048))
+        
+        # Lookahead buffer of rendered due cards, refreshed in the background
+        # after every answer
+        self._buffer: List[PreparedCard] = []
+        self._generation = 0
+        self._fetching = False
+        self._waiting: List[Callable[[Optional[PreparedCard]], None]] = []
+        
+        # Answers are written behind the session in batches
+        self.reviews = ReviewQueue(
+            col,
+            batch_size=config.get("review_batch_size", 5),
+            delay_ms=config.get("review_commit_delay_ms", 2000)
+        )
+        self.reviews.on_committed = self._on_reviews_committed
+        
+    def request_next_card(self, callback: Callable[[Optional[PreparedCard]], None]):
+        """Hand the next due card to callback (None when nothing is due).
+        
+        Served straight from the lookahead buffer, even while it is being
+        refreshed; callback only waits for the background fetch (and runs on
+        the main thread when it finishes) if the buffer has run dry.
+        """
+        prepared = self._take_next()
+        if prepared:
+            callback(prepared)
+            return
+            
+        self._waiting.append(callback)
+        if not self._fetching:
+            self.prefetch()
+            
+    def prefetch(self):
+        """Refill the lookahead buffer in the background"""
+        self._fetching = True
+        generation = self._generation
+        # Answered cards stay in the scheduler's queue until committed
+        skip = self.reviews.pending_ids()
+        
+        QueryOp(
+            parent=mw,
+            op=lambda col: self._fetch_due_cards(col, skip),
+            success=lambda cards: self._on_prefetched(generation, cards),
+        ).failure(self._on_prefetch_failed).run_in_background()
         
-    def get_next_card(self) -> Optional[Card]:
-        """Get the next card due for review"""
-        # Use Anki's scheduler to get the next card
-        card = self.col.sched.getCard()
-        return card
+    def invalidate(self):
+        """Drop buffered cards; the scheduler queue has changed"""
+        self._generation += 1
+        
+    def _fetch_due_cards(self, col: Collection, skip: set) -> List[PreparedCard]:
+        """Fetch and render the next due cards (runs off the UI thread)"""
+        if col.v3_scheduler():
+            queued = col.sched.get_queued_cards(fetch_limit=self.prefetch_count + len(skip))
+            entries = [entry for entry in queued.cards if entry.card.id not in skip]
+            cards = []
+            for entry in entries[:self.prefetch_count]:
+                card = Card(col, backend_card=entry.card)
+                # Needed to answer the card; renamed from next_states in 2.1.55
+                card.scheduling_states = getattr(entry, "states", None) or entry.next_states
+                cards.append(card)
+        else:
+            card = col.sched.getCard()
+            cards = [card] if card else []
+            
+        # Cards still queued since the last fetch come out of the render cache
+        return [
+            PreparedCard(card, self.get_card_question(card), self.get_card_answer(card))
+            for card in cards
+        ]
+        
+    def _on_prefetched(self, generation: int, cards: List[PreparedCard]):
+        """Store fetched cards, and refetch if an answer made them stale"""
+        self._buffer = cards
+        if generation != self._generation:
+            self.prefetch()
+        else:
+            self._fetching = False
+            
+        if not self._waiting:
+            return
+        prepared = self._take_next()
+        if prepared or not self._fetching:
+            waiting, self._waiting = self._waiting, []
+            for callback in waiting:
+                callback(prepared)
+            
+    def _on_prefetch_failed(self, error: Exception):
+        self._fetching = False
+        print(f"Card prefetch error: {error}")
+        waiting, self._waiting = self._waiting, []
+        for callback in waiting:
+            callback(None)
+            
+    def _take_next(self) -> Optional[PreparedCard]:
+        """Return the head of the buffer with its review timer started"""
+        # Cards answered since the buffer was filled may still be in it
+        skip = self.reviews.pending_ids()
+        self._buffer = [prepared for prepared in self._buffer if prepared.card.id not in skip]
+        if not self._buffer:
+            return None
+        prepared = self._buffer[0]
+        prepared.card.start_timer()
+        return prepared
         
     def get_card_question(self, card: Card) -> str:
         """Extract the question from a card"""
         if not card:
             return ""
             
-        # Get the question side of the card
-        question = card.question()
-        
-        # Strip HTML tags for cleaner text presentation
-        question = self._strip_html(question)
-        
-        return question
+        # Render the question side as plain speech text
+        return self.renderer.render_card(card, QUESTION)
         
     def get_card_answer(self, card: Card) -> str:
         """Extract the answer from a card"""
         if not card:
             return ""
             
-        # Get the answer side of the card
-        answer = card.answer()
-        
-        # Strip HTML tags
-        answer = self._strip_html(answer)
-        
-        return answer
+        # Render the answer side, without the repeated question
+        return self.renderer.render_card(card, ANSWER)
         
     def answer_card(self, card: Card, ease: int):
-        """Answer the card with the given ease"""
+        """Answer the card with the given ease.
+        
+        Only records the answer; it is written to the collection in the
+        background shortly after (see ReviewQueue).
+        """
         if not card:
             return
             
         # Ease values: 1=Again, 2=Hard, 3=Good, 4=Easy
-        # Use Anki's scheduler to answer the card
-        self.col.sched.answerCard(card, ease)
-        
-        # Save changes to database
-        self.col.autosave()
-        
-    def _strip_html(self, html: str) -> str:
-        """Strip HTML tags from text"""
-        import re
-        
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', html)
-        
-        # Replace common HTML entities
-        text = text.replace('&nbsp;', ' ')
-        text = text.replace('&lt;', '<')
-        text = text.replace('&gt;', '>')
-        text = text.replace('&amp;', '&')
-        text = text.replace('&quot;', '"')
-        
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        
-        return text.strip()
+        self.reviews.add(card, ease, getattr(card, "scheduling_states", None))
+        self._buffer = [prepared for prepared in self._buffer if prepared.card.id != card.id]
         
+        # The queue has changed; the next card still comes from the buffer
+        # while the lookahead is refreshed in the background (pending cards
+        # are left out of it)
+        self.invalidate()
+        if not self._fetching:
+            self.prefetch()
+            
+    def flush_reviews(self, wait: bool = False):
+        """Write queued answers now; wait=True commits on this thread"""
+        if wait:
+            self.reviews.flush_now()
+        else:
+            self.reviews.flush()
+            
+    def _on_reviews_committed(self):
+        """The legacy scheduler only moves on once answers are written"""
+        if not self.col.v3_scheduler():
+            self.invalidate()
+            if not self._fetching:
+                self.prefetch()
+                
     def get_cards_due_count(self) -> int:
         """Get the number of cards due for review"""
         counts = self.col.sched.counts()
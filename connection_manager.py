@@ -0,0 +1,163 @@
+"""
+Connection manager - Owns Gemini Live connections at add-on level
+Keeps one event loop thread alive across dialogs and pre-warms sockets
+"""
+
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    # Imported on first connection, not with Anki: asyncio and websockets
+    # alone take tens of milliseconds to import
+    import asyncio
+    from .gemini_client import GeminiLiveClient
+
+
+class ConnectionManager:
+    """Hands out Gemini Live clients running on a shared event loop.
+    
+    A client can be opened ahead of time (TLS + WebSocket handshake and
+    session setup done) so starting a session only attaches callbacks. When
+    a session ends, the next connection is warmed up right away. The warm
+    socket and the loop thread are dropped after idle_timeout seconds
+    without use.
+    """
+    
+    def __init__(self, idle_timeout: float = 120.0):
+        self.idle_timeout = idle_timeout
+        self.loop: Optional["asyncio.AbstractEventLoop"] = None
+        self.thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._warm: Optional["GeminiLiveClient"] = None
+        self._warm_key = None
+        self._active = 0
+        self._idle_timer = None
+        
+    def prewarm(self, config: dict, system_instruction: str):
+        """Open a connection in the background if none is warm already"""
+        if not config.get("gemini_api_key") or not config.get("prewarm_connection", True):
+            return
+        self.idle_timeout = config.get("connection_idle_timeout_s", self.idle_timeout)
+        
+        key = self._key(config, system_instruction)
+        with self._lock:
+            if self._warm and self._warm_key == key and self._warm.is_usable():
+                self._schedule_eviction()
+                return
+            stale = self._warm
+            self._warm = self._create_client(config)
+            self._warm_key = key
+            self._warm.open(system_instruction, loop=self._ensure_loop())
+            self._schedule_eviction()
+            
+        if stale:
+            stale.disconnect()
+            
+    def acquire(self, config: dict, system_instruction: str) -> "GeminiLiveClient":
+        """Return a client for a new session, reusing the warm one if it fits"""
+        key = self._key(config, system_instruction)
+        with self._lock:
+            client, self._warm = self._warm, None
+            warm_key = self._warm_key
+            self._active += 1
+            self._cancel_eviction()
+            loop = self._ensure_loop()
+            
+        if client and (warm_key != key or not client.is_usable()):
+            client.disconnect()
+            client = None
+        if not client:
+            client = self._create_client(config)
+            client.open(system_instruction, loop=loop)
+        return client
+        
+    def release(self, client: "GeminiLiveClient", config: Optional[dict] = None,
+                system_instruction: str = ""):
+        """Close a finished session's client and warm up the next one"""
+        client.disconnect()
+        with self._lock:
+            self._active = max(0, self._active - 1)
+        if config:
+            self.prewarm(config, system_instruction)
+        with self._lock:
+            self._schedule_eviction()
+            
+    def shutdown(self):
+        """Close the warm connection and stop the loop thread"""
+        with self._lock:
+            self._evict()
+            
+    def _create_client(self, config: dict) -> "GeminiLiveClient":
+        from .gemini_client import GeminiLiveClient
+        return GeminiLiveClient(
+            config["gemini_api_key"],
+            coalesce_ms=config.get("uplink_coalesce_ms", 100),
+            max_coalesce_ms=config.get("uplink_max_coalesce_ms", 200),
+            max_reconnect_attempts=config.get("reconnect_attempts", 5),
+            outage_buffer_ms=config.get("reconnect_buffer_ms", 5000),
+            endpoint=config.get("gemini_endpoint", ""),
+            input_transcription=config.get("local_grading", True)
+        )
+        
+    def _key(self, config: dict, system_instruction: str) -> tuple:
+        """Settings a warm connection must match to be reused"""
+        return (
+            config.get("gemini_api_key"),
+            config.get("gemini_endpoint", ""),
+            config.get("local_grading", True),
+            system_instruction,
+            config.get("uplink_coalesce_ms", 100),
+            config.get("uplink_max_coalesce_ms", 200),
+        )
+        
+    def _ensure_loop(self) -> "asyncio.AbstractEventLoop":
+        """Start the shared loop thread if it isn't running (lock held)"""
+        if self.loop and self.thread and self.thread.is_alive():
+            return self.loop
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run_loop, args=(self.loop,), daemon=True
+        )
+        self.thread.start()
+        return self.loop
+        
+    def _run_loop(self, loop: "asyncio.AbstractEventLoop"):
+        import asyncio
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+        loop.close()
+        
+    def _schedule_eviction(self):
+        """(Re)start the idle timer (lock held)"""
+        self._cancel_eviction()
+        if self._active or not self.loop:
+            return
+        timer = threading.Timer(self.idle_timeout, self._on_idle)
+        timer.daemon = True
+        timer.start()
+        self._idle_timer = timer
+        
+    def _cancel_eviction(self):
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+            
+    def _on_idle(self):
+        with self._lock:
+            if not self._active:
+                self._evict()
+                
+    def _evict(self):
+        """Drop the warm connection and stop the loop if unused (lock held)"""
+        self._cancel_eviction()
+        if self._warm:
+            self._warm.disconnect()
+            self._warm = None
+        if self._active or not self.loop:
+            return
+        loop = self.loop
+        self.loop = None
+        self.thread = None
+        # Let the socket close handshake run before the loop stops
+        loop.call_soon_threadsafe(loop.call_later, 1.0, loop.stop)
@@ -0,0 +1,327 @@
+"""
+Echo control
+Keeps Gemini's own voice, picked up by the microphone, out of the uplink
+"""
+
+import math
+import time
+
+import numpy as np
+
+# off: microphone passed through (headphones)
+# duck / gate: attenuate / mute the microphone while only Gemini talks
+# aec: adaptive echo cancellation, then ducking of what's left
+MODES = ("off", "duck", "gate", "aec")
+
+
+class BlockNlms:
+    """Partitioned-block frequency-domain NLMS filter (overlap-save).
+    
+    Models the echo path (speaker, room, microphone) as an FIR filter of
+    block * partitions taps, split into partitions of one block each so a
+    long echo tail doesn't mean long blocks. Every step is a handful of
+    FFTs over all partitions at once; the gradient is constrained to the
+    first half of each FFT frame so the filter stays a linear convolution.
+    The step is normalized per frequency bin by the reference power.
+    """
+    
+    STEP = 0.5
+    POWER_SMOOTHING = 0.7
+    
+    def __init__(self, block: int, partitions: int):
+        self.block = block
+        self.partitions = partitions
+        bins = block + 1
+        self.weights = np.zeros((partitions, bins), dtype=np.complex128)
+        self.spectra = np.zeros((partitions, bins), dtype=np.complex128)
+        self.power = np.zeros(bins)
+        self._previous = np.zeros(block)
+        self._frame = np.zeros(2 * block)
+        # Keeps the step bounded for bins with (almost) no reference energy
+        self._regularization = 2 * block * 1e3
+        
+    def reset(self):
+        """Forget the learned echo path"""
+        self.weights[:] = 0
+        self.spectra[:] = 0
+        self.power[:] = 0
+        self._previous[:] = 0
+        
+    def process(self, reference: np.ndarray, mic: np.ndarray) -> np.ndarray:
+        """Subtract the estimated echo of reference from a block of mic"""
+        block = self.block
+        self.spectra = np.roll(self.spectra, 1, axis=0)
+        self._frame[:block] = self._previous
+        self._frame[block:] = reference
+        self.spectra[0] = np.fft.rfft(self._frame)
+        self._previous = reference.copy()
+        estimate = np.fft.irfft((self.weights * self.spectra).sum(axis=0))[block:]
+        return mic - estimate
+        
+    def adapt(self, error: np.ndarray):
+        """Move the filter towards cancelling what process() left in error"""
+        block = self.block
+        frame = np.zeros(2 * block)
+        frame[block:] = error
+        error_spectrum = np.fft.rfft(frame)
+        power = (self.spectra.real ** 2 + self.spectra.imag ** 2).sum(axis=0)
+        self.power = self.POWER_SMOOTHING * self.power + (1 - self.POWER_SMOOTHING) * power
+        gradient = np.conj(self.spectra) * (error_spectrum / (self.power + self._regularization))
+        taps = np.fft.irfft(gradient, axis=1)
+        taps[:, block:] = 0
+        self.weights += self.STEP * np.fft.rfft(taps, axis=1)
+
+
+class _EchoLevel:
+    """How loud the echo is relative to the reference, learned as it plays.
+    
+    Averages the level ratio of the microphone (or residual) to the
+    loudest reference block that can still echo, over blocks where only
+    the far end talks. It starts high, so until Gemini has spoken for a
+    moment speech is taken for echo rather than the other way round. While
+    "near-end speech" goes on for long with Gemini talking, the estimate
+    is raised anyway: that's echo louder than expected rather than a user
+    talking over Gemini for seconds.
+    """
+    
+    INITIAL = 4.0
+    MARGIN = 2.0  # Near-end speech must be 6 dB above the expected echo
+    RATE = 0.1
+    CREEP_RATE = 0.03
+    CREEP_AFTER_S = 2.0
+    
+    def __init__(self):
+        self.gain = self.INITIAL
+        self._near_for = 0.0
+        
+    def near_end(self, level: float, reference_level: float, floor: float) -> bool:
+        return level > self.MARGIN * self.gain * reference_level + floor
+        
+    def update(self, level: float, reference_level: float, near_end: bool, seconds: float):
+        self._near_for = self._near_for + seconds if near_end else 0.0
+        if near_end and self._near_for < self.CREEP_AFTER_S:
+            return
+        rate = self.CREEP_RATE if near_end else self.RATE
+        self.gain += rate * (level / reference_level - self.gain)
+
+
+class EchoController:
+    """Removes the playback picked up by the microphone from captured audio.
+    
+    The reference is what was sent to the speaker, each block stamped with
+    the perf_counter() time it is heard; microphone blocks are stamped with
+    the time they were captured. Both are 16-bit mono at the same rate.
+    The two timelines are lined up through those stamps: the reference
+    cursor advances with the microphone and is only re-synced when it
+    drifts more than RESYNC_MS from where the stamps put it, so the jitter
+    of the stamps doesn't disturb the filter. The filter covers PRE_MS
+    before the expected alignment, to absorb errors in reported latencies,
+    and tail_ms after it.
+    
+    Audio is processed in BLOCK-sample blocks; a remainder is held back
+    until the next chunk (none for the usual 1024-sample chunks).
+    """
+    
+    BLOCK = 512  # 32 ms at 16 kHz
+    PRE_MS = 10
+    RESYNC_MS = 8
+    REFERENCE_S = 2
+    FAR_END_FLOOR = 33.0  # About -60 dBFS
+    NEAR_END_FLOOR = 100.0  # About -50 dBFS
+    NEAR_END_HANGOVER_MS = 240
+    MISFIT_RESET_MS = 250
+    
+    def __init__(self, mode: str = "aec", rate: int = 16000, duck_db: float = 24.0,
+                 tail_ms: int = 118):
+        if mode not in MODES:
+            raise ValueError(f"echo control mode must be one of {', '.join(MODES)}")
+        self.mode = mode
+        self.rate = rate
+        self.duck_gain = 0.0 if mode == "gate" else 10 ** (-duck_db / 20)
+        self.pre = int(rate * self.PRE_MS / 1000)
+        partitions = max(1, math.ceil((self.pre + rate * tail_ms / 1000) / self.BLOCK))
+        self.taps = partitions * self.BLOCK
+        self.filter = BlockNlms(self.BLOCK, partitions) if mode == "aec" else None
+        self._resync = int(rate * self.RESYNC_MS / 1000)
+        self._hangover = int(rate * self.NEAR_END_HANGOVER_MS / 1000)
+        
+        # Reference history, indexed by the running sample count
+        self._reference = np.zeros(rate * self.REFERENCE_S)
+        self._reference_end = 0
+        self._reference_t0 = None  # Time sample 0 of the reference is heard
+        self._cursor = None
+        self._pending = np.zeros(0)
+        
+        # Expected echo level in the microphone (duck, gate) or in what
+        # the canceller leaves of it (aec)
+        self._mic_level = _EchoLevel()
+        self._residual_level = _EchoLevel()
+        self._gain = 1.0
+        self._near_left = 0
+        self._misfits = 0
+        self._misfit_limit = int(rate * self.MISFIT_RESET_MS / 1000)
+        
+        # Measurements
+        self.resyncs = 0
+        self.resets = 0
+        self._far_only_samples = 0
+        self._double_talk_samples = 0
+        self._echo_in = 0.0
+        self._echo_out = 0.0
+        self._cpu_s = 0.0
+        self._audio_samples = 0
+        
+    def reset(self):
+        """Forget the timelines (streams closed); the learned path is kept"""
+        self._reference[:] = 0
+        self._reference_end = 0
+        self._reference_t0 = None
+        self._cursor = None
+        self._pending = np.zeros(0)
+        self._gain = 1.0
+        self._near_left = 0
+        if self.filter:
+            self.filter.spectra[:] = 0
+            
+    def skip(self):
+        """Capture was paused: line the microphone up again on the next block"""
+        self._cursor = None
+        self._pending = np.zeros(0)
+        
+    def add_reference(self, samples: np.ndarray, end_time: float):
+        """Record played audio; end_time is when the sample after it is heard"""
+        count = len(samples)
+        if not count:
+            return
+        size = len(self._reference)
+        if count > size:
+            # Only the newest REFERENCE_S seconds are kept
+            self._reference_end += count - size
+            samples, count = samples[-size:], size
+        start = self._reference_end % size
+        first = min(count, size - start)
+        self._reference[start:start + first] = samples[:first]
+        self._reference[:count - first] = samples[first:]
+        self._reference_end += count
+        
+        t0 = end_time - self._reference_end / self.rate
+        if self._reference_t0 is None:
+            self._reference_t0 = t0
+        else:
+            # Smooth out the jitter of the timestamps
+            self._reference_t0 += 0.1 * (t0 - self._reference_t0)
+            
+    def _reference_window(self, end: int, length: int) -> np.ndarray:
+        """Reference samples end - length .. end, zero where there are none"""
+        window = np.zeros(length)
+        size = len(self._reference)
+        first = max(end - length, self._reference_end - size, 0)
+        last = min(end, self._reference_end)
+        if last > first:
+            index = np.arange(first, last) % size
+            window[first - (end - length):last - (end - length)] = self._reference[index]
+        return window
+        
+    def process(self, pcm: bytes, end_time: float) -> bytes:
+        """Echo-controlled copy of a 16-bit mono chunk captured up to end_time"""
+        started = time.thread_time()
+        mic = np.frombuffer(pcm, dtype=np.int16).astype(np.float64)
+        self._audio_samples += len(mic)
+        pending = np.concatenate((self._pending, mic)) if len(self._pending) else mic
+        blocks = len(pending) // self.BLOCK
+        out = np.empty(blocks * self.BLOCK)
+        for index in range(blocks):
+            block = pending[index * self.BLOCK:(index + 1) * self.BLOCK]
+            # Capture time of the end of this block
+            block_end = end_time - (len(pending) - (index + 1) * self.BLOCK) / self.rate
+            out[index * self.BLOCK:(index + 1) * self.BLOCK] = self._process_block(block, block_end)
+        self._pending = pending[blocks * self.BLOCK:]
+        self._cpu_s += time.thread_time() - started
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+        
+    def _process_block(self, mic: np.ndarray, end_time: float) -> np.ndarray:
+        block = self.BLOCK
+        if self._reference_t0 is None:
+            return mic  # Nothing has been played yet
+        expected = int(round((end_time - self._reference_t0) * self.rate)) + self.pre
+        if self._cursor is None or abs(expected - (self._cursor + block)) > self._resync:
+            if self._cursor is not None:
+                self.resyncs += 1
+            self._cursor = expected
+        else:
+            self._cursor += block
+            
+        span = self._reference_window(self._cursor, self.taps)
+        reference = span[-block:]
+        # The echo in this block is at most as loud as the loudest
+        # reference block within the filter's reach
+        blocks = span.reshape(-1, block)
+        reference_level = math.sqrt(np.einsum("ij,ij->i", blocks, blocks).max() / block)
+        far_end = reference_level > self.FAR_END_FLOOR
+        
+        signal = mic
+        tracker = self._mic_level
+        if self.filter:
+            error = signal = self.filter.process(reference, mic)
+            tracker = self._residual_level
+            if np.dot(error, error) > np.dot(mic, mic) + block * self.NEAR_END_FLOOR ** 2:
+                # The estimate doesn't fit this block (new kind of sound, or
+                # the echo path changed): pass the microphone through while
+                # the filter adapts, and start over if that goes on
+                self._misfits += 1
+                if self._misfits * block >= self._misfit_limit:
+                    self.filter.reset()
+                    self.resets += 1
+                    self._misfits = 0
+                signal = mic
+                tracker = self._mic_level
+            else:
+                self._misfits = 0
+                
+        level = math.sqrt(np.dot(signal, signal) / block)
+        near_end = far_end and tracker.near_end(level, reference_level, self.NEAR_END_FLOOR)
+        if far_end:
+            tracker.update(level, reference_level, near_end, block / self.rate)
+            if self.filter and not near_end:
+                # Once the echo is mostly cancelled, the residual shows
+                # near-end speech far more clearly than the microphone
+                # does; adapting during double-talk would undo the filter
+                self.filter.adapt(error)
+        if near_end:
+            self._near_left = self._hangover
+        else:
+            self._near_left = max(0, self._near_left - block)
+        near_end = near_end or (far_end and self._near_left > 0)
+        
+        target = self.duck_gain if far_end and not near_end else 1.0
+        if target >= self._gain:
+            # Open at once so the start of the user's speech isn't lost
+            out = signal * target
+        else:
+            out = signal * np.linspace(self._gain, target, block, endpoint=False)
+        self._gain = target
+        
+        if far_end and not near_end:
+            self._far_only_samples += block
+            self._echo_in += np.dot(mic, mic)
+            self._echo_out += np.dot(out, out)
+        elif far_end:
+            self._double_talk_samples += block
+        return out
+        
+    def stats(self) -> dict:
+        """Echo removed while only Gemini talked, and the cost of doing so"""
+        if self._echo_out > 0:
+            echo_loss = round(10 * math.log10(self._echo_in / self._echo_out), 1)
+        else:
+            echo_loss = None if not self._echo_in else float("inf")
+        audio_s = self._audio_samples / self.rate
+        return {
+            "mode": self.mode,
+            "echo_loss_db": echo_loss,
+            "far_end_s": round(self._far_only_samples / self.rate, 1),
+            "double_talk_s": round(self._double_talk_samples / self.rate, 1),
+            "resyncs": self.resyncs,
+            "resets": self.resets,
+            "cpu_ms_per_s": round(self._cpu_s * 1000 / audio_s, 2) if audio_s else None,
+        }
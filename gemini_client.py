@@ -4,35 +4,225 @@ Handles WebSocket connection and audio streaming
 """
 
 import json
-import base64
+import binascii
 import asyncio
+import collections
+import concurrent.futures
+import inspect
+import random
 import websockets
 from typing import Callable, Optional
 import threading
 import queue
+import time
+
+from .latency import recorder
+from .uplink_encoder import RealtimeAudioEncoder
+
+# Queue marker: send whatever is batched right away (e.g. at speech end)
+_FLUSH = object()
+
+# Function the model calls to grade the current card
+RATE_CARD_FUNCTION = {
+    "name": "rate_card",
+    "description": (
+        "Record how well the user answered the current flashcard. Call it "
+        "exactly once per card, as soon as you have judged the answer."
+    ),
+    "parameters": {
+        "type": "OBJECT",
+        "properties": {
+            "rating": {
+                "type": "STRING",
+                "enum": ["again", "hard", "good", "easy"],
+                "description": (
+                    "again: wrong or didn't know; hard: partially correct; "
+                    "good: correct; easy: perfect and confident"
+                ),
+            }
+        },
+        "required": ["rating"],
+    },
+}
+
+
+class UplinkStats:
+    """Per-message overhead counters for the audio uplink"""
+    
+    def __init__(self):
+        self.messages = 0
+        self.chunks = 0
+        self.audio_bytes = 0
+        self.wire_bytes = 0
+        self.encode_seconds = 0.0
+        self.send_seconds = 0.0
+        self.coalesce_wait_seconds = 0.0
+        self.speech_end_flushes = 0
+        self.backlogged_batches = 0
+        
+    def as_dict(self) -> dict:
+        """Return raw counters plus per-message averages"""
+        messages = max(self.messages, 1)
+        return {
+            "messages": self.messages,
+            "chunks": self.chunks,
+            "audio_bytes": self.audio_bytes,
+            "wire_bytes": self.wire_bytes,
+            "chunks_per_message": round(self.chunks / messages, 2),
+            "overhead_bytes_per_message": round(
+                (self.wire_bytes - self.audio_bytes * 4 / 3) / messages, 1
+            ),
+            "encode_us_per_message": round(self.encode_seconds / messages * 1e6, 1),
+            "send_us_per_message": round(self.send_seconds / messages * 1e6, 1),
+            "coalesce_wait_ms_avg": round(self.coalesce_wait_seconds / messages * 1000, 1),
+            "speech_end_flushes": self.speech_end_flushes,
+            "backlogged_batches": self.backlogged_batches,
+        }
 
 
 class GeminiLiveClient:
     """Client for Google Gemini Live API with voice support"""
     
-    def __init__(self, api_key: str):
+    # Gemini Live API endpoint (BidiGenerateContent over WebSocket)
+    DEFAULT_ENDPOINT = (
+        "wss://generativelanguage.googleapis.com/ws/"
+        "google.ai.generativelanguage.v1beta.GenerativeService.BidiGenerateContent"
+    )
+    INPUT_RATE = 16000  # Uplink PCM sample rate
+    CHUNK_MS = 64  # Duration of one captured chunk (1024 frames at 16 kHz)
+    BACKLOG_BYTES = 64 * 1024  # Unsent socket bytes that count as backlog
+    SETUP_TIMEOUT = 15.0  # Seconds to wait for setupComplete after the socket opens
+    MAX_BACKOFF = 8.0  # Longest wait between reconnect attempts, in seconds
+    OUTPUT_RATE = 24000  # Model speech PCM sample rate
+    # Rough context cost of audio and text, used until the server reports usage
+    AUDIO_TOKENS_PER_SECOND = 32
+    CHARS_PER_TOKEN = 4
+    
+    def __init__(self, api_key: str, coalesce_ms: int = 0, max_coalesce_ms: int = 200,
+                 max_reconnect_attempts: int = 5, outage_buffer_ms: int = 5000,
+                 endpoint: str = "", input_transcription: bool = False):
         self.api_key = api_key
+        # Ask the server to transcribe the user's speech (for local grading)
+        self.input_transcription = input_transcription
+        self.endpoint = endpoint or self.DEFAULT_ENDPOINT
+        self.coalesce_ms = coalesce_ms
+        self.max_coalesce_ms = max(max_coalesce_ms, coalesce_ms)
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.uplink_stats = UplinkStats()
+        self._encoder = RealtimeAudioEncoder()
+        # Whether ws.send(bytes, text=True) exists (websockets 13+)
+        self._send_bytes_as_text = False
+        
+        # Audio captured while reconnecting, replayed once the session is back
+        self.reconnecting = False
+        self.reconnects = 0
+        self.resumption_handle = None
+        self._outage_buffer = collections.deque(
+            maxlen=max(1, outage_buffer_ms // self.CHUNK_MS)
+        )
+        self._unsent = []
+        # Text sent while reconnecting, replayed if the session resumes
+        self._outage_text = collections.deque()
         self.ws = None
         self.is_connected = False
-        self.audio_queue = queue.Queue()
+        # asyncio.Queue living on the client loop, fed from the recording thread
+        self.audio_queue = None
         self.response_queue = queue.Queue()
+        # Raw (socket, message) pairs waiting for the dispatch thread
+        self._inbox = queue.SimpleQueue()
+        self._dispatch_thread = None
         self.loop = None
         self.thread = None
+        # Resolves once the socket is open and setupComplete has arrived
+        self.ready = concurrent.futures.Future()
+        self.system_instruction = ""
+        # Estimated size of the conversation held by the server, in tokens
+        self.context_tokens = 0
+        # True while the model is producing a turn (until turnComplete)
+        self.turn_active = False
+        self.opened = False
+        self.closed = False
         
-    def connect(self, on_audio: Callable, on_text: Callable, on_error: Callable):
-        """Connect to Gemini Live API"""
+        # Callbacks are attached by connect(); a pre-warmed client has none yet
+        self.on_audio = lambda audio_data: None
+        self.on_text = lambda text: None
+        self.on_error = lambda error_msg: None
+        self.on_reconnecting = lambda attempt: None
+        self.on_reconnected = lambda resumed: None
+        self.on_turn_complete = lambda: None
+        self.on_interrupted = lambda: None
+        self.on_input_transcription = lambda text: None
+        self.on_tool_call = lambda name, args: {"error": f"Unknown function {name}"}
+        
+    def open(self, system_instruction: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start connecting and send the session setup without any callbacks.
+        
+        Runs on the given event loop (shared across sessions), or on a
+        private loop thread when none is given.
+        """
+        if self.opened:
+            return
+        self.opened = True
+        self.system_instruction = system_instruction
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatch_thread.start()
+        
+        if loop:
+            self.loop = loop
+            asyncio.run_coroutine_threadsafe(self._connect_ws(), loop)
+        else:
+            # Start async event loop in separate thread
+            self.thread = threading.Thread(target=self._run_event_loop, daemon=True)
+            self.thread.start()
+            
+    def connect(self, on_audio: Callable, on_text: Callable, on_error: Callable,
+                system_instruction: str = "",
+                on_reconnecting: Optional[Callable] = None,
+                on_reconnected: Optional[Callable] = None,
+                on_turn_complete: Optional[Callable] = None,
+                on_interrupted: Optional[Callable] = None,
+                on_tool_call: Optional[Callable] = None,
+                on_input_transcription: Optional[Callable] = None):
+        """Connect to Gemini Live API and send the session setup.
+        
+        Attaches the callbacks to an already opened (pre-warmed) client.
+        Watch self.ready to know when the session can take input; it holds
+        the exception if the session never got going. Dropped connections
+        are retried; on_reconnected(resumed) tells whether the
+        server kept the conversation state. Text sent during an outage goes
+        out once the session resumes, and is dropped if it doesn't. on_turn_complete() fires when
+        the model has finished speaking, on_interrupted() when the server
+        cut its turn short because the user started talking.
+        on_tool_call(name, args) handles a function call from the model and
+        returns the response dict. on_input_transcription(text) receives
+        pieces of the transcript of the user's speech. Callbacks run on the client's dispatch
+        thread, in message order; they should hand real work off and return
+        quickly.
+        """
         self.on_audio = on_audio
         self.on_text = on_text
         self.on_error = on_error
+        if on_reconnecting:
+            self.on_reconnecting = on_reconnecting
+        if on_reconnected:
+            self.on_reconnected = on_reconnected
+        if on_turn_complete:
+            self.on_turn_complete = on_turn_complete
+        if on_interrupted:
+            self.on_interrupted = on_interrupted
+        if on_tool_call:
+            self.on_tool_call = on_tool_call
+        if on_input_transcription:
+            self.on_input_transcription = on_input_transcription
+        self.open(system_instruction)
         
-        # Start async event loop in separate thread
-        self.thread = threading.Thread(target=self._run_event_loop, daemon=True)
-        self.thread.start()
+    def is_usable(self) -> bool:
+        """Check whether the client is connecting or connected and not failed"""
+        if self.closed:
+            return False
+        if self.ready.done():
+            return not self.ready.cancelled() and not self.ready.exception() and self.is_connected
+        return True
         
     def _run_event_loop(self):
         """Run asyncio event loop in separate thread"""
@@ -41,96 +231,380 @@ class GeminiLiveClient:
         self.loop.run_until_complete(self._connect_ws())
         
     async def _connect_ws(self):
-        """Establish WebSocket connection"""
-        # Gemini Live API endpoint
-        url = f"wss://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:streamGenerateContent?key={self.api_key}"
+        """Establish WebSocket connection, reconnecting with backoff after drops"""
+        self.audio_queue = asyncio.Queue()
         
-        try:
-            async with websockets.connect(url, max_size=10**7) as ws:
-                self.ws = ws
-                self.is_connected = True
-                
-                # Start tasks for sending and receiving
-                await asyncio.gather(
-                    self._send_loop(),
-                    self._receive_loop()
-                )
-        except Exception as e:
-            self.on_error(f"Connection error: {str(e)}")
+        separator = "&" if "?" in self.endpoint else "?"
+        url = f"{self.endpoint}{separator}key={self.api_key}"
+        
+        attempt = 0
+        while not self.closed:
+            resuming = self.resumption_handle is not None
+            try:
+                async with websockets.connect(url, max_size=10**7) as ws:
+                    self.ws = ws
+                    self._send_bytes_as_text = "text" in inspect.signature(ws.send).parameters
+                    
+                    # Setup is part of connecting; the session is usable only
+                    # once the server has acknowledged it
+                    await self._setup_voice_mode_async(self.system_instruction)
+                    await self._wait_for_setup_complete()
+                    if self.closed:
+                        return
+                    self._on_session_started(resuming)
+                    attempt = 0
+                    
+                    await self._run_session()
+                error = None
+            except Exception as e:
+                error = e
+                
             self.is_connected = False
+            if self.closed:
+                return
+            if not self.ready.done():
+                # Never got a session going (bad key, no network): report it
+                # through ready, which a pre-warmed client may fail before
+                # anyone has attached an on_error
+                self.ready.set_exception(error or ConnectionError("Connection closed"))
+                return
+                
+            attempt += 1
+            if attempt > self.max_reconnect_attempts:
+                self.on_error(f"Connection error: {str(error or 'connection closed')}")
+                return
+            if resuming and attempt > 1:
+                # The handle may be what the server is rejecting
+                self.resumption_handle = None
+                
+            self.reconnecting = True
+            self.on_reconnecting(attempt)
+            await asyncio.sleep(self._backoff(attempt))
+            
+    def _on_session_started(self, resumed: bool):
+        """Mark the session live and replay audio held back during an outage"""
+        self.is_connected = True
+        if not resumed:
+            # A fresh session only holds the system instruction
+            self.context_tokens = self._text_tokens(self.system_instruction)
+        if not self.ready.done():
+            self.ready.set_result(True)
+            return
+            
+        # Oldest first: chunks that failed mid-send, chunks still queued
+        # from before the drop, then audio captured while reconnecting
+        backlog = self._unsent
+        self._unsent = []
+        while not self.audio_queue.empty():
+            item = self.audio_queue.get_nowait()
+            if item is not None:
+                backlog.append(item)
+        while self._outage_buffer:
+            backlog.append(self._outage_buffer.popleft())
+        for item in backlog:
+            self.audio_queue.put_nowait(item)
+            
+        # Text only makes sense to a session that kept the conversation; a
+        # fresh one is brought up to date by on_reconnected(False)
+        while self._outage_text:
+            text = self._outage_text.popleft()
+            if resumed:
+                asyncio.ensure_future(self._send_text_async(text))
+                
+        self.reconnecting = False
+        self.reconnects += 1
+        self.on_reconnected(resumed)
+        
+    async def _run_session(self):
+        """Run send and receive loops until one of them stops"""
+        tasks = {
+            asyncio.ensure_future(self._send_loop()),
+            asyncio.ensure_future(self._receive_loop()),
+        }
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
+            
+    def _backoff(self, attempt: int) -> float:
+        """Delay before a reconnect attempt: immediate first, then exponential"""
+        if attempt <= 1:
+            return 0.0
+        delay = min(self.MAX_BACKOFF, 0.25 * 2 ** (attempt - 2))
+        return delay * random.uniform(0.8, 1.2)
+        
+    async def _wait_for_setup_complete(self):
+        """Wait for the server to acknowledge the setup message"""
+        while True:
+            try:
+                response = await asyncio.wait_for(self.ws.recv(), self.SETUP_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ConnectionError("Timed out waiting for session setup")
+            data = json.loads(response)
+            if "setupComplete" in data:
+                return
+            if "error" in data:
+                raise ConnectionError(data["error"].get("message", "Setup rejected"))
             
     async def _send_loop(self):
-        """Send audio data from queue to Gemini"""
+        """Send audio data from queue to Gemini, coalescing chunks per window"""
+        loop = asyncio.get_running_loop()
         while self.is_connected:
+            pending = []
             try:
-                # Get audio chunk from queue (non-blocking with timeout)
-                audio_data = await asyncio.get_event_loop().run_in_executor(
-                    None, lambda: self.audio_queue.get(timeout=0.1)
-                )
+                # Wakes as soon as the recording thread hands over a chunk
+                audio_data = await self.audio_queue.get()
                 
                 if audio_data is None:  # Stop signal
                     break
-                    
-                # Send audio chunk to Gemini
-                message = {
-                    "realtimeInput": {
-                        "mediaChunks": [{
-                            "mimeType": "audio/pcm",
-                            "data": base64.b64encode(audio_data).decode('utf-8')
-                        }]
-                    }
-                }
-                await self.ws.send(json.dumps(message))
+                if audio_data is _FLUSH:
+                    continue
                 
-            except queue.Empty:
-                await asyncio.sleep(0.01)
-            except Exception as e:
-                self.on_error(f"Send error: {str(e)}")
-                break
+                first_enqueued = loop.time()
+                pending.append(audio_data)
+                pending_bytes = len(audio_data)
+                window = self._coalesce_window()
+                stop = flushed = False
+                
+                # Batch whatever else arrives within the window
+                while window > 0 and pending_bytes < self._bytes_for(window):
+                    timeout = first_enqueued + window - loop.time()
+                    if self.audio_queue.empty() and timeout <= 0:
+                        break
+                    try:
+                        if self.audio_queue.empty():
+                            item = await asyncio.wait_for(self.audio_queue.get(), timeout)
+                        else:
+                            item = self.audio_queue.get_nowait()
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    if item is _FLUSH:
+                        flushed = True
+                        break
+                    pending.append(item)
+                    pending_bytes += len(item)
+                
+                await self._send_audio_message(pending, loop.time() - first_enqueued, flushed)
+                if stop:
+                    break
+                
+            except (Exception, asyncio.CancelledError):
+                # Connection dropped: keep the audio for replay after reconnecting
+                self._unsent = pending + self._unsent
+                raise
+                
+    async def _send_audio_message(self, chunks: list, waited: float, flushed: bool):
+        """Encode the batched chunks as one realtimeInput message and send it"""
+        started = time.perf_counter()
+        # A view into the encoder's buffer, reused for the next message
+        message = self._encoder.encode(chunks)
+        encoded = time.perf_counter()
+        if self._send_bytes_as_text:
+            await self.ws.send(message, text=True)
+        else:
+            # Older websockets would send bytes as a binary frame
+            await self.ws.send(str(message, "ascii"))
+        audio_size = sum(len(chunk) for chunk in chunks)
+        
+        stats = self.uplink_stats
+        stats.messages += 1
+        stats.chunks += len(chunks)
+        stats.audio_bytes += audio_size
+        stats.wire_bytes += len(message)
+        stats.encode_seconds += encoded - started
+        stats.send_seconds += time.perf_counter() - encoded
+        stats.coalesce_wait_seconds += waited
+        if recorder.enabled:
+            recorder.record("coalesce", waited)
+            recorder.record("send", time.perf_counter() - started)
+        self.context_tokens += self._audio_tokens(audio_size, self.INPUT_RATE)
+        if flushed:
+            stats.speech_end_flushes += 1
                 
+    def _coalesce_window(self) -> float:
+        """Return the batching window in seconds, widened when backlogged"""
+        if self.coalesce_ms <= 0:
+            return 0.0
+        if self._is_backlogged():
+            self.uplink_stats.backlogged_batches += 1
+            return self.max_coalesce_ms / 1000
+        return self.coalesce_ms / 1000
+        
+    def _is_backlogged(self) -> bool:
+        """Check whether the socket or the queue is falling behind"""
+        if self.audio_queue.qsize() * self.CHUNK_MS >= self.max_coalesce_ms:
+            return True
+        transport = getattr(self.ws, "transport", None)
+        if transport is None:
+            return False
+        try:
+            return transport.get_write_buffer_size() > self.BACKLOG_BYTES
+        except (AttributeError, NotImplementedError):
+            return False
+            
+    def _audio_tokens(self, size: int, rate: int) -> float:
+        """Estimated context cost of size bytes of 16-bit PCM"""
+        return size / 2 / rate * self.AUDIO_TOKENS_PER_SECOND
+        
+    def _text_tokens(self, text: str) -> float:
+        return len(text) / self.CHARS_PER_TOKEN
+        
+    def _bytes_for(self, seconds: float) -> int:
+        """Size in bytes of the given duration of 16-bit mono input audio"""
+        return int(seconds * self.INPUT_RATE) * 2
+        
     async def _receive_loop(self):
-        """Receive responses from Gemini"""
+        """Receive messages from Gemini (raises ConnectionClosed on drops).
+        
+        Only hands the raw frames over; parsing, base64 decoding and the
+        callbacks run on the dispatch thread, so a burst of large audio
+        frames never holds up the send loop on this event loop.
+        """
+        ws = self.ws
         while self.is_connected:
+            self._inbox.put((ws, await ws.recv()))
+            
+    def _dispatch_loop(self):
+        """Decode received messages in order and run the callbacks (dispatch thread)"""
+        while True:
+            item = self._inbox.get()
+            if item is None:  # Stop signal
+                return
+            ws, raw = item
             try:
-                response = await self.ws.recv()
-                data = json.loads(response)
+                self._handle_message(ws, json.loads(raw))
+            except Exception as e:
+                print(f"Gemini message error: {e}")
                 
-                # Handle different response types
-                if "serverContent" in data:
-                    content = data["serverContent"]
-                    
-                    # Handle text response
-                    if "modelTurn" in content:
-                        parts = content["modelTurn"].get("parts", [])
-                        for part in parts:
-                            if "text" in part:
-                                self.on_text(part["text"])
-                    
-                    # Handle audio response
-                    if "realtimeAudio" in content:
-                        audio_data = base64.b64decode(
-                            content["realtimeAudio"]["data"]
-                        )
-                        self.on_audio(audio_data)
+    def _handle_message(self, ws, data: dict):
+        """Act on one server message (dispatch thread)"""
+        # Handle different response types
+        if "serverContent" in data:
+            content = data["serverContent"]
+            if recorder.enabled:
+                recorder.since("request", "first_response")
+                
+            # What the user said, transcribed as they speak
+            transcription = content.get("inputTranscription")
+            if transcription and transcription.get("text"):
+                self.on_input_transcription(transcription["text"])
+                
+            # The user talked over the model; its queued speech is void
+            if content.get("interrupted"):
+                self.turn_active = False
+                self.on_interrupted()
+                
+            # Handle text response
+            if "modelTurn" in content:
+                self.turn_active = True
+                parts = content["modelTurn"].get("parts", [])
+                for part in parts:
+                    if "text" in part:
+                        self.context_tokens += self._text_tokens(part["text"])
+                        self.on_text(part["text"])
+                    # Speech arrives as inline PCM parts of the model turn
+                    inline = part.get("inlineData")
+                    if inline and inline.get("mimeType", "").startswith("audio/pcm"):
+                        self._deliver_audio(inline["data"])
                         
-            except websockets.exceptions.ConnectionClosed:
-                break
-            except Exception as e:
-                self.on_error(f"Receive error: {str(e)}")
-                break
+            # Handle audio response
+            if "realtimeAudio" in content:
+                self.turn_active = True
+                self._deliver_audio(content["realtimeAudio"]["data"])
                 
+            if content.get("turnComplete"):
+                self.turn_active = False
+                self.on_turn_complete()
+                
+        # The server's own count replaces our estimate
+        usage = data.get("usageMetadata")
+        if usage and usage.get("totalTokenCount"):
+            self.context_tokens = usage["totalTokenCount"]
+            
+        # Function calls (card ratings) are answered right away so the
+        # model can carry on speaking
+        if "toolCall" in data:
+            # The model carries on with its turn after the response
+            self.turn_active = True
+            self._answer_tool_calls(ws, data["toolCall"].get("functionCalls", []))
+            
+        # Keep the latest handle so a dropped session can be resumed
+        if "sessionResumptionUpdate" in data:
+            update = data["sessionResumptionUpdate"]
+            if update.get("resumable") and update.get("newHandle"):
+                self.resumption_handle = update["newHandle"]
+                
+        # The server is about to drop us; reconnect on our terms
+        if "goAway" in data:
+            asyncio.run_coroutine_threadsafe(ws.close(), self.loop)
+            
+    def _deliver_audio(self, encoded: str):
+        """Decode base64 PCM and pass it on (straight into the playback buffer)"""
+        # a2b_base64 reads the ASCII str in place; b64decode would copy it first
+        audio_data = binascii.a2b_base64(encoded)
+        self.context_tokens += self._audio_tokens(len(audio_data), self.OUTPUT_RATE)
+        self.on_audio(audio_data)
+        
+    def _answer_tool_calls(self, ws, calls: list):
+        """Dispatch function calls and send their toolResponse"""
+        responses = []
+        for call in calls:
+            try:
+                result = self.on_tool_call(call.get("name"), call.get("args") or {})
+            except Exception as e:
+                result = {"error": str(e)}
+            responses.append({
+                "id": call.get("id"),
+                "name": call.get("name"),
+                "response": result
+            })
+        if responses:
+            message = {"toolResponse": {"functionResponses": responses}}
+            asyncio.run_coroutine_threadsafe(ws.send(json.dumps(message)), self.loop)
+            
     def send_audio(self, audio_data: bytes):
-        """Queue audio data to be sent to Gemini"""
-        if self.is_connected:
-            self.audio_queue.put(audio_data)
+        """Queue audio data to be sent to Gemini (safe to call from any thread)"""
+        if self.is_connected and self.loop:
+            if recorder.enabled:
+                self.loop.call_soon_threadsafe(self._enqueue_timed, audio_data, time.perf_counter())
+            else:
+                self.loop.call_soon_threadsafe(self.audio_queue.put_nowait, audio_data)
+        elif self.reconnecting:
+            # Bounded: during a long outage only the most recent audio is kept
+            self._outage_buffer.append(audio_data)
+            
+    def _enqueue_timed(self, audio_data: bytes, sent_at: float):
+        """Queue a chunk on the client loop, timing the hop from the caller"""
+        recorder.record("enqueue", time.perf_counter() - sent_at)
+        self.audio_queue.put_nowait(audio_data)
+        
+    def flush_audio(self):
+        """Send any batched audio immediately (call at speech end)"""
+        if recorder.enabled:
+            # The reply to the utterance is timed from here
+            now = time.perf_counter()
+            recorder.mark("request", now)
+            recorder.mark("speech_end", now)
+        if self.is_connected and self.loop:
+            self.loop.call_soon_threadsafe(self.audio_queue.put_nowait, _FLUSH)
             
     def send_text(self, text: str):
-        """Send text message to Gemini"""
+        """Send text message to Gemini (held back while reconnecting)"""
+        if recorder.enabled:
+            recorder.mark("request")
         if self.is_connected and self.loop:
             asyncio.run_coroutine_threadsafe(
                 self._send_text_async(text),
                 self.loop
             )
+        elif not self.closed and self.ready.done():
+            # Dropped, possibly before reconnecting was set
+            self._outage_text.append(text)
             
     async def _send_text_async(self, text: str):
         """Send text message asynchronously"""
@@ -143,16 +617,14 @@ class GeminiLiveClient:
                 "turnComplete": True
             }
         }
-        await self.ws.send(json.dumps(message))
+        try:
+            await self.ws.send(json.dumps(message))
+        except websockets.ConnectionClosed:
+            # Lost with the connection: send it again after reconnecting
+            self._outage_text.append(text)
+            return
+        self.context_tokens += self._text_tokens(text)
         
-    def setup_voice_mode(self, system_instruction: str):
-        """Configure the session with system instructions"""
-        if self.is_connected and self.loop:
-            asyncio.run_coroutine_threadsafe(
-                self._setup_voice_mode_async(system_instruction),
-                self.loop
-            )
-            
     async def _setup_voice_mode_async(self, system_instruction: str):
         """Setup voice mode configuration"""
         setup_message = {
@@ -170,15 +642,33 @@ class GeminiLiveClient:
                 },
                 "systemInstruction": {
                     "parts": [{"text": system_instruction}]
-                }
+                },
+                "tools": [{"functionDeclarations": [RATE_CARD_FUNCTION]}],
+                # Ask for resumption handles; pass the last one to resume
+                "sessionResumption": (
+                    {"handle": self.resumption_handle} if self.resumption_handle else {}
+                )
             }
         }
+        if self.input_transcription:
+            setup_message["setup"]["inputAudioTranscription"] = {}
         await self.ws.send(json.dumps(setup_message))
         
     def disconnect(self):
         """Disconnect from Gemini Live API"""
         self.is_connected = False
-        self.audio_queue.put(None)  # Stop signal
+        self.closed = True
+        self.ready.cancel()
+        # Messages already received are still delivered, then the thread ends
+        self._inbox.put(None)
         
-        if self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.loop and not self.loop.is_closed():
+            # Closing the socket ends the receive loop; None ends the send loop
+            asyncio.run_coroutine_threadsafe(self._close_async(), self.loop)
+            
+    async def _close_async(self):
+        """Stop the send loop and close the socket"""
+        if self.audio_queue:
+            self.audio_queue.put_nowait(None)  # Stop signal
+        if self.ws:
+            await self.ws.close()
@@ -4,31 +4,149 @@ Gemini Live Dialog - Main UI for voice-based card review
 
 from aqt.qt import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QTextEdit, Qt, QProgressBar
+    QTextEdit, Qt, QProgressBar, QTimer, QListView
 )
+import collections
+import threading
+
 from aqt import mw
 from aqt.utils import showWarning, tooltip
 
-from .gemini_client import GeminiLiveClient
 from .audio_handler import AudioHandler
+from .audio_process import AudioProcess
 from .card_presenter import CardPresenter
+from .grader import AnswerGrader
+from .latency import recorder as latency
+from .system_instruction import create_system_instruction
+from .transcript import TranscriptModel
+from .ui_events import FLOOR_DB, UiEventBus
+from .vad import VoiceActivityDetector
+
+# rate_card function arguments mapped to Anki eases
+RATINGS = {
+    "again": 1,
+    "hard": 2,
+    "good": 3,
+    "easy": 4
+}
 
 
 class GeminiLiveDialog(QDialog):
     """Main dialog for Gemini Live review session"""
     
-    def __init__(self, parent, config):
+    # Longest a rotated-out session may keep talking, in milliseconds
+    RETIRE_TIMEOUT_MS = 20000
+    # Wait after the user stops speaking for the transcript to catch up
+    GRADE_SETTLE_MS = 300
+    # Longest wait for Gemini to finish its feedback on a rated card
+    FEEDBACK_TIMEOUT_MS = 15000
+    
+    def __init__(self, parent, config, connection_manager):
         super().__init__(parent)
         self.config = config
+        self.connection_manager = connection_manager
         self.gemini_client = None
-        self.audio_handler = AudioHandler()
+        self.audio_handler = self._create_audio_handler(config)
+        self.vad = VoiceActivityDetector.from_config(config, rate=AudioHandler.RATE)
+        # Per-stage pipeline timings, shown in a debug panel when enabled
+        latency.enable(config.get("latency_debug", False))
+        self.vad.on_speech_start = self.on_speech_start
+        self.vad.on_speech_end = self.on_speech_end
         self.card_presenter = CardPresenter(mw.col, config)
         
+        # Render the first few due cards while the user reads the dialog
+        self.card_presenter.prefetch()
+        
         self.session_active = False
         self.current_card = None
+        self.current_question = ""
+        self.current_answer = ""
+        
+        # Clear answers are graded locally from the server's transcript of
+        # the user's speech; the rest is left to Gemini
+        self.grader = None
+        if config.get("local_grading", True):
+            self.grader = AnswerGrader(config.get("auto_rate_threshold", 0.8))
+        self._heard = []
+        self._pending_feedback = ""
+        self._grade_timer = QTimer(self)
+        self._grade_timer.setSingleShot(True)
+        self._grade_timer.setInterval(self.GRADE_SETTLE_MS)
+        self._grade_timer.timeout.connect(self._grade_answer)
+        # Bumped whenever a card is presented; ratings carry the serial they
+        # were given for so a late or repeated call can't hit the next card
+        self._card_serial = 0
+        self._rated_serial = 0
+        # The next question waits until Gemini's turn with the feedback on
+        # the rated card is over; a new prompt would cut that turn off
+        self._awaiting_feedback = False
+        self._feedback_timer = QTimer(self)
+        self._feedback_timer.setSingleShot(True)
+        self._feedback_timer.setInterval(self.FEEDBACK_TIMEOUT_MS)
+        self._feedback_timer.timeout.connect(self._feedback_done)
+        
+        # Long sessions move to a fresh Live session at a card boundary once
+        # the context passes context_rotation_tokens. The old session keeps
+        # talking until its turn is over; the new one's speech waits for it.
+        self.rotation_tokens = config.get("context_rotation_tokens", 16000)
+        self.rotations = 0
+        self._reviewed = []  # (question, rating) of every rated card
+        self._next_client = None
+        self._retiring_client = None
+        self._held_audio = []
+        self._held_turn_complete = False
+        self._rotation_lock = threading.Lock()
         
         self.setup_ui()
         
+        # Audio and network threads report through the bus; widgets are
+        # only touched on the GUI thread, at most ui_refresh_hz times a second
+        self.events = UiEventBus(self, fps=config.get("ui_refresh_hz", 30))
+        self.events.levels_changed.connect(self.show_levels)
+        self.events.text_received.connect(self.transcript_model.append)
+        self.events.turn_ended.connect(self.transcript_model.end_turn)
+        self.audio_handler.output_callback = self.on_audio_played
+        
+    def _create_audio_handler(self, config):
+        """Audio in a child process when enabled, falling back to in-process"""
+        self._audio_options = options = dict(
+            jitter_buffer_ms=config.get("playback_jitter_buffer_ms", 120),
+            input_device=config.get("audio_input_device", ""),
+            output_device=config.get("audio_output_device", ""),
+            host_api=config.get("audio_host_api", ""),
+            echo_mode=config.get("echo_control", "aec"),
+            echo_duck_db=config.get("echo_duck_db", 24)
+        )
+        if config.get("audio_process", False):
+            try:
+                # Starts in the background; a failure swaps in AudioHandler
+                return AudioProcess(
+                    python=config.get("audio_process_python", ""),
+                    on_failure=self._on_audio_engine_failed,
+                    **options
+                )
+            except Exception as e:
+                print(f"Audio engine process unavailable, using in-process audio: {e}")
+        return AudioHandler(**options)
+        
+    def _on_audio_engine_failed(self, reason: str):
+        """Called from a background thread when the audio engine process is gone"""
+        mw.taskman.run_on_main(self._replace_audio_engine)
+        
+    def _replace_audio_engine(self):
+        """Carry on with in-process audio, where the session had got to"""
+        engine = self.audio_handler
+        if not isinstance(engine, AudioProcess) or engine.closed:
+            return
+        recording = engine.is_recording()
+        engine.cleanup()
+        self.audio_handler = AudioHandler(**self._audio_options)
+        self.audio_handler.output_callback = self.on_audio_played
+        if self.session_active:
+            self.audio_handler.open_streams()
+            if recording:
+                self.audio_handler.start_recording(self.on_audio_recorded)
+                
     def setup_ui(self):
         """Setup the user interface"""
         self.setWindowTitle("Anki Gemini Live")
@@ -55,17 +173,53 @@ class GeminiLiveDialog(QDialog):
         transcript_label = QLabel("Conversation:")
         layout.addWidget(transcript_label)
         
-        self.transcript = QTextEdit()
-        self.transcript.setReadOnly(True)
+        # Only the last transcript_max_turns turns are kept on screen; the
+        # whole conversation goes to a log under user_files/transcripts
+        log_path = None
+        if self.config.get("transcript_log", True):
+            log_path = TranscriptModel.session_log_path()
+        self.transcript_model = TranscriptModel(
+            self,
+            max_turns=self.config.get("transcript_max_turns", 200),
+            log_path=log_path
+        )
+        self.transcript = QListView()
+        self.transcript.setModel(self.transcript_model)
+        self.transcript.setWordWrap(True)
+        self.transcript.setLayoutMode(QListView.LayoutMode.Batched)
+        self.transcript.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self._transcript_at_bottom = True
+        self.transcript_model.rowsAboutToBeInserted.connect(self._check_transcript_position)
+        self.transcript_model.rowsInserted.connect(self._follow_transcript)
         layout.addWidget(self.transcript)
         
-        # Progress bar for audio activity
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setMaximum(100)
-        self.progress_bar.setValue(0)
-        self.progress_bar.setTextVisible(False)
-        layout.addWidget(self.progress_bar)
-        
+        # Level meters for the microphone and Gemini's voice (RMS bar,
+        # peak in the label)
+        self.meters = {}
+        for source, title in (("mic", "You"), ("speaker", "Gemini")):
+            meter_layout = QHBoxLayout()
+            meter_layout.addWidget(QLabel(title))
+            meter = QProgressBar()
+            meter.setRange(int(FLOOR_DB), 0)
+            meter.setTextVisible(True)
+            meter_layout.addWidget(meter)
+            layout.addLayout(meter_layout)
+            self.meters[source] = meter
+        self.show_levels("mic", FLOOR_DB, FLOOR_DB)
+        self.show_levels("speaker", FLOOR_DB, FLOOR_DB)
+        
+        # Latency debug panel: per-stage histograms, refreshed once a second
+        self.latency_panel = None
+        if latency.enabled:
+            self.latency_panel = QLabel()
+            self.latency_panel.setStyleSheet("font-family: monospace; font-size: 11px;")
+            self.latency_panel.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            layout.addWidget(self.latency_panel)
+            self._latency_timer = QTimer(self)
+            self._latency_timer.setInterval(1000)
+            self._latency_timer.timeout.connect(self.show_latency)
+            self.show_latency()
+            
         # Control buttons
         button_layout = QHBoxLayout()
         
@@ -100,188 +254,417 @@ class GeminiLiveDialog(QDialog):
         try:
             self.status_label.setText("Connecting to Gemini...")
             self.start_button.setEnabled(False)
+            if self.latency_panel:
+                latency.reset()
+                self._latency_timer.start()
+            # Devices open while the connection is set up, and stay open
+            # (muting and new turns don't touch them) until the session stops
+            self.audio_handler.open_streams()
             
-            # Initialize Gemini client
-            self.gemini_client = GeminiLiveClient(self.config["gemini_api_key"])
-            self.gemini_client.connect(
-                on_audio=self.on_gemini_audio,
-                on_text=self.on_gemini_text,
-                on_error=self.on_error
-            )
+            # Take the pre-warmed Gemini client if there is one
+            system_instruction = self._create_system_instruction()
+            self.gemini_client = self.connection_manager.acquire(self.config, system_instruction)
+            self._attach_client(self.gemini_client)
             
-            # Wait a bit for connection
-            from aqt.qt import QTimer
-            QTimer.singleShot(1000, self.on_connected)
+            # Continue as soon as the session is set up
+            self.gemini_client.ready.add_done_callback(self._on_client_ready)
             
         except Exception as e:
             self.on_error(f"Failed to start session: {str(e)}")
             
+    def _attach_client(self, client):
+        """Route a client's callbacks to this dialog"""
+        client.connect(
+            on_audio=self.on_gemini_audio,
+            on_text=self.on_gemini_text,
+            on_error=self.on_client_error,
+            system_instruction=self._create_system_instruction(),
+            on_reconnecting=self.on_reconnecting,
+            on_reconnected=self.on_reconnected,
+            on_turn_complete=self.on_turn_complete,
+            on_interrupted=self.on_interrupted,
+            on_tool_call=self.on_tool_call,
+            on_input_transcription=self.on_input_transcription
+        )
+        
+    def _on_client_ready(self, future):
+        """Called from the client thread when the session is ready or failed"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            mw.taskman.run_on_main(lambda: self.on_error(f"Connection error: {error}"))
+        else:
+            mw.taskman.run_on_main(self.on_connected)
+            
     def on_connected(self):
         """Called when connection is established"""
         try:
-            # Setup system instruction for Gemini
-            system_instruction = self._create_system_instruction()
-            self.gemini_client.setup_voice_mode(system_instruction)
+            # Get first card (usually already rendered by the prefetch in __init__)
+            self.card_presenter.request_next_card(self.on_first_card)
+            
+        except Exception as e:
+            self.on_error(f"Connection error: {str(e)}")
             
-            # Get first card
-            self.current_card = self.card_presenter.get_next_card()
-            if not self.current_card:
+    def on_first_card(self, prepared):
+        """Present the first card once it is available"""
+        try:
+            if not prepared:
                 showWarning("No cards available for review.")
                 self.close_dialog()
                 return
                 
             # Display card question
-            question = self.card_presenter.get_card_question(self.current_card)
-            self.card_display.setText(question)
+            self.current_card = prepared.card
+            self._card_serial += 1
+            self._present(prepared)
             
             # Start audio recording
             self.audio_handler.start_recording(self.on_audio_recorded)
             
             # Send initial prompt to Gemini
-            initial_prompt = f"Let's review this flashcard. The question is: {question}. Please ask me this question in a natural, conversational way."
-            self.gemini_client.send_text(initial_prompt)
+            initial_prompt = f"Let's review this flashcard. The question is: {prepared.question}. Please ask me this question in a natural, conversational way."
+            self.gemini_client.send_text(self._with_expected_answer(initial_prompt))
             
             self.session_active = True
             self.status_label.setText("Session Active - Speak naturally!")
             self.stop_button.setEnabled(True)
             self.mute_button.setEnabled(True)
-            self.progress_bar.setValue(50)
+            self.events.start()
             
             self.add_to_transcript("System", "Session started. Gemini will ask you the question.")
             
         except Exception as e:
             self.on_error(f"Connection error: {str(e)}")
             
-    def _create_system_instruction(self) -> str:
-        """Create system instruction for Gemini"""
-        instruction = """You are a friendly study partner helping someone review their Anki flashcards.
-
-Your role:
-1. Ask the flashcard question in a natural, conversational way
-2. Listen carefully to the user's answer
-3. Evaluate if their answer is correct and complete
-4. Rate the answer as: Again (wrong/don't know), Hard (partially correct), Good (correct), or Easy (perfect/very confident)
-5. Provide encouraging feedback
-6. If requested, explain concepts or provide additional context
-
-Guidelines:
-- Be conversational and supportive, not robotic
-- If the answer is partially correct, acknowledge what's right and gently guide them
-- For incorrect answers, give the correct answer and a brief explanation
-- Keep responses concise but helpful
-- After evaluating, clearly state the rating (Again/Hard/Good/Easy)
-"""
+    def on_reconnecting(self, attempt: int):
+        """Called from the client thread when the connection dropped"""
+        mw.taskman.run_on_main(
+            lambda: self.status_label.setText(f"Connection lost - reconnecting (attempt {attempt})...")
+        )
+        
+    def on_reconnected(self, resumed: bool):
+        """Called from the client thread once the session is back"""
+        mw.taskman.run_on_main(lambda: self._restore_session(resumed))
+        
+    def _restore_session(self, resumed: bool):
+        """Continue the review after a reconnect"""
+        if not self.session_active:
+            return
+        self.status_label.setText("Session Active - Speak naturally!")
         
-        if self.config.get("explanation_enabled"):
-            instruction += "\n- Be ready to answer follow-up questions and provide deeper explanations"
+        # A fresh session doesn't know which card we were on
+        if not resumed and self.current_card:
+            prompt = self._with_expected_answer(
+                f"We got disconnected. Let's continue with the current card. The question is: {self.current_question}. Please ask me this question again."
+            )
+            self.gemini_client.send_text(prompt)
+            self.add_to_transcript("System", "Reconnected - repeating the current question.")
             
-        return instruction
+    def _create_system_instruction(self) -> str:
+        """Create system instruction for Gemini"""
+        return create_system_instruction(self.config)
         
     def on_audio_recorded(self, audio_data: bytes):
         """Handle recorded audio from microphone"""
-        if self.session_active and self.gemini_client:
-            self.gemini_client.send_audio(audio_data)
-            # Visual feedback for recording
-            self.progress_bar.setValue(75)
-            from aqt.qt import QTimer
-            QTimer.singleShot(100, lambda: self.progress_bar.setValue(50))
+        client = self.gemini_client
+        if self.session_active and client:
+            # Only speech segments (plus pre-roll) go over the wire
+            for chunk in self.vad.process(audio_data):
+                client.send_audio(chunk)
+            if self.vad.speech_ended:
+                # Don't hold the tail of the utterance back for batching
+                client.flush_audio()
+            # Level meter, drawn by the GUI thread at the next frame
+            self.events.post_audio("mic", audio_data)
+            
+    def on_speech_start(self):
+        """Called from the recording thread when the user starts speaking"""
+        # Barge-in: stop Gemini mid-sentence instead of talking over the user
+        if not self.session_active or not self.config.get("barge_in_enabled", True):
+            return
+        if self.audio_handler.is_playing():
+            # Talking over the retiring session cuts it off for good
+            retiring = self._retiring_client
+            if retiring:
+                self._finish_retirement(retiring, drop_held=True)
+            self.audio_handler.interrupt(onset_time=self.vad.onset_time)
+            
+    def on_speech_end(self):
+        """Called from the recording thread when the user stops speaking"""
+        if self.grader and self.session_active:
+            mw.taskman.run_on_main(self._grade_timer.start)
             
     def on_gemini_audio(self, audio_data: bytes):
         """Handle audio response from Gemini"""
-        if self.session_active:
-            self.audio_handler.play_audio(audio_data)
-            # Visual feedback for playback
-            self.progress_bar.setValue(100)
-            from aqt.qt import QTimer
-            QTimer.singleShot(200, lambda: self.progress_bar.setValue(50))
+        if not self.session_active:
+            return
+        if self._retiring_client is not None:
+            with self._rotation_lock:
+                # A rotated-out session is still talking; go after it
+                if self._retiring_client is not None:
+                    self._held_audio.append(audio_data)
+                    return
+        self.audio_handler.play_audio(audio_data)
+        
+    def on_turn_complete(self):
+        """Called from the client thread when Gemini has finished speaking"""
+        if self._retiring_client is not None:
+            with self._rotation_lock:
+                if self._retiring_client is not None:
+                    self._held_turn_complete = True
+                    return
+        self.audio_handler.finish_turn()
+        self.events.post_turn_end("Gemini")
+        if self._awaiting_feedback:
+            mw.taskman.run_on_main(self._feedback_done)
             
+    def on_interrupted(self):
+        """Called from the client thread when the server cancelled its turn"""
+        self.audio_handler.interrupt(confirmed=True)
+        if self._awaiting_feedback:
+            mw.taskman.run_on_main(self._feedback_done)
+        
+    def on_audio_played(self, audio_data: bytes):
+        """Called from the audio device thread with each block played"""
+        self.events.post_audio("speaker", audio_data)
+        
     def on_gemini_text(self, text: str):
-        """Handle text response from Gemini"""
-        self.add_to_transcript("Gemini", text)
-        
-        # Check if Gemini provided a rating
-        rating = self._extract_rating(text)
-        if rating:
-            self.rate_card(rating)
-            
-    def _extract_rating(self, text: str) -> str or None:
-        """Extract rating from Gemini's response"""
-        text_lower = text.lower()
-        
-        # Look for explicit rating statements
-        if "rating: again" in text_lower or "rate this again" in text_lower:
-            return "again"
-        elif "rating: hard" in text_lower or "rate this hard" in text_lower:
-            return "hard"
-        elif "rating: good" in text_lower or "rate this good" in text_lower:
-            return "good"
-        elif "rating: easy" in text_lower or "rate this easy" in text_lower:
-            return "easy"
-            
-        # Look for rating keywords at end of response
-        words = text_lower.split()
-        if len(words) > 0:
-            last_words = " ".join(words[-5:])
-            if "again" in last_words and ("incorrect" in text_lower or "wrong" in text_lower):
-                return "again"
-            elif "hard" in last_words:
-                return "hard"
-            elif "easy" in last_words:
-                return "easy"
-            elif "good" in last_words or "correct" in text_lower:
-                return "good"
-                
-        return None
+        """Handle text response from Gemini (client thread)"""
+        self.events.post_text("Gemini", text)
         
-    def rate_card(self, rating: str):
-        """Rate the current card and move to next"""
-        if not self.current_card:
-            return
+    def on_tool_call(self, name: str, args: dict) -> dict:
+        """Called from the client thread when Gemini calls a function"""
+        if name != "rate_card":
+            return {"error": f"Unknown function {name}"}
             
-        # Map rating to Anki ease
-        ease_map = {
-            "again": 1,
-            "hard": 2,
-            "good": 3,
-            "easy": 4
-        }
+        rating = str(args.get("rating", "")).lower()
+        if rating not in RATINGS:
+            return {"error": f"Rating must be one of: {', '.join(RATINGS)}"}
+            
+        serial = self._card_serial
+        if not self.current_card or serial == self._rated_serial:
+            return {"error": "This card has already been rated; wait for the next question"}
+        self._rated_serial = serial
         
-        ease = ease_map.get(rating, 3)
+        mw.taskman.run_on_main(lambda: self.rate_card(rating, serial))
+        return {"result": f"Card rated {rating}"}
         
-        # Answer the card in Anki
-        self.card_presenter.answer_card(self.current_card, ease)
+    def rate_card(self, rating: str, serial: int):
+        """Rate the current card and move to next"""
+        if not self.session_active or not self.current_card or serial != self._card_serial:
+            return
+            
+        # Answer the card in Anki; clearing it stops a second rating from
+        # landing on the same card before the next one is shown
+        self.card_presenter.answer_card(self.current_card, RATINGS[rating])
+        self.current_card = None
+        self._reviewed.append((self.current_question, rating))
+        self._prepare_rotation()
         
         tooltip(f"Card rated: {rating.title()}")
         self.add_to_transcript("System", f"Card rated as: {rating.title()}")
         
-        # Get next card
-        from aqt.qt import QTimer
-        QTimer.singleShot(2000, self.load_next_card)
-        
+        # Get next card once Gemini's current turn, with its feedback on
+        # this card, is over
+        if self.gemini_client and self.gemini_client.turn_active:
+            self._awaiting_feedback = True
+            self._feedback_timer.start()
+        else:
+            self._feedback_done(waited=False)
+            
+    def _feedback_done(self, waited: bool = True):
+        """Move on to the next card, after an optional extra pause"""
+        if waited and not self._awaiting_feedback:
+            return
+        self._awaiting_feedback = False
+        self._feedback_timer.stop()
+        if not self.session_active:
+            return
+        delay = self.config.get("next_card_delay_ms", 0)
+        if delay > 0:
+            QTimer.singleShot(delay, self.load_next_card)
+        else:
+            self.load_next_card()
+            
     def load_next_card(self):
         """Load the next card for review"""
-        self.current_card = self.card_presenter.get_next_card()
+        self.card_presenter.request_next_card(self.show_next_card)
+        
+    def show_next_card(self, prepared):
+        """Present a card handed over by the card presenter"""
+        if not self.session_active:
+            return
+            
+        self.current_card = prepared.card if prepared else None
+        self._card_serial += 1
         
+        feedback, self._pending_feedback = self._pending_feedback, ""
         if not self.current_card:
+            if feedback:
+                self.gemini_client.send_text(feedback)
             self.add_to_transcript("System", "All cards reviewed! Great job!")
             tooltip("Review session complete!")
-            from aqt.qt import QTimer
             QTimer.singleShot(2000, self.stop_session)
             return
             
         # Display new card
-        question = self.card_presenter.get_card_question(self.current_card)
-        self.card_display.setText(question)
-        
-        # Prompt Gemini to ask the new question
-        prompt = f"Let's move to the next card. The question is: {question}. Please ask me this question."
+        self._present(prepared)
+        
+        # Prompt Gemini to ask the new question, after its feedback on a
+        # locally graded answer
+        prompt = self._with_expected_answer(
+            f"Let's move to the next card. The question is: {prepared.question}. Please ask me this question."
+        )
+        if feedback:
+            prompt = f"{feedback}\n\n{prompt}"
+        if self._rotate_session():
+            # The new session only knows the instruction; catch it up
+            prompt = f"{self._session_summary()}\n\n{prompt}"
         self.gemini_client.send_text(prompt)
         
         self.add_to_transcript("System", "Moving to next card...")
         
+    def _present(self, prepared):
+        """Show a card and start listening for its answer"""
+        self.current_question = prepared.question
+        self.current_answer = prepared.answer
+        self.card_display.setText(prepared.question)
+        self._heard = []
+        self._grade_timer.stop()
+        self.events.post_turn_end("You")
+        
+    def _with_expected_answer(self, prompt: str) -> str:
+        """Tell Gemini the card's answer so it can judge without working it out"""
+        if not self.current_answer:
+            return prompt
+        return f"{prompt} The expected answer is: {self.current_answer}. Don't reveal it before I answer."
+        
+    def on_input_transcription(self, text: str):
+        """Transcript of the user's speech (client thread)"""
+        self._heard.append(text)
+        self.events.post_text("You", text)
+        
+    def _grade_answer(self):
+        """Rate a clear hit or miss right away; leave the rest to Gemini"""
+        serial = self._card_serial
+        if not self.session_active or not self.current_card or serial == self._rated_serial:
+            return
+        heard = "".join(self._heard).strip()
+        if not heard:
+            return
+        grade = self.grader.grade(self.current_answer, heard)
+        if grade.rating is None:
+            # Ambiguous: Gemini judges it and calls rate_card
+            return
+            
+        self._rated_serial = serial
+        verdict = "correct" if grade.rating != "again" else "not correct"
+        self._pending_feedback = (
+            f'My answer "{heard}" was {verdict} (expected: {self.current_answer}). '
+            f"The card has already been rated {grade.rating}, so don't call rate_card for it; "
+            f"give me one short sentence of feedback."
+        )
+        self.rate_card(grade.rating, serial)
+        
+    def _prepare_rotation(self):
+        """Open the next session in the background once rotation is near"""
+        client = self.gemini_client
+        if not self.rotation_tokens or not client or self._next_client:
+            return
+        if client.context_tokens >= self.rotation_tokens * 0.75:
+            self._next_client = self.connection_manager.acquire(
+                self.config, self._create_system_instruction()
+            )
+            
+    def _rotate_session(self) -> bool:
+        """Switch to the prepared session if the current context is too big"""
+        old, new = self.gemini_client, self._next_client
+        if not new or old.context_tokens < self.rotation_tokens or not new.ready.done():
+            return False
+        self._next_client = None
+        if not new.is_usable():
+            # Failed to connect; try again at the next card
+            self.connection_manager.release(new)
+            return False
+            
+        self.rotations += 1
+        self._attach_client(new)
+        self.gemini_client = new
+        
+        # Let the old session finish its sentence, but nothing else
+        old.on_reconnecting = lambda attempt: None
+        old.on_reconnected = lambda resumed: None
+        old.on_error = lambda error_msg: None
+        old.on_tool_call = lambda name, args: {"error": "This conversation has ended"}
+        old.on_input_transcription = lambda text: None
+        with self._rotation_lock:
+            if old.turn_active:
+                self._retiring_client = old
+                self._held_audio = []
+                self._held_turn_complete = False
+                old.on_turn_complete = lambda: self._finish_retirement(old)
+                old.on_interrupted = lambda: self._finish_retirement(old)
+                old.on_audio = self.audio_handler.play_audio
+                QTimer.singleShot(self.RETIRE_TIMEOUT_MS, lambda: self._finish_retirement(old))
+                return True
+        self.connection_manager.release(old)
+        return True
+        
+    def _finish_retirement(self, client, drop_held: bool = False):
+        """Release a rotated-out session and play what the new one said (any thread)"""
+        with self._rotation_lock:
+            if self._retiring_client is not client:
+                return
+            self._retiring_client = None
+            held, self._held_audio = self._held_audio, []
+            turn_complete, self._held_turn_complete = self._held_turn_complete, False
+            client.on_audio = lambda audio_data: None
+            
+        self.audio_handler.finish_turn()
+        if not drop_held:
+            for chunk in held:
+                self.audio_handler.play_audio(chunk)
+            if turn_complete:
+                self.audio_handler.finish_turn()
+        mw.taskman.run_on_main(lambda: self.connection_manager.release(client))
+        
+    def _session_summary(self) -> str:
+        """Compact recap of the session so far for a fresh Live session"""
+        counts = collections.Counter(rating for _, rating in self._reviewed)
+        tally = ", ".join(f"{counts[r]} {r}" for r in RATINGS if counts[r])
+        lines = [
+            "(We are continuing a review session in a new conversation. "
+            f"So far I have reviewed {len(self._reviewed)} cards with you ({tally}).",
+            "The most recent cards were:"
+        ]
+        for question, rating in self._reviewed[-5:]:
+            lines.append(f"- {question[:150]} (rated {rating})")
+        lines.append("Carry on naturally without greeting me again.)")
+        return "\n".join(lines)
+        
+    def show_levels(self, source: str, rms_db: float, peak_db: float):
+        """Update a level meter (GUI thread)"""
+        meter = self.meters[source]
+        meter.setValue(int(rms_db))
+        meter.setFormat("" if peak_db <= FLOOR_DB else f"peak {peak_db:.0f} dB")
+        
+    def show_latency(self):
+        """Redraw the latency debug panel"""
+        self.latency_panel.setText(latency.format_table())
+        
     def add_to_transcript(self, speaker: str, message: str):
-        """Add message to transcript"""
-        self.transcript.append(f"<b>{speaker}:</b> {message}<br>")
+        """Add a complete message to the transcript"""
+        self.transcript_model.append(speaker, message, complete=True)
+        
+    def _check_transcript_position(self, *args):
+        scroll_bar = self.transcript.verticalScrollBar()
+        self._transcript_at_bottom = scroll_bar.value() >= scroll_bar.maximum()
+        
+    def _follow_transcript(self, *args):
+        """Keep the newest turn in view unless the user scrolled up"""
+        if self._transcript_at_bottom:
+            self.transcript.scrollToBottom()
         
     def toggle_mute(self):
         """Toggle microphone mute"""
@@ -297,22 +680,51 @@ Guidelines:
     def stop_session(self):
         """Stop the Gemini Live session"""
         self.session_active = False
+        self.vad.reset()
+        self._awaiting_feedback = False
+        self._feedback_timer.stop()
+        self.card_presenter.flush_reviews()
         
         if self.audio_handler:
-            self.audio_handler.stop_recording()
-            self.audio_handler.stop_playback()
+            self.audio_handler.close_streams()
             
+        # Sessions being rotated in or out
+        retiring, self._retiring_client = self._retiring_client, None
+        for client in (self._next_client, retiring):
+            if client:
+                self.connection_manager.release(client)
+        self._next_client = None
+        
         if self.gemini_client:
-            self.gemini_client.disconnect()
+            # Hands the connection back so the next session starts warm
+            self.connection_manager.release(
+                self.gemini_client, self.config, self._create_system_instruction()
+            )
+            if latency.enabled:
+                # Session diagnostics, with latency_debug on
+                print(f"Gemini Live uplink: {self.gemini_client.uplink_stats.as_dict()}, reconnects: {self.gemini_client.reconnects}, rotations: {self.rotations}")
+                print(f"Gemini Live VAD: {self.vad.stats()}")
+                print(f"Gemini Live playback: {self.audio_handler.playback_stats()}")
+                if self.grader:
+                    print(f"Gemini Live local grading: {self.grader.stats()}")
+                print(f"Gemini Live latency report: {latency.dump()}")
+            self.gemini_client = None
             
         self.status_label.setText("Session Stopped")
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
         self.mute_button.setEnabled(False)
-        self.progress_bar.setValue(0)
+        self.events.stop()
+        if self.latency_panel:
+            self._latency_timer.stop()
+            self.show_latency()
         
         self.add_to_transcript("System", "Session ended.")
         
+    def on_client_error(self, error_msg: str):
+        """Called from the client thread when the connection failed"""
+        mw.taskman.run_on_main(lambda: self.on_error(error_msg))
+        
     def on_error(self, error_msg: str):
         """Handle errors"""
         self.add_to_transcript("Error", error_msg)
@@ -321,9 +733,12 @@ Guidelines:
         
     def close_dialog(self):
         """Close the dialog"""
+        # Nothing the user answered may be lost when the dialog goes away
+        self.card_presenter.flush_reviews(wait=True)
         self.stop_session()
         if self.audio_handler:
             self.audio_handler.cleanup()
+        self.transcript_model.close()
         self.accept()
         
     def closeEvent(self, event):
@@ -0,0 +1,219 @@
+"""
+Local answer grader
+Scores the transcribed spoken answer against the card's answer text
+"""
+
+import re
+import unicodedata
+from typing import List, Optional
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_ORDINAL_SUFFIX = re.compile(r"^(\d+)(?:st|nd|rd|th)$")
+
+# Filler and function words that carry no meaning for grading
+STOPWORDS = frozenset("""
+    a an the of and or to in on at by for is are was were be been it its
+    this that these those i im think guess maybe um uh er erm hmm like so
+    well okay ok answer would called
+""".split())
+
+# Whole answers that mean "I don't know" (apostrophes removed)
+GIVE_UPS = frozenset((
+    "i dont know", "dont know", "no idea", "not sure", "i have no idea",
+    "i forgot", "i cant remember", "pass", "skip",
+))
+
+NEGATIONS = frozenset(("not", "no", "never", "dont", "isnt", "wasnt", "arent", "cant"))
+
+_UNITS = {
+    "zero": 0, "oh": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60,
+    "seventy": 70, "eighty": 80, "ninety": 90,
+}
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11,
+    "twelfth": 12, "thirteenth": 13, "fourteenth": 14, "fifteenth": 15,
+    "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19,
+    "twentieth": 20, "thirtieth": 30,
+}
+_SCALES = {"hundred": 100, "thousand": 1000, "million": 10 ** 6, "billion": 10 ** 9}
+_MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+
+
+def _number_words(words: List[str]) -> List[str]:
+    """Replace spelled-out numbers with digits.
+    
+    Handles "twenty one", "one hundred and five", "fourth", years read in
+    pairs ("seventeen seventy six", "nineteen oh five"), digits read one by
+    one and decimals ("three point one four").
+    """
+    out = []
+    total = current = 0
+    last = None  # Kind of the previous number word, None outside a number
+    decimals = None
+    
+    def close():
+        nonlocal total, current, last, decimals
+        if last is not None:
+            number = str(total + current)
+            out.append(f"{number}.{decimals}" if decimals else number)
+        total = current = 0
+        last = decimals = None
+        
+    for word in words:
+        if decimals is not None:
+            if word in _UNITS and _UNITS[word] < 10:
+                decimals += str(_UNITS[word])
+                continue
+            close()
+        if word in _UNITS and (word != "oh" or last is not None):
+            value = _UNITS[word]
+            if word == "oh":
+                current *= 10
+            elif value >= 10 and last in ("unit", "teen", "tens"):
+                current = current * 100 + value
+            elif value < 10 and last in ("unit", "teen"):
+                current = current * 10 + value
+            else:
+                current += value
+            last = "teen" if value >= 10 else "unit"
+        elif word in _TENS:
+            if last in ("unit", "teen", "tens"):
+                current = current * 100 + _TENS[word]
+            else:
+                current += _TENS[word]
+            last = "tens"
+        elif word in _ORDINALS:
+            current += _ORDINALS[word]
+            last = "ordinal"
+            close()
+        elif word in _SCALES and last is not None:
+            scale = _SCALES[word]
+            if scale == 100:
+                current *= scale
+            else:
+                total += current * scale
+                current = 0
+            last = "scale"
+        elif word == "point" and last is not None:
+            decimals = ""
+        elif word == "and" and last == "scale":
+            continue
+        else:
+            close()
+            out.append(word)
+    close()
+    return out
+
+
+def normalize(text: str) -> List[str]:
+    """Lower-case content tokens, with numbers and dates in canonical form.
+    
+    Accents, punctuation and filler words go; "twenty-one", "21st" and "21"
+    all become "21", month names become month numbers and leading zeros
+    are dropped, so "July 4th, 1776", "4 July 1776" and "1776-07-04" share
+    the same tokens.
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = text.replace("'", "").replace(",", "")
+    words = _number_words(_WORD.findall(text.replace("-", " ").replace("/", " ")))
+    tokens = []
+    for word in words:
+        ordinal = _ORDINAL_SUFFIX.match(word)
+        if ordinal:
+            word = ordinal.group(1)
+        if word in _MONTHS:
+            word = str(_MONTHS[word])
+        if word[0].isdigit():
+            try:
+                number = float(word)
+                word = str(int(number)) if number.is_integer() else str(number)
+            except ValueError:
+                pass
+        if word not in STOPWORDS:
+            tokens.append(word)
+    return tokens
+
+
+class Grade:
+    """Outcome of grading one answer"""
+    
+    CORRECT = "correct"
+    WRONG = "wrong"
+    UNSURE = "unsure"
+    
+    def __init__(self, verdict: str, score: float, rating: Optional[str] = None):
+        self.verdict = verdict
+        self.score = score
+        # rate_card rating for a local verdict, None when the model decides
+        self.rating = rating
+
+
+class AnswerGrader:
+    """Rates clear hits and give-ups locally; everything else goes to Gemini.
+    
+    An answer is only rated good here when every token of the expected
+    answer was said exactly, after normalization, and at least
+    accept_threshold of the content words said belong to the answer (so
+    "Paris or Lyon" isn't a hit for "Paris"). Near misses are left to the
+    model on purpose: "mitosis" and "meiosis", "Henry VII" and "Henry
+    VIII" differ by a letter or two but are different answers. Nothing
+    is failed on mismatch either, since a correct answer can share no
+    words with the card ("water" for "H2O"); only giving up is rated again.
+    """
+    
+    MAX_ANSWER_TOKENS = 12  # Longer answers need real understanding
+    
+    def __init__(self, accept_threshold: float = 0.8):
+        self.accept_threshold = accept_threshold
+        self.graded = {Grade.CORRECT: 0, Grade.WRONG: 0, Grade.UNSURE: 0}
+        
+    def grade(self, expected: str, heard: str) -> Grade:
+        result = self._grade(expected, heard)
+        self.graded[result.verdict] += 1
+        return result
+        
+    def _grade(self, expected: str, heard: str) -> Grade:
+        spoken = " ".join(heard.lower().replace("'", "").split()).strip(" .!?")
+        if spoken in GIVE_UPS:
+            return Grade(Grade.WRONG, 0.0, "again")
+            
+        want = normalize(expected)
+        said = normalize(heard)
+        if not want or not said or len(want) > self.MAX_ANSWER_TOKENS:
+            return Grade(Grade.UNSURE, 0.0)
+        if NEGATIONS.intersection(said) and not NEGATIONS.intersection(want):
+            # "it's not Paris" must not pass as "Paris"
+            return Grade(Grade.UNSURE, 0.0)
+            
+        unused = list(said)
+        for token in want:
+            if token not in unused:
+                return Grade(Grade.UNSURE, self._overlap(want, said))
+            unused.remove(token)
+        precision = len(want) / len(said)
+        if precision >= self.accept_threshold:
+            return Grade(Grade.CORRECT, precision, "good")
+        return Grade(Grade.UNSURE, precision)
+        
+    @staticmethod
+    def _overlap(want: List[str], said: List[str]) -> float:
+        """Share of expected tokens that were said, for the record"""
+        return len(set(want).intersection(said)) / len(set(want))
+        
+    def stats(self) -> dict:
+        total = sum(self.graded.values())
+        local = self.graded[Grade.CORRECT] + self.graded[Grade.WRONG]
+        return dict(self.graded, local_share=round(local / total, 2) if total else None)
@@ -0,0 +1,169 @@
+"""
+Latency instrumentation
+Per-stage timing histograms for the audio and network pipeline
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "user_files", "latency")
+
+# Pipeline stages, in the order audio goes through them
+STAGES = (
+    "capture",             # record thread: resample + VAD + hand-off per chunk
+    "enqueue",             # send_audio() until the chunk is on the client loop
+    "coalesce",            # time a chunk waited for its batch
+    "send",                # serialize and write one uplink message
+    "first_response",      # speech end (or text turn) to the first serverContent
+    "playback_start",      # first audio of a turn to its first block at the DAC
+    "speech_to_playback",  # speech end to Gemini audible, end to end
+)
+
+
+class Histogram:
+    """Log-scale latency histogram (4 buckets per octave from 10 us)"""
+    
+    __slots__ = ("count", "total", "max", "buckets")
+    
+    MIN_MS = 0.01
+    STEPS_PER_OCTAVE = 4
+    BUCKETS = 96  # Up to ~170 s
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * self.BUCKETS
+        
+    def add(self, ms: float):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        index = 0
+        if ms > self.MIN_MS:
+            index = min(int(math.log2(ms / self.MIN_MS) * self.STEPS_PER_OCTAVE), self.BUCKETS - 1)
+        self.buckets[index] += 1
+        
+    def merge(self, other: "Histogram"):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, count in enumerate(other.buckets):
+            self.buckets[index] += count
+            
+    def percentile(self, p: float) -> float:
+        """Upper edge of the bucket holding the p-th percentile, in ms"""
+        wanted = self.count * p / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                edge = self.MIN_MS * 2 ** ((index + 1) / self.STEPS_PER_OCTAVE)
+                return min(edge, self.max)
+        return self.max
+        
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else None,
+            "p50_ms": round(self.percentile(50), 2) if self.count else None,
+            "p90_ms": round(self.percentile(90), 2) if self.count else None,
+            "p99_ms": round(self.percentile(99), 2) if self.count else None,
+            "max_ms": round(self.max, 2) if self.count else None,
+        }
+
+
+class LatencyRecorder:
+    """Collects stage timings from any thread without locking.
+    
+    Every thread writes into its own set of histograms; snapshot() merges
+    them. Marks carry a start time from one thread to another (e.g. speech
+    end on the record thread, first reply on the client thread). Callers
+    check `enabled` first, so a disabled recorder costs one attribute read.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self._local = threading.local()
+        self._registered = []
+        self._register_lock = threading.Lock()
+        self._marks: Dict[str, float] = {}
+        
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+        
+    def reset(self):
+        """Start a new session; threads pick up fresh histograms lazily"""
+        self.started = time.time()
+        self._marks = {}
+        with self._register_lock:
+            self._local = threading.local()
+            self._registered = []
+            
+    def record(self, stage: str, seconds: float):
+        """Add one timing, in seconds, to the calling thread's histogram"""
+        histograms = getattr(self._local, "histograms", None)
+        if histograms is None:
+            histograms = self._local.histograms = {}
+            with self._register_lock:
+                self._registered.append(histograms)
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = Histogram()
+        histogram.add(seconds * 1000)
+        
+    def mark(self, name: str, at: Optional[float] = None):
+        """Remember when something happened (perf_counter time)"""
+        self._marks[name] = time.perf_counter() if at is None else at
+        
+    def since(self, name: str, stage: str, extra: float = 0.0):
+        """Record the time since mark name as stage, once per mark"""
+        started = self._marks.pop(name, None)
+        if started is not None:
+            self.record(stage, time.perf_counter() - started + extra)
+            
+    def snapshot(self) -> dict:
+        """Merged per-stage summaries (safe to call while recording)"""
+        merged = {}
+        for histograms in list(self._registered):
+            for stage, histogram in list(histograms.items()):
+                merged.setdefault(stage, Histogram()).merge(histogram)
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        return {
+            stage: merged[stage].summary()
+            for stage in sorted(merged, key=lambda s: order.get(s, len(STAGES)))
+        }
+        
+    def dump(self, path: Optional[str] = None) -> Optional[str]:
+        """Write the session's histograms as JSON; returns the file name"""
+        path = path or os.path.join(
+            LOG_DIR, time.strftime("session-%Y%m%d-%H%M%S.json", time.localtime(self.started))
+        )
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"started": self.started, "stages": self.snapshot()}, f, indent=2)
+        except OSError as e:
+            print(f"Could not write latency report: {e}")
+            return None
+        return path
+        
+    def format_table(self) -> str:
+        """Fixed-width text table for the debug panel"""
+        lines = [f"{'stage':<20}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for stage, summary in self.snapshot().items():
+            lines.append(
+                f"{stage:<20}{summary['count']:>6}{summary['p50_ms']:>9.1f}"
+                f"{summary['p90_ms']:>9.1f}{summary['p99_ms']:>9.1f}{summary['max_ms']:>9.1f}"
+            )
+        return "\n".join(lines)
+
+
+# Process-wide recorder shared by the audio handler, client and dialog
+recorder = LatencyRecorder()
@@ -3,11 +3,34 @@ Main module for Anki Gemini Live add-on
 Sets up the menu action and initializes the extension
 """
 
+import sys
+import threading
+
 from aqt import mw, gui_hooks
 from aqt.qt import QAction
 from aqt.utils import showInfo, showWarning
 
-from .gemini_live_dialog import GeminiLiveDialog
+# Only light modules are imported with Anki; the dialog (Qt widgets, numpy,
+# PyAudio) and the client (websockets) are imported on first use
+from .connection_manager import ConnectionManager
+from .system_instruction import create_system_instruction
+
+# Owns the Gemini connection across dialogs; created in setup_addon
+connection_manager = None
+
+
+def prewarm_connection(*args):
+    """Open a Gemini connection ahead of time so a session starts instantly"""
+    if not connection_manager:
+        return
+    config = mw.addonManager.getConfig(__name__)
+    connection_manager.prewarm(config, create_system_instruction(config))
+
+
+def on_state_did_change(new_state, old_state):
+    """Warm up the connection when the user heads towards reviewing"""
+    if new_state in ("overview", "review"):
+        prewarm_connection()
 
 
 def start_gemini_live_session():
@@ -29,18 +52,49 @@ def start_gemini_live_session():
         return
     
     # Open the Gemini Live dialog
-    dialog = GeminiLiveDialog(mw, config)
+    from .gemini_live_dialog import GeminiLiveDialog
+    dialog = GeminiLiveDialog(mw, config, connection_manager)
     dialog.exec()
 
 
+def warm_up_audio():
+    """Import the audio stack and initialize PortAudio (background thread)"""
+    try:
+        from .audio_handler import shared_pyaudio
+        shared_pyaudio()
+    except Exception as e:
+        # Raised again when a session opens the audio devices
+        print(f"Gemini Live: audio warm-up failed: {e}")
+
+
 def setup_menu():
     """Add menu item to Anki's Tools menu"""
     action = QAction("Start Gemini Live Session", mw)
     action.triggered.connect(start_gemini_live_session)
     mw.form.menuTools.addAction(action)
+    mw.form.menuTools.aboutToShow.connect(prewarm_connection)
+    
+    config = mw.addonManager.getConfig(__name__)
+    if config.get("prewarm_audio", True) and not config.get("audio_process", False):
+        threading.Thread(target=warm_up_audio, daemon=True).start()
+
+
+def shutdown_connections():
+    """Close any warm connection before the profile closes"""
+    if connection_manager:
+        connection_manager.shutdown()
+    # Release PortAudio only if it was ever loaded
+    audio_handler = sys.modules.get(f"{__package__}.audio_handler")
+    if audio_handler:
+        audio_handler.release_pyaudio()
 
 
 def setup_addon():
     """Initialize the add-on"""
+    global connection_manager
+    connection_manager = ConnectionManager()
+    
     # Setup menu when profile is loaded
     gui_hooks.profile_did_open.append(setup_menu)
+    gui_hooks.state_did_change.append(on_state_did_change)
+    gui_hooks.profile_will_close.append(shutdown_connections)
@@ -0,0 +1,110 @@
+"""
+Streaming sample-rate conversion
+Polyphase FIR resampler for 16-bit mono PCM, vectorized with NumPy
+"""
+
+import math
+
+import numpy as np
+
+
+class StreamingResampler:
+    """Rational-ratio polyphase resampler that keeps its state across chunks.
+    
+    The prototype low-pass is a Kaiser-windowed sinc with taps_per_phase
+    taps per polyphase branch, cut off just below the lower of the two
+    Nyquist frequencies. Each chunk is processed with one gather over a
+    sliding-window view of (history + chunk) and one row-wise dot product,
+    so there is no per-sample Python work. Splitting a stream into chunks
+    of any size gives the same output as processing it in one go.
+    
+    Long chunks are worked through BLOCK outputs at a time, so the gathered
+    windows (outputs x taps) stay small however much audio is passed in.
+    """
+    
+    BLOCK = 4096
+    
+    def __init__(self, in_rate: int, out_rate: int, taps_per_phase: int = 32,
+                 rolloff: float = 0.92, beta: float = 8.0):
+        self.in_rate = int(in_rate)
+        self.out_rate = int(out_rate)
+        g = math.gcd(self.in_rate, self.out_rate)
+        self.up = self.out_rate // g
+        self.down = self.in_rate // g
+        self.taps = taps_per_phase
+        self.passthrough = self.up == self.down
+        
+        if not self.passthrough:
+            self._filters = self._design(rolloff, beta)
+        self.reset()
+        
+    def _design(self, rolloff: float, beta: float) -> np.ndarray:
+        """Build the (up, taps) polyphase filter bank, taps in reverse order"""
+        length = self.up * self.taps
+        # Cut-off in cycles per sample at the upsampled rate
+        cutoff = rolloff * 0.5 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+        # Unity DC gain per branch after zero-stuffing by `up`
+        prototype *= self.up / prototype.sum()
+        # Branch p holds taps p, p + up, p + 2 * up, ...; reversed so each
+        # output is a plain dot product with a forward window of the input
+        bank = prototype.reshape(self.taps, self.up).T
+        return np.ascontiguousarray(bank[:, ::-1], dtype=np.float32)
+        
+    def reset(self):
+        """Forget the filter history (start of a new, unrelated stream)"""
+        self._history = np.zeros(max(self.taps - 1, 0), dtype=np.float32)
+        # Position of the next output sample on the upsampled time axis,
+        # relative to the first sample of the next input chunk
+        self._phase = 0
+        
+    @property
+    def delay(self) -> float:
+        """Group delay of the filter in seconds"""
+        if self.passthrough:
+            return 0.0
+        return (self.up * self.taps - 1) / 2 / (self.up * self.in_rate)
+        
+    def process_array(self, samples: np.ndarray) -> np.ndarray:
+        """Resample a float32 chunk; returns the output samples it completes"""
+        if self.passthrough:
+            return samples.astype(np.float32, copy=False)
+            
+        count = len(samples)
+        if not count:
+            return np.zeros(0, dtype=np.float32)
+            
+        # Number of output samples whose newest input sample is in this chunk
+        span = count * self.up - self._phase
+        produced = max(0, -(-span // self.down))
+        buffer = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        
+        out = np.empty(produced, dtype=np.float32)
+        # Window k covers inputs k - (taps - 1) .. k of this chunk
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps)
+        for start in range(0, produced, self.BLOCK):
+            stop = min(start + self.BLOCK, produced)
+            t = self._phase + self.down * np.arange(start, stop)
+            out[start:stop] = np.einsum("ij,ij->i", windows[t // self.up], self._filters[t % self.up])
+            
+        self._phase += self.down * produced - count * self.up
+        if self.taps > 1:
+            self._history = buffer[-(self.taps - 1):].copy()
+        return out
+        
+    def process(self, pcm: bytes) -> bytes:
+        """Resample a chunk of 16-bit mono PCM"""
+        if self.passthrough:
+            return pcm
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        out = self.process_array(samples)
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+        
+    def flush(self) -> bytes:
+        """Return the samples still held back by the filter delay and reset"""
+        if self.passthrough:
+            return b""
+        tail = self.process(bytes(self.taps))  # taps // 2 silent samples
+        self.reset()
+        return tail
@@ -0,0 +1,164 @@
+"""
+Review queue - Write-behind commits of card answers
+Answers are recorded immediately and written to the collection in batches
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional, Set
+
+from anki.cards import Card
+from anki.collection import Collection, OpChanges
+from anki.scheduler.v3 import CardAnswer
+from aqt import mw
+from aqt.operations import CollectionOp
+from aqt.qt import QTimer
+from aqt.utils import showWarning
+
+# Anki eases (1-4) as v3 scheduler ratings
+RATINGS = {
+    1: CardAnswer.AGAIN,
+    2: CardAnswer.HARD,
+    3: CardAnswer.GOOD,
+    4: CardAnswer.EASY,
+}
+
+
+class PendingAnswer:
+    """A card answer waiting to be written"""
+    
+    def __init__(self, card: Card, ease: int, answer: Optional[CardAnswer], taken: float):
+        self.card = card
+        self.ease = ease
+        # Built when the card was rated, so the answer time and timestamp
+        # don't include the time spent waiting in the queue
+        self.answer = answer
+        self.taken = taken
+        self.written = False
+
+
+class ReviewQueue:
+    """Batches card answers into background CollectionOps.
+    
+    add() only captures the answer (ease, time taken, timestamp) and
+    returns. Pending answers are committed once batch_size have piled up or
+    delay_ms after the first one, one CollectionOp per batch, each answer
+    still recorded as its own undo step. A batch that fails goes back to
+    the front of the queue to be retried with the next one. flush_now()
+    writes everything left on the calling thread, for shutdown.
+    """
+    
+    def __init__(self, col: Collection, batch_size: int = 5, delay_ms: int = 2000):
+        self.col = col
+        self.batch_size = max(1, batch_size)
+        self._pending: List[PendingAnswer] = []
+        self._in_flight: List[PendingAnswer] = []
+        # Set whenever no batch is being written in the background
+        self._idle = threading.Event()
+        self._idle.set()
+        self.on_committed: Optional[Callable[[], None]] = None
+        self.committed = 0
+        
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+        
+    def pending_ids(self) -> Set[int]:
+        """Ids of cards answered but not yet written (main thread)"""
+        return {item.card.id for item in self._pending + self._in_flight}
+        
+    def add(self, card: Card, ease: int, states=None):
+        """Queue an answer; states are the card's v3 scheduling states"""
+        if states is not None:
+            answer = self.col.sched.build_answer(card=card, states=states, rating=RATINGS[ease])
+            taken = 0.0
+        else:
+            answer = None
+            taken = card.time_taken() / 1000
+        self._pending.append(PendingAnswer(card, ease, answer, taken))
+        
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif not self._timer.isActive():
+            self._timer.start()
+            
+    def flush(self):
+        """Commit pending answers in the background"""
+        self._timer.stop()
+        if not self._pending or self._in_flight:
+            # A running batch picks up the rest when it finishes
+            return
+        batch, self._pending = self._pending, []
+        self._in_flight = batch
+        self._idle.clear()
+        
+        CollectionOp(
+            parent=mw,
+            op=lambda col: self._commit_in_background(col, batch),
+        ).success(
+            lambda changes: self._on_committed(batch)
+        ).failure(
+            lambda error: self._on_failed(batch, error)
+        ).run_in_background()
+        
+    def flush_now(self, timeout: float = 5.0):
+        """Commit pending answers synchronously (dialog closing).
+        
+        Waits up to timeout seconds for a batch already being written; the
+        part of it that didn't get written is committed here with the rest.
+        """
+        self._timer.stop()
+        batch = self._pending
+        if self._in_flight and self._idle.wait(timeout):
+            done = [item for item in self._in_flight if item.written]
+            self.committed += len(done)
+            batch = [item for item in self._in_flight if not item.written] + batch
+            # The batch's own callbacks, when they run, find nothing to do
+            self._in_flight = []
+        self._pending = []
+        if batch:
+            self._commit(self.col, batch)
+            self.committed += len(batch)
+            
+    def _commit_in_background(self, col: Collection, batch: List[PendingAnswer]) -> OpChanges:
+        try:
+            return self._commit(col, batch)
+        finally:
+            self._idle.set()
+            
+    def _commit(self, col: Collection, batch: List[PendingAnswer]) -> OpChanges:
+        """Answer every card in the batch (runs off the UI thread)"""
+        changes = OpChanges()
+        for item in batch:
+            if item.answer is not None:
+                changes = col.sched.answer_card(item.answer)
+            else:
+                # Legacy scheduler measures the time itself; rewind its timer
+                item.card.timer_started = time.time() - item.taken
+                col.sched.answerCard(item.card, item.ease)
+            item.written = True
+        return changes
+        
+    def _on_committed(self, batch: List[PendingAnswer]):
+        if batch is not self._in_flight:
+            return
+        self.committed += len(batch)
+        self._in_flight = []
+        if self.on_committed:
+            self.on_committed()
+        if self._pending:
+            self.flush()
+            
+    def _on_failed(self, batch: List[PendingAnswer], error: Exception):
+        if batch is not self._in_flight:
+            return
+        # Answers written before the error stay; the rest are retried ahead
+        # of newer ones with the next batch
+        done = [item for item in batch if item.written]
+        self.committed += len(done)
+        self._pending = [item for item in batch if not item.written] + self._pending
+        self._in_flight = []
+        if done and self.on_committed:
+            self.on_committed()
+        showWarning(f"Couldn't save review answers, will retry: {error}")
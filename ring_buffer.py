@@ -0,0 +1,79 @@
+"""
+Ring buffer for PCM audio
+Preallocated byte ring shared between a producer and a consumer thread
+"""
+
+import threading
+
+
+class RingBuffer:
+    """Fixed-size byte ring with memoryview-based reads and writes.
+    
+    Writes copy straight into the preallocated buffer; when the ring is
+    full the oldest audio is dropped (counted as an overrun) so latency
+    stays bounded. Reads return one bytes object assembled from at most two
+    memoryview slices, without intermediate copies.
+    """
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        # Monotonic byte counters; position in the ring is counter % capacity
+        self._read_pos = 0
+        self._write_pos = 0
+        self._lock = threading.Lock()
+        self.overruns = 0
+        self.dropped_bytes = 0
+        
+    def available(self) -> int:
+        """Number of bytes waiting to be read"""
+        return self._write_pos - self._read_pos
+        
+    def write(self, data) -> int:
+        """Append data, dropping the oldest bytes if it doesn't fit.
+        
+        Returns the number of bytes dropped.
+        """
+        data = memoryview(data).cast("B")
+        size = len(data)
+        if size > self.capacity:
+            data = data[size - self.capacity:]
+            size = self.capacity
+            
+        with self._lock:
+            dropped = max(0, self._write_pos - self._read_pos + size - self.capacity)
+            if dropped:
+                self._read_pos += dropped
+                self.overruns += 1
+                self.dropped_bytes += dropped
+                
+            start = self._write_pos % self.capacity
+            first = min(size, self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if first < size:
+                self._view[:size - first] = data[first:]
+            self._write_pos += size
+        return dropped
+        
+    def read(self, size: int) -> bytes:
+        """Remove and return up to size bytes (fewer if not available)"""
+        with self._lock:
+            size = min(size, self._write_pos - self._read_pos)
+            if size <= 0:
+                return b""
+            start = self._read_pos % self.capacity
+            first = min(size, self.capacity - start)
+            if first == size:
+                out = self._view[start:start + size].tobytes()
+            else:
+                out = b"".join((self._view[start:], self._view[:size - first]))
+            self._read_pos += size
+        return out
+        
+    def clear(self) -> int:
+        """Discard everything buffered; returns the number of bytes dropped"""
+        with self._lock:
+            dropped = self._write_pos - self._read_pos
+            self._read_pos = self._write_pos
+        return dropped
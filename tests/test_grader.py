@@ -0,0 +1,100 @@
+"""
+Tests for the local answer grader
+Run from the add-on folder with: python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grader import AnswerGrader, Grade, normalize  # noqa: E402
+
+
+@pytest.fixture
+def grader():
+    return AnswerGrader(0.8)
+
+
+# Answers a letter or two away from the expected one are different answers
+NEAR_MISSES = [
+    ("mitosis", "meiosis"),
+    ("hyperthyroidism", "hypothyroidism"),
+    ("afferent", "efferent"),
+    ("Austria", "Australia"),
+    ("Henry VIII", "Henry VII"),
+    ("Louis XIV", "Louis XVI"),
+    ("DNA polymerase", "RNA polymerase"),
+    ("anabolism", "catabolism"),
+    ("der Hund", "die Hunde"),
+]
+
+
+@pytest.mark.parametrize("expected, heard", NEAR_MISSES)
+def test_near_misses_are_left_to_the_model(grader, expected, heard):
+    result = grader.grade(expected, heard)
+    assert result.verdict == Grade.UNSURE
+    assert result.rating is None
+    # Nor the other way round
+    assert grader.grade(heard, expected).rating is None
+
+
+@pytest.mark.parametrize("expected, heard", [
+    ("Paris", "Paris"),
+    ("Paris", "um, I think it's Paris."),
+    ("Henry VIII", "henry viii"),
+    ("Mitochondria", "the mitochondria"),
+    ("July 4th, 1776", "the fourth of July seventeen seventy six"),
+    ("21", "twenty-one"),
+    ("Über", "uber"),
+])
+def test_exact_and_normalized_matches_are_good(grader, expected, heard):
+    result = grader.grade(expected, heard)
+    assert result.verdict == Grade.CORRECT
+    assert result.rating == "good"
+
+
+@pytest.mark.parametrize("expected, heard", [
+    ("H2O", "water"),
+    ("Paris", "Lyon"),
+    ("mitochondria", "the powerhouse of the cell"),
+])
+def test_no_overlap_is_not_failed_locally(grader, expected, heard):
+    assert grader.grade(expected, heard).rating is None
+
+
+@pytest.mark.parametrize("expected, heard", [
+    ("Paris", "Paris or Lyon"),
+    ("Paris", "it's not Paris"),
+    ("Henry VIII", "Henry"),
+    ("DNA polymerase", "polymerase"),
+])
+def test_hedged_and_partial_answers_are_left_to_the_model(grader, expected, heard):
+    assert grader.grade(expected, heard).rating is None
+
+
+@pytest.mark.parametrize("heard", ["I don't know", "no idea.", "Pass"])
+def test_give_ups_are_again(grader, heard):
+    result = grader.grade("mitosis", heard)
+    assert result.verdict == Grade.WRONG
+    assert result.rating == "again"
+
+
+def test_stats_count_verdicts(grader):
+    grader.grade("Paris", "Paris")
+    grader.grade("Paris", "Lyon")
+    grader.grade("Paris", "I don't know")
+    stats = grader.stats()
+    assert stats[Grade.CORRECT] == 1
+    assert stats[Grade.UNSURE] == 1
+    assert stats[Grade.WRONG] == 1
+    assert stats["local_share"] == 0.67
+
+
+def test_normalize_numbers_and_dates():
+    assert normalize("July 4th, 1776") == ["7", "4", "1776"]
+    assert sorted(normalize("4 July 1776")) == sorted(normalize("1776-07-04")) == ["1776", "4", "7"]
+    assert normalize("twenty-one") == normalize("21st") == ["21"]
+    assert normalize("three point one four") == ["3.14"]
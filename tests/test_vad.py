@@ -0,0 +1,50 @@
+"""
+Tests for the voice activity detector
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import VoiceActivityDetector  # noqa: E402
+
+RATE = 16000
+CHUNK = 1024
+
+
+def chunk(amplitude: float) -> bytes:
+    t = np.arange(CHUNK) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def test_speech_end_is_flagged_on_the_last_forwarded_chunk():
+    vad = VoiceActivityDetector(rate=RATE, hangover_ms=200, preroll_ms=0)
+    events = []
+    vad.on_speech_start = lambda: events.append("start")
+    vad.on_speech_end = lambda: events.append("end")
+    
+    forwarded = []
+    ended_after = None
+    for audio in [chunk(0)] * 3 + [chunk(8000)] * 5 + [chunk(0)] * 10:
+        out = vad.process(audio)
+        forwarded.extend(out)
+        if vad.speech_ended:
+            assert ended_after is None
+            ended_after = len(forwarded)
+            
+    assert events == ["start", "end"]
+    # Nothing is forwarded after the chunk that ended the utterance, so a
+    # flush issued once process() returns comes after all of its audio
+    assert ended_after == len(forwarded)
+    assert not vad.in_speech
+    
+    
+def test_flag_is_cleared_by_the_next_chunk():
+    vad = VoiceActivityDetector(rate=RATE, hangover_ms=100, preroll_ms=0)
+    for audio in [chunk(8000)] * 3 + [chunk(0)] * 5:
+        vad.process(audio)
+    vad.process(chunk(0))
+    assert not vad.speech_ended
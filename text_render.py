@@ -0,0 +1,113 @@
+"""
+Speech text renderer
+Turns rendered card HTML into plain text suitable for reading aloud
+"""
+
+import collections
+import html
+import re
+import threading
+from typing import Optional
+
+# One alternation covering every token that needs special handling, factored
+# on the first character so the regex engine can skip plain text quickly.
+# Text between tokens never reaches Python; per match the only Python-level
+# work is a dictionary lookup.
+_TOKEN = re.compile(
+    r"<(?:(?P<skip>(?i:script|style)\b[^>]*>.*?</(?i:script|style)\s*>|!--.*?-->)"
+    r"|(?P<break>(?i:br|hr|/?(?:div|p|li|tr|h[1-6]|ul|ol|table|blockquote|pre))\b[^>]*>)"
+    r"|(?P<tag>/?[a-zA-Z!][^>]*>))"
+    r"|\[(?:(?P<blank>\.\.\.\])|(?P<sound>sound:[^\]]*\]))"
+    r"|(?P<cloze>\{\{c\d+::(?P<cloze_text>.*?)(?:::(?P<cloze_hint>.*?))?\}\})",
+    re.DOTALL,
+)
+_ANSWER_RULE = re.compile(r"<hr\s+id\s*=\s*[\"']?answer[\"']?[^>]*>", re.IGNORECASE)
+
+QUESTION = "question"
+ANSWER = "answer"
+
+# Replacement text for tokens that don't depend on the match contents
+_FIXED = {"skip": "", "sound": "", "tag": "", "break": "\n", "blank": "blank"}
+
+
+def _question_token(match) -> str:
+    kind = match.lastgroup
+    if kind == "cloze":
+        return match.group("cloze_hint") or "blank"
+    return _FIXED[kind]
+
+
+def _answer_token(match) -> str:
+    kind = match.lastgroup
+    if kind == "cloze":
+        return match.group("cloze_text")
+    return _FIXED[kind]
+
+
+class SpeechTextRenderer:
+    """Single-pass HTML-to-speech-text converter with an LRU cache.
+    
+    Block-level tags become line breaks, <script>/<style> blocks, comments
+    and [sound:] tags are dropped, cloze deletions are spoken as "blank" (or
+    their hint) on the question side, and all HTML entities are decoded. On
+    the answer side, everything before <hr id=answer> (the repeated front)
+    is discarded.
+    """
+    
+    def __init__(self, cache_size: int = 2048):
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def render(self, text: str, side: str = QUESTION) -> str:
+        """Convert card HTML to speech text (uncached)"""
+        if side == ANSWER:
+            rule = _ANSWER_RULE.search(text)
+            if rule:
+                text = text[rule.end():]
+            out = _TOKEN.sub(_answer_token, text)
+        else:
+            out = _TOKEN.sub(_question_token, text)
+            
+        if "&" in out:
+            out = html.unescape(out)
+            
+        # Collapse whitespace (including &nbsp;) but keep one break per block
+        lines = (" ".join(line.split()) for line in out.split("\n"))
+        return "\n".join(line for line in lines if line)
+        
+    def render_card(self, card, side: str = QUESTION) -> str:
+        """Render one side of a card, cached on (card id, note mod, side)"""
+        key = (card.id, card.note().mod, side)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+            
+        source = card.answer() if side == ANSWER else card.question()
+        text = self.render(source, side)
+        self._put(key, text)
+        return text
+        
+    def clear(self):
+        """Drop all cached renders"""
+        with self._lock:
+            self._cache.clear()
+            
+    def _get(self, key) -> Optional[str]:
+        with self._lock:
+            text = self._cache.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return text
+            
+    def _put(self, key, text: str):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,141 @@
+"""
+Conversation transcript
+List model that keeps the last turns in memory and logs older ones to disk
+"""
+
+import os
+import time
+from typing import Optional
+
+from aqt.qt import QAbstractListModel, QModelIndex, QTimer, Qt
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), "user_files", "transcripts")
+
+
+class Turn:
+    """One transcript row: everything a speaker said in one go"""
+    
+    __slots__ = ("speaker", "text", "started", "open")
+    
+    def __init__(self, speaker: str, text: str):
+        self.speaker = speaker
+        self.text = text
+        self.started = time.time()
+        self.open = True
+        
+    def log_line(self) -> str:
+        stamp = time.strftime("%H:%M:%S", time.localtime(self.started))
+        return f"[{stamp}] {self.speaker}: {self.text}\n"
+
+
+class TranscriptModel(QAbstractListModel):
+    """Bounded, batched transcript for a QListView.
+    
+    Streamed fragments from the same speaker are merged into one row until
+    the turn ends. Appends are buffered and applied at most every
+    batch_ms, as one insert (plus one update of the row being extended).
+    Only the last max_turns rows stay in memory; older rows are written to
+    the session log as they drop out, and the rest when the model closes.
+    """
+    
+    def __init__(self, parent=None, max_turns: int = 200, batch_ms: int = 100,
+                 log_path: Optional[str] = None):
+        super().__init__(parent)
+        self.max_turns = max(1, max_turns)
+        self.log_path = log_path
+        self._rows = []
+        self._pending = []
+        self._log = None
+        
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(batch_ms)
+        self._flush_timer.timeout.connect(self.flush)
+        
+    @staticmethod
+    def session_log_path() -> str:
+        """Log file name for a session starting now"""
+        return os.path.join(LOG_DIR, time.strftime("session-%Y%m%d-%H%M%S.txt"))
+        
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        turn = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{turn.speaker}: {turn.text}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return time.strftime("%H:%M:%S", time.localtime(turn.started))
+        return None
+        
+    def append(self, speaker: str, text: str, complete: bool = False):
+        """Add text from a speaker; complete ends the turn with it"""
+        self._pending.append((speaker, text, complete))
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+            
+    def end_turn(self, speaker: str):
+        """Stop merging further text from speaker into its last row"""
+        self.append(speaker, "", complete=True)
+        
+    def flush(self):
+        """Apply buffered appends to the model"""
+        self._flush_timer.stop()
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+            
+        new_rows = []
+        extended = False
+        for speaker, text, complete in pending:
+            last = new_rows[-1] if new_rows else (self._rows[-1] if self._rows else None)
+            if last and last.open and last.speaker == speaker:
+                last.text += text
+                extended = extended or not new_rows
+            elif text:
+                new_rows.append(Turn(speaker, text))
+            else:
+                continue
+            if complete:
+                (new_rows[-1] if new_rows else last).open = False
+                
+        if extended:
+            index = self.index(len(self._rows) - 1)
+            self.dataChanged.emit(index, index)
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self.endInsertRows()
+            
+        excess = len(self._rows) - self.max_turns
+        if excess > 0:
+            self._spill(self._rows[:excess])
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            del self._rows[:excess]
+            self.endRemoveRows()
+            
+    def close(self):
+        """Write everything still in memory to the log and close it"""
+        self.flush()
+        self._spill(self._rows)
+        if self._log:
+            self._log.close()
+            self._log = None
+        self.log_path = None
+        
+    def _spill(self, turns):
+        """Append turns to the session log"""
+        if not self.log_path or not turns:
+            return
+        try:
+            if not self._log:
+                os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+                self._log = open(self.log_path, "a", encoding="utf-8")
+            self._log.writelines(turn.log_line() for turn in turns)
+            self._log.flush()
+        except OSError as e:
+            print(f"Transcript log disabled: {e}")
+            self.log_path = None
@@ -0,0 +1,133 @@
+"""
+UI event bus
+Collects events from the audio and network threads and delivers them to
+the GUI thread at a fixed frame rate
+"""
+
+import math
+import threading
+from typing import Tuple
+
+import numpy as np
+from aqt.qt import QObject, QTimer, pyqtSignal
+
+# Meter range; quieter levels show as an empty bar
+FLOOR_DB = -60.0
+
+
+def measure_levels(pcm: bytes) -> Tuple[float, float]:
+    """Return (RMS, peak) of a 16-bit PCM chunk in dBFS"""
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if not samples.size:
+        return FLOOR_DB, FLOOR_DB
+    x = samples.astype(np.float32)
+    rms = math.sqrt(float(np.dot(x, x)) / x.size) / 32768.0
+    peak = max(float(x.max()), -float(x.min())) / 32768.0
+    return _to_db(rms), _to_db(peak)
+
+
+def _to_db(value: float) -> float:
+    if value <= 0.0:
+        return FLOOR_DB
+    return max(FLOOR_DB, 20.0 * math.log10(value))
+
+
+class UiEventBus(QObject):
+    """Thread-safe, rate-limited bridge from worker threads to Qt widgets.
+    
+    post_audio() and post_text() may be called from any thread; they only
+    update plain Python state under a lock. A QTimer on the GUI thread
+    drains that state fps times per second and emits the signals, so any
+    number of chunks between two frames costs one widget update. Levels
+    keep the loudest value seen during a frame and then fall back slowly,
+    like a hardware meter.
+    """
+    
+    # source ("mic" or "speaker"), RMS dBFS, peak dBFS
+    levels_changed = pyqtSignal(str, float, float)
+    # speaker, text
+    text_received = pyqtSignal(str, str)
+    # speaker whose turn is over
+    turn_ended = pyqtSignal(str)
+    
+    RELEASE_DB_PER_S = 24.0
+    
+    def __init__(self, parent=None, fps: int = 30):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._levels = {}
+        self._shown = {}
+        self._texts = []
+        self._release_db = self.RELEASE_DB_PER_S / fps
+        
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self._deliver)
+        
+    def start(self):
+        """Begin delivering events (call on the GUI thread)"""
+        self.timer.start()
+        
+    def stop(self):
+        """Deliver what is pending, stop the timer and reset the meters"""
+        self.timer.stop()
+        self._deliver()
+        with self._lock:
+            self._levels.clear()
+        for source in list(self._shown):
+            self.levels_changed.emit(source, FLOOR_DB, FLOOR_DB)
+        self._shown.clear()
+        
+    def post_audio(self, source: str, pcm: bytes):
+        """Record the level of an audio chunk (any thread)"""
+        rms, peak = measure_levels(pcm)
+        with self._lock:
+            held = self._levels.get(source)
+            if held:
+                rms, peak = max(rms, held[0]), max(peak, held[1])
+            self._levels[source] = (rms, peak)
+            
+    def post_text(self, speaker: str, text: str):
+        """Queue a transcript line (any thread)"""
+        with self._lock:
+            # Fragments streamed within one frame become one line
+            if self._texts and self._texts[-1][0] == speaker and not self._texts[-1][2]:
+                self._texts[-1][1].append(text)
+            else:
+                self._texts.append([speaker, [text], False])
+                
+    def post_turn_end(self, speaker: str):
+        """Mark the end of a speaker's turn, in order with its text (any thread)"""
+        with self._lock:
+            if self._texts and self._texts[-1][0] == speaker:
+                self._texts[-1][2] = True
+            else:
+                self._texts.append([speaker, [], True])
+                
+    def _deliver(self):
+        """Emit everything collected since the last frame (GUI thread)"""
+        with self._lock:
+            levels, self._levels = self._levels, {}
+            texts, self._texts = self._texts, []
+            
+        for speaker, parts, ended in texts:
+            if parts:
+                self.text_received.emit(speaker, "".join(parts))
+            if ended:
+                self.turn_ended.emit(speaker)
+            
+        for source in set(levels) | set(self._shown):
+            rms, peak = levels.get(source, (FLOOR_DB, FLOOR_DB))
+            shown = self._shown.get(source, (FLOOR_DB, FLOOR_DB))
+            level = (
+                max(rms, shown[0] - self._release_db),
+                max(peak, shown[1] - self._release_db),
+            )
+            if level == shown:
+                continue
+            if level[0] <= FLOOR_DB and level[1] <= FLOOR_DB:
+                level = (FLOOR_DB, FLOOR_DB)
+                del self._shown[source]
+            else:
+                self._shown[source] = level
+            self.levels_changed.emit(source, *level)
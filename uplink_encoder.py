@@ -0,0 +1,62 @@
+"""
+Uplink message encoder
+Serializes microphone audio as realtimeInput messages in reused buffers
+"""
+
+import binascii
+import json
+from typing import List
+
+
+class RealtimeAudioEncoder:
+    """Builds realtimeInput audio messages without intermediate objects.
+    
+    Everything around the audio is the same in every message, so the JSON
+    is serialized once and split around the "data" value. encode() joins
+    the batched chunks into a reused PCM buffer, base64-encodes them and
+    writes prefix, base64 and suffix into a reused message buffer. Buffers
+    only grow (into new bytearrays, so views handed out earlier stay valid).
+    
+    The returned memoryview is only valid until the next encode() call; the
+    caller must be done sending it by then.
+    """
+    
+    def __init__(self, mime_type: str = "audio/pcm"):
+        template = json.dumps({
+            "realtimeInput": {
+                "mediaChunks": [{"mimeType": mime_type, "data": ""}]
+            }
+        }).encode("ascii")
+        split = template.index(b'"data": ""') + len(b'"data": "')
+        self.prefix = template[:split]
+        self.suffix = template[split:]
+        self._pcm = bytearray()
+        self._message = bytearray(self.prefix)
+        
+    def encode(self, chunks: List[bytes]) -> memoryview:
+        """Return the UTF-8 JSON message carrying the chunks, back to back"""
+        if len(chunks) == 1:
+            pcm = chunks[0]
+        else:
+            size = sum(len(chunk) for chunk in chunks)
+            if len(self._pcm) < size:
+                self._pcm = bytearray(size)
+            view = memoryview(self._pcm)
+            offset = 0
+            for chunk in chunks:
+                view[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+            pcm = view[:size]
+            
+        # The stdlib can't base64 into a buffer, so this is the one copy made
+        encoded = binascii.b2a_base64(pcm, newline=False)
+        start = len(self.prefix)
+        end = start + len(encoded)
+        total = end + len(self.suffix)
+        if len(self._message) < total:
+            # Round up so slightly longer batches don't reallocate again
+            self._message = bytearray(self.prefix) + bytearray(total + 1024 - start)
+        message = self._message
+        message[start:end] = encoded
+        message[end:total] = self.suffix
+        return memoryview(message)[:total]
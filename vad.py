@@ -0,0 +1,209 @@
+"""
+Voice activity detection
+Gates microphone audio so only speech (plus a short lead-in) is streamed
+"""
+
+import collections
+import math
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """Energy + spectral-flatness + zero-crossing VAD for 16-bit mono PCM.
+
+    Feed every captured chunk to process(); it returns the chunks that should
+    be sent upstream. While silent, chunks are held in a pre-roll buffer so
+    the start of an utterance is not clipped. After speech stops, chunks keep
+    flowing for the hangover period so trailing syllables (and the short
+    silence the server needs to detect end of turn) still go out.
+    """
+
+    # Detection thresholds (dBFS) at sensitivity 0.0 and 1.0
+    MIN_SENSITIVITY_DB = -30.0
+    MAX_SENSITIVITY_DB = -60.0
+
+    # Speech must rise this far above the tracked noise floor
+    NOISE_MARGIN_DB = 6.0
+
+    # Frames flatter than this look like broadband noise rather than voice
+    MAX_SPECTRAL_FLATNESS = 0.45
+
+    # Frames with more sign changes than this (per sample) look like hiss
+    MAX_ZERO_CROSSING_RATE = 0.35
+
+    # Consecutive voiced frames needed to declare speech onset
+    ONSET_FRAMES = 2
+
+    def __init__(self, sensitivity: float = 0.5, rate: int = 16000,
+                 hangover_ms: int = 600, preroll_ms: int = 300):
+        self.rate = rate
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.set_sensitivity(sensitivity)
+
+        self.on_speech_start: Optional[Callable[[], None]] = None
+        self.on_speech_end: Optional[Callable[[], None]] = None
+
+        self.in_speech = False
+        # Set by process() when the chunk it returns ends the utterance;
+        # on_speech_end fires before that last chunk has been forwarded,
+        # so anything that must follow it (flushing the uplink) checks this
+        self.speech_ended = False
+        # perf_counter() time of the first voiced chunk of the current utterance
+        self.onset_time = 0.0
+        self.noise_floor_db = self.threshold_db - self.NOISE_MARGIN_DB
+        self._voiced_run = 0
+        self._run_started = 0.0
+        self._hangover_left = 0
+        self._preroll = collections.deque()
+        self._preroll_bytes = 0
+
+        # Counters for tuning and for reporting savings
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @classmethod
+    def from_config(cls, config: dict, rate: int = 16000) -> "VoiceActivityDetector":
+        """Create a detector from the add-on configuration"""
+        return cls(
+            sensitivity=config.get("voice_detection_sensitivity", 0.5),
+            rate=rate,
+            hangover_ms=config.get("vad_hangover_ms", 600),
+            preroll_ms=config.get("vad_preroll_ms", 300),
+        )
+
+    def set_sensitivity(self, sensitivity: float):
+        """Map sensitivity (0.0 - 1.0) to an energy threshold in dBFS"""
+        sensitivity = min(max(float(sensitivity), 0.0), 1.0)
+        self.sensitivity = sensitivity
+        self.threshold_db = (
+            self.MIN_SENSITIVITY_DB
+            + (self.MAX_SENSITIVITY_DB - self.MIN_SENSITIVITY_DB) * sensitivity
+        )
+
+    def analyze(self, audio_data: bytes) -> dict:
+        """Compute per-frame features in one vectorized pass"""
+        samples = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32)
+        if samples.size == 0:
+            return {"rms_db": -120.0, "flatness": 1.0, "zcr": 0.0}
+        samples *= 1.0 / 32768.0
+
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        rms_db = 20.0 * math.log10(rms) if rms > 1e-6 else -120.0
+
+        signs = np.signbit(samples)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / samples.size
+
+        # Spectral flatness: geometric / arithmetic mean of the power spectrum
+        # over the speech band (roughly 100 Hz - 4 kHz)
+        spectrum = np.abs(np.fft.rfft(samples * np.hanning(samples.size))) ** 2
+        lo = max(1, int(100 * samples.size / self.rate))
+        hi = max(lo + 1, int(4000 * samples.size / self.rate))
+        band = spectrum[lo:hi] + 1e-12
+        flatness = float(np.exp(np.mean(np.log(band))) / np.mean(band))
+
+        return {"rms_db": rms_db, "flatness": flatness, "zcr": zcr}
+
+    def is_voiced(self, features: dict) -> bool:
+        """Decide whether a single frame contains voice"""
+        threshold = max(self.threshold_db, self.noise_floor_db + self.NOISE_MARGIN_DB)
+        if features["rms_db"] < threshold:
+            return False
+        return (
+            features["flatness"] < self.MAX_SPECTRAL_FLATNESS
+            or features["zcr"] < self.MAX_ZERO_CROSSING_RATE
+        )
+
+    def process(self, audio_data: bytes) -> List[bytes]:
+        """Run one captured chunk through the gate.
+
+        Returns the list of chunks to forward (possibly empty).
+        """
+        self.chunks_in += 1
+        self.bytes_in += len(audio_data)
+        self.speech_ended = False
+
+        features = self.analyze(audio_data)
+        voiced = self.is_voiced(features)
+
+        if not voiced and not self.in_speech:
+            # Track the noise floor slowly while nobody is talking
+            self.noise_floor_db += 0.05 * (features["rms_db"] - self.noise_floor_db)
+
+        self._voiced_run = self._voiced_run + 1 if voiced else 0
+        if self._voiced_run == 1 and not self.in_speech:
+            self._run_started = time.perf_counter()
+        hangover_frames = self._frames_for(self.hangover_ms, len(audio_data))
+
+        if self.in_speech:
+            if voiced:
+                self._hangover_left = hangover_frames
+            else:
+                self._hangover_left -= 1
+                if self._hangover_left <= 0:
+                    self.in_speech = False
+                    self.speech_ended = True
+                    self._emit(audio_data)
+                    if self.on_speech_end:
+                        self.on_speech_end()
+                    return [audio_data]
+            self._emit(audio_data)
+            return [audio_data]
+
+        if self._voiced_run >= self.ONSET_FRAMES:
+            self.in_speech = True
+            self.onset_time = self._run_started
+            self._hangover_left = hangover_frames
+            out = list(self._preroll)
+            out.append(audio_data)
+            self._preroll.clear()
+            self._preroll_bytes = 0
+            for chunk in out:
+                self._emit(chunk)
+            if self.on_speech_start:
+                self.on_speech_start()
+            return out
+
+        self._hold(audio_data)
+        return []
+
+    def reset(self):
+        """Forget any speech state and buffered pre-roll"""
+        self.in_speech = False
+        self.speech_ended = False
+        self._voiced_run = 0
+        self._hangover_left = 0
+        self._preroll.clear()
+        self._preroll_bytes = 0
+
+    def stats(self) -> dict:
+        """Return counters describing how much audio was gated"""
+        return {
+            "chunks_in": self.chunks_in,
+            "chunks_out": self.chunks_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "noise_floor_db": round(self.noise_floor_db, 1),
+        }
+
+    def _hold(self, audio_data: bytes):
+        """Keep the most recent chunks for the pre-roll"""
+        self._preroll.append(audio_data)
+        self._preroll_bytes += len(audio_data)
+        max_bytes = int(self.rate * self.preroll_ms / 1000) * 2
+        while self._preroll and self._preroll_bytes > max_bytes:
+            self._preroll_bytes -= len(self._preroll.popleft())
+
+    def _emit(self, audio_data: bytes):
+        self.chunks_out += 1
+        self.bytes_out += len(audio_data)
+
+    def _frames_for(self, duration_ms: int, chunk_bytes: int) -> int:
+        """Convert a duration into a number of chunks of the given size"""
+        chunk_ms = max(1.0, chunk_bytes / 2 / self.rate * 1000)
+        return max(1, int(math.ceil(duration_ms / chunk_ms)))